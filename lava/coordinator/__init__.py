@@ -16,13 +16,56 @@
 #  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #  MA 02110-1301, USA.
 
+import asyncio
 import time
 import socket
 import logging
 import json
+import threading
 
 LOG = logging.getLogger("lava-coordinator")
 
+# Requests that a client can ask to park, with the "block" key, until the group
+# condition is met instead of polling.
+BLOCKING_REQUESTS = ["group_data", "lava_sync", "lava_wait", "lava_wait_all"]
+
+
+class Connection:
+    """
+    Buffers the response to a request until the coordinator decides to send
+    it or to park the request.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.data = []
+
+    def send(self, data):
+        self.data.append(data)
+
+    def close(self):
+        pass
+
+    def waiting(self):
+        try:
+            return json.loads(self.data[-1].decode("utf-8"))["response"] == "wait"
+        except (IndexError, KeyError, TypeError, ValueError):
+            return False
+
+    def flush(self):
+        try:
+            self.writer.write(b"".join(self.data))
+        except OSError as exc:
+            LOG.warning("Unable to send the response: %s", exc)
+        self.writer.close()
+
+
+class ParkedRequest:
+    def __init__(self, json_data, conn, timer):
+        self.json_data = json_data
+        self.conn = conn
+        self.timer = timer
+
 
 class LavaCoordinator:
 
@@ -30,6 +73,9 @@ class LavaCoordinator:
     delay = 1
     rpc_delay = 2
     blocksize = 4 * 1024
+    # Large groups connect all at once: the default backlog (100) drops the
+    # connections above it and the clients only retry after a second.
+    backlog = 1024
     all_groups = {}
     # All data handling for each connection happens on this local reference into the
     # all_groups dict with a new group looked up each time.
@@ -50,6 +96,8 @@ class LavaCoordinator:
         self.host = host
         self.group_port = port
         self.blocksize = blocksize
+        # Requests waiting for a group condition, by group name
+        self.parked = {}
 
     def run(self):
         s = None
@@ -69,34 +117,131 @@ class LavaCoordinator:
                 )
                 time.sleep(self.delay)
                 self.delay *= 2
-        s.listen(1)
         self.running = True
-        while self.running:
-            LOG.info("Ready to accept new connections")
-            self.conn, addr = s.accept()
-            # read the header to get the size of the message to follow
-            data = self.conn.recv(8).decode("utf-8")  # 32bit limit
-            try:
-                count = int(data, 16)
-            except ValueError:
-                LOG.warning(
-                    "Invalid message: %s from %s", data, self.conn.getpeername()[0]
-                )
-                self.conn.close()
+        asyncio.run(self.serve(s))
+
+    async def serve(self, sock):
+        """
+        Serve the requests on the given socket until cancelled.
+        Requests are handled one at a time, in the event loop thread, so the
+        group data is never accessed concurrently.
+        """
+        server = await asyncio.start_server(
+            self.handle_connection, sock=sock, backlog=self.backlog
+        )
+        LOG.info("Ready to accept new connections")
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        # read the header to get the size of the message to follow
+        try:
+            data = await reader.readexactly(8)  # 32bit limit
+            count = int(data.decode("utf-8"), 16)
+            data = await reader.readexactly(count)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except ValueError:
+            LOG.warning(
+                "Invalid message: %s from %s", data, writer.get_extra_info("peername")
+            )
+            writer.close()
+            return
+        try:
+            json_data = json.loads(data.decode("utf-8"))
+        except ValueError:
+            json_data = None
+        if not isinstance(json_data, dict):
+            LOG.warning("JSON error for '%s'", data[:100])
+            writer.close()
+            return
+        try:
+            self.handle_request(json_data, Connection(writer))
+        except Exception:
+            LOG.exception("Unable to handle %s", json_data)
+            writer.close()
+
+    def handle_request(self, json_data, conn):
+        """
+        Handle the request and send the response, or park the request when
+        the client asked to block until the group condition is met.
+        """
+        self.conn = conn
+        self.dataReceived(json_data)
+        block = json_data.get("block")
+        if (
+            conn.waiting()
+            and json_data.get("request") in BLOCKING_REQUESTS
+            and isinstance(block, (int, float))
+            and block > 0
+        ):
+            self._park(json_data, conn, block)
+        else:
+            conn.flush()
+        self._wake(json_data.get("group_name"))
+
+    def _park(self, json_data, conn, block):
+        group_name = json_data["group_name"]
+        parked = self.parked.setdefault(group_name, [])
+        request = ParkedRequest(json_data, conn, None)
+        request.timer = asyncio.get_event_loop().call_later(
+            block, self._expire, group_name, request
+        )
+        parked.append(request)
+
+    def _expire(self, group_name, request):
+        """
+        The client asked to block for a limited time: send the "wait" response,
+        the client will poll again.
+        """
+        self.parked[group_name].remove(request)
+        if not self.parked[group_name]:
+            del self.parked[group_name]
+        request.conn.flush()
+
+    def _ready(self, group, json_data):
+        """
+        Check, without any side effect, if a parked request would not get a
+        "wait" response anymore.
+        """
+        request = json_data["request"]
+        messageID = json_data.get("messageID")
+        if request == "group_data":
+            return len(group["clients"]) == group["count"]
+        if request == "lava_sync":
+            return len(group["syncs"].get(messageID, {})) >= group["count"]
+        if request == "lava_wait":
+            return messageID in group["messages"].get(json_data["client_name"], {})
+        if request == "lava_wait_all" and "waitrole" not in json_data:
+            waits = group["waits"].get(messageID, {})
+            return all(client in waits for client in group["clients"])
+        return True
+
+    def _wake(self, group_name):
+        """
+        Retry the requests parked for this group once their condition is met.
+        """
+        if group_name not in self.parked or group_name not in self.all_groups:
+            return
+        for request in list(self.parked[group_name]):
+            if request.conn.writer.is_closing():
+                # The client is gone
+                request.timer.cancel()
+                self.parked[group_name].remove(request)
                 continue
-            c = 0
-            data = ""
-            # get the message itself
-            while c < count:
-                data += self.conn.recv(self.blocksize).decode("utf-8")
-                c += self.blocksize
-            try:
-                json_data = json.loads(data)
-            except ValueError:
-                LOG.warning("JSON error for '%s'", data[:100])
-                self.conn.close()
+            if not self._ready(self.all_groups[group_name], request.json_data):
+                continue
+            conn = Connection(request.conn.writer)
+            self.conn = conn
+            self.dataReceived(request.json_data)
+            if conn.waiting():
                 continue
-            self.dataReceived(json_data)
+            request.timer.cancel()
+            self.parked[group_name].remove(request)
+            conn.flush()
+        if not self.parked[group_name]:
+            del self.parked[group_name]
 
     def _updateData(self, json_data):
         """
@@ -626,3 +771,37 @@ class LavaCoordinator:
         else:
             LOG.error("Unrecognised request %s. Closed connection.", json_data)
             self._badRequest()
+
+
+class CoordinatorThread(threading.Thread):
+    """
+    Run the coordinator event loop in a thread, on a random local port.
+    Used by the tests and the load testing script.
+    """
+
+    def __init__(self, backlog):
+        super().__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(backlog)
+        self.port = self.sock.getsockname()[1]
+        self.coordinator = LavaCoordinator("localhost", self.port, 4096)
+        self.coordinator.backlog = backlog
+        # all_groups is a class attribute, shared with any other coordinator
+        self.coordinator.all_groups = {}
+        self.loop = asyncio.new_event_loop()
+        self.task = self.loop.create_task(self.coordinator.serve(self.sock))
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        self.loop.close()
+
+    def stop(self):
+        if self.is_alive():
+            self.loop.call_soon_threadsafe(self.task.cancel)
+            self.join()
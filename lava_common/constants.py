@@ -31,13 +31,30 @@ UBOOT_DEFAULT_HEADER_LENGTH = 64
 RAMDISK_FNAME = "ramdisk.cpio"
 
 # Size of the chunks when copying file
-FILE_DOWNLOAD_CHUNK_SIZE = 32768
+FILE_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
 # Size of the chunks when downloading over http
-HTTP_DOWNLOAD_CHUNK_SIZE = 32768
+HTTP_DOWNLOAD_CHUNK_SIZE = 256 * 1024
 
 # Size of the chunks when downloading over scp
-SCP_DOWNLOAD_CHUNK_SIZE = 32768
+SCP_DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Size of the chunks compressed in parallel when creating gzip files
+GZIP_CHUNK_SIZE = 1024 * 1024
+
+# Files bigger than this are cached, compressed, by the overlay cache
+OVERLAY_CACHE_MIN_SIZE = 64 * 1024
+
+# Maximum size of the overlay cache, in bytes.
+# Can be overridden with "overlay_cache_size" in the dispatcher configuration.
+OVERLAY_CACHE_SIZE = 1024 * 1024 * 1024
+
+# Number of chunks queued for each stage (hashing, decompression) of a download
+STREAM_QUEUE_DEPTH = 16
+
+# Maximum age, in seconds, of the git mirrors before they are refreshed.
+# Can be overridden with "git_cache_ttl" in the dispatcher configuration.
+GIT_CACHE_TTL = 300
 
 # dispatcher temporary directory
 # This is distinct from the TFTP daemon directory
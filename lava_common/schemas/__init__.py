@@ -20,7 +20,12 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
+import collections
+import copy
+import functools
+import hashlib
 import importlib
+import threading
 
 from voluptuous import (
     All,
@@ -41,6 +46,10 @@ from voluptuous import (
 from lava_common.timeout import Timeout
 
 
+# Number of validation results kept by validate()
+VALIDATION_CACHE_SIZE = 1024
+
+
 CONTEXT_VARIABLES = [
     # qemu variables
     "arch",
@@ -88,20 +97,119 @@ CONTEXT_VARIABLES = [
 ]
 
 
+@functools.lru_cache(maxsize=None)
+def action_schema(name, strict=True):
+    module = importlib.import_module("lava_common.schemas." + name)
+    return Schema(module.schema(), extra=not strict)
+
+
+@functools.lru_cache(maxsize=32)
+def job_schema(strict=True, extra_context_variables=()):
+    return Schema(job(list(extra_context_variables)), extra=not strict)
+
+
 def validate_action(name, index, data, strict=True):
     # Import the module
     try:
-        module = importlib.import_module("lava_common.schemas." + name)
-        Schema(module.schema(), extra=not strict)(data)
+        schema = action_schema(name, strict)
     except ImportError:
         raise Invalid("unknown action type", path=["actions"] + name.split("."))
+    try:
+        schema(data)
     except MultipleInvalid as exc:
         path = ["actions[%d]" % index] + name.split(".") + exc.path
         raise Invalid(exc.msg, path=path) from exc
 
 
+class ValidationCache:
+    """
+    Bounded LRU cache of the validation results, keyed by the hash of the
+    canonical form of the job definition.
+    Only the type of the metadata values is part of the key: the schemas do
+    not check anything else.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.results = collections.OrderedDict()
+        self.hits = self.misses = 0
+
+    @classmethod
+    def canonical(cls, data):
+        if isinstance(data, dict):
+            return (
+                "dict",
+                tuple(sorted((repr(k), cls.canonical(v)) for (k, v) in data.items())),
+            )
+        if isinstance(data, list):
+            return ("list", tuple(cls.canonical(v) for v in data))
+        return (type(data).__name__, repr(data))
+
+    def key(self, data, *args):
+        if isinstance(data, dict) and isinstance(data.get("metadata"), dict):
+            data = dict(data)
+            data["metadata"] = {k: type(v) for (k, v) in data["metadata"].items()}
+        canonical = (self.canonical(data), args)
+        return hashlib.sha256(repr(canonical).encode("utf-8")).hexdigest()
+
+    def validate(self, func, exceptions, data, *args):
+        """
+        Call func(data, *args) unless the result is already known. The
+        given exceptions are cached and a copy is raised on every call.
+        """
+        key = self.key(data, *args)
+        with self.lock:
+            cached = key in self.results
+            if cached:
+                self.hits += 1
+                self.results.move_to_end(key)
+                exc = self.results[key]
+            else:
+                self.misses += 1
+
+        if not cached:
+            try:
+                func(data, *args)
+                exc = None
+            except exceptions as e:
+                exc = e
+            with self.lock:
+                self.results[key] = exc
+                while len(self.results) > self.size:
+                    self.results.popitem(last=False)
+        if exc is not None:
+            raise copy.copy(exc)
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.hits = self.misses = 0
+
+
+validation_cache = ValidationCache(VALIDATION_CACHE_SIZE)
+
+
 def validate(data, strict=True, extra_context_variables=[]):
-    schema = Schema(job(extra_context_variables), extra=not strict)
+    """
+    Validate the job definition, raising Invalid if the definition is
+    invalid.
+
+    The results are cached: validating the same definition again raises a
+    copy of the same exception.
+    """
+    validation_cache.validate(
+        _validate,
+        Invalid,
+        data,
+        strict,
+        tuple(sorted(set(extra_context_variables))),
+    )
+
+
+def _validate(data, strict, extra_context_variables):
+    # The compiled schemas are cached, keyed by the set of extra variables
+    schema = job_schema(strict, extra_context_variables)
     schema(data)
     for index, action in enumerate(data["actions"]):
         # The job schema does already check the we have only one key
@@ -130,6 +238,27 @@ def validate(data, strict=True, extra_context_variables=[]):
         validate_action(cls, index, data, strict=strict)
 
 
+def validate_many(documents, strict=True, extra_context_variables=[]):
+    """
+    Validate a list of job definitions against the same compiled schemas.
+
+    Return, for each document, the list of errors found as dictionaries with
+    the "path" and "msg" keys. The list is empty when the document is valid.
+    """
+    results = []
+    for data in documents:
+        try:
+            validate(data, strict, extra_context_variables)
+            results.append([])
+        except MultipleInvalid as exc:
+            results.append(
+                [{"path": [str(p) for p in e.path], "msg": e.msg} for e in exc.errors]
+            )
+        except Invalid as exc:
+            results.append([{"path": [str(p) for p in exc.path], "msg": exc.msg}])
+    return results
+
+
 def timeout():
     return Any(
         {Required("days"): Range(min=1), Optional("skip"): bool},
@@ -20,6 +20,7 @@
 
 import re
 import contextlib
+import hashlib
 import subprocess  # nosec dpkg
 from lava_common.exceptions import InfrastructureError
 
@@ -113,3 +114,11 @@ def debian_filename_version(binary):
     pkg = pkg_str.split(":")[0]
     pkg_ver = debian_package_version(pkg)
     return "%s for <%s>, installed at version: %s" % (pkg, binary, pkg_ver)
+
+
+def prefetch_filename(url):
+    """
+    Name of the file holding the artefact prefetched by lava-worker for
+    the given url.
+    """
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
@@ -20,7 +20,6 @@
 
 from collections import OrderedDict
 import logging
-import copy
 from functools import reduce
 import pexpect
 import time
@@ -40,6 +39,7 @@ from lava_common.exceptions import (
     LAVATimeoutError,
 )
 from lava_common.log import YAMLLogger
+from lava_dispatcher.utils.copy_on_write import cow_copy
 from lava_dispatcher.utils.strings import seconds_to_str
 
 
@@ -52,6 +52,20 @@ class InternalObject:
     pass
 
 
+class NamespaceStats(InternalObject):
+    """
+    Count and time the reads of the namespace data done by an action.
+    copies counts the dictionaries and lists copied on access while
+    deepcopies counts the other objects that had to be deep copied.
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self.copies = 0
+        self.deepcopies = 0
+        self.duration = 0.0
+
+
 class Pipeline:
     """
     Pipelines ensure that actions are run in the correct sequence whilst
@@ -224,6 +238,9 @@ class Pipeline:
         for action in self.actions:
             failed = False
             namespace = action.parameters.get("namespace", "common")
+            profiler = self.job.profiler if self.job else None
+            if profiler is not None:
+                token = profiler.start(action)
             # Begin the action
             try:
                 parent = self.parent if self.parent else self.job
@@ -288,6 +305,8 @@ class Pipeline:
                     action.logger.debug(msg)
                 # set results including retries and failed actions
                 action.log_action_results(fail=failed)
+                if profiler is not None:
+                    profiler.stop(token, failed)
 
             if new_connection:
                 connection = new_connection
@@ -354,6 +373,7 @@ class Action:
         self.connection_timeout = Timeout(self.name, exception=self.timeout_exception)
         self.character_delay = 0
         self.force_prompt = False
+        self.namespace_stats = NamespaceStats()
 
     # Section
     section = None
@@ -895,8 +915,9 @@ class Action:
     def get_namespace_data(self, action, label, key, deepcopy=True, parameters=None):
         """
         Get a namespaced data value from dynamic job data using the specified key.
-        By default, returns a deep copy of the value instead of a reference to allow actions to
+        By default, returns a copy of the value instead of a reference to allow actions to
         manipulate lists and dicts based on common data without altering the values used by other actions.
+        Lists and dicts are copied on write: the nested values are only copied when accessed.
         :param action: Name of the action which set the data or a commonly shared string used to
             correlate disparate actions
         :param label: Arbitrary label used by many actions to sub-divide similar keys with distinct
@@ -909,12 +930,15 @@ class Action:
         :param parameters: Pass parameters when calling get_namespace_data from populate() as the parameters
             will not have been set in the action at that point.
         """
+        start = time.monotonic()
         params = parameters if parameters else self.parameters
         namespace = params["namespace"]
         value = self.data.get(namespace, {}).get(action, {}).get(label, {}).get(key)
-        if value is None:
-            return None
-        return copy.deepcopy(value) if deepcopy else value
+        if value is not None and deepcopy:
+            value = cow_copy(value, self.namespace_stats)
+        self.namespace_stats.reads += 1
+        self.namespace_stats.duration += time.monotonic() - start
+        return value
 
     def set_namespace_data(self, action, label, key, value, parameters=None):
         """
@@ -18,35 +18,40 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
-# List just the subclasses supported for this base strategy
-# imported by the parser to populate the list of subclasses.
+# Map the "method" boot parameter to the modules defining the strategies
+# that can accept it. Only the modules used by the job are imported by the
+# parser, in the order of this registry.
 
-# pylint: disable=unused-import
-
-from lava_dispatcher.actions.boot.bootloader import BootBootloader
-from lava_dispatcher.actions.boot.cmsis_dap import CMSIS
-from lava_dispatcher.actions.boot.depthcharge import Depthcharge
-from lava_dispatcher.actions.boot.dfu import DFU
-from lava_dispatcher.actions.boot.docker import BootDocker
-from lava_dispatcher.actions.boot.fastboot import BootFastboot
-from lava_dispatcher.actions.boot.fvp import BootFVP
-from lava_dispatcher.actions.boot.gdb import GDB
-from lava_dispatcher.actions.boot.grub import Grub, GrubSequence
-from lava_dispatcher.actions.boot.iso import BootIsoInstaller
-from lava_dispatcher.actions.boot.ipxe import IPXE
-from lava_dispatcher.actions.boot.kexec import BootKExec
-from lava_dispatcher.actions.boot.lxc import BootLxc
-from lava_dispatcher.actions.boot.minimal import Minimal
-from lava_dispatcher.actions.boot.musca import Musca
-from lava_dispatcher.actions.boot.openocd import OpenOCD
-from lava_dispatcher.actions.boot.pyocd import PyOCD
-from lava_dispatcher.actions.boot.jlink import JLink
-from lava_dispatcher.actions.boot.qemu import BootQEMU
-from lava_dispatcher.actions.boot.secondary import SecondaryShell
-from lava_dispatcher.actions.boot.ssh import SshLogin, Schroot
-from lava_dispatcher.actions.boot.u_boot import UBoot
-from lava_dispatcher.actions.boot.barebox import Barebox
-from lava_dispatcher.actions.boot.uefi import UefiShell
-from lava_dispatcher.actions.boot.uefi_menu import UefiMenu
-from lava_dispatcher.actions.boot.recovery import RecoveryBoot
-from lava_dispatcher.actions.boot.uuu import UUUBoot
+STRATEGIES = {
+    "bootloader": ["lava_dispatcher.actions.boot.bootloader"],
+    "cmsis-dap": ["lava_dispatcher.actions.boot.cmsis_dap"],
+    "depthcharge": ["lava_dispatcher.actions.boot.depthcharge"],
+    "dfu": ["lava_dispatcher.actions.boot.dfu"],
+    "docker": ["lava_dispatcher.actions.boot.docker"],
+    "fastboot": ["lava_dispatcher.actions.boot.fastboot"],
+    "fvp": ["lava_dispatcher.actions.boot.fvp"],
+    "gdb": ["lava_dispatcher.actions.boot.gdb"],
+    "grub": ["lava_dispatcher.actions.boot.grub"],
+    "grub-efi": ["lava_dispatcher.actions.boot.grub"],
+    "qemu-iso": ["lava_dispatcher.actions.boot.iso"],
+    "ipxe": ["lava_dispatcher.actions.boot.ipxe"],
+    "kexec": ["lava_dispatcher.actions.boot.kexec"],
+    "lxc": ["lava_dispatcher.actions.boot.lxc"],
+    "minimal": ["lava_dispatcher.actions.boot.minimal"],
+    "musca": ["lava_dispatcher.actions.boot.musca"],
+    "openocd": ["lava_dispatcher.actions.boot.openocd"],
+    "pyocd": ["lava_dispatcher.actions.boot.pyocd"],
+    "jlink": ["lava_dispatcher.actions.boot.jlink"],
+    "qemu": ["lava_dispatcher.actions.boot.qemu"],
+    "qemu-nfs": ["lava_dispatcher.actions.boot.qemu"],
+    "monitor": ["lava_dispatcher.actions.boot.qemu"],
+    "new_connection": ["lava_dispatcher.actions.boot.secondary"],
+    "ssh": ["lava_dispatcher.actions.boot.ssh"],
+    "schroot": ["lava_dispatcher.actions.boot.ssh"],
+    "u-boot": ["lava_dispatcher.actions.boot.u_boot"],
+    "barebox": ["lava_dispatcher.actions.boot.barebox"],
+    "uefi": ["lava_dispatcher.actions.boot.uefi"],
+    "uefi-menu": ["lava_dispatcher.actions.boot.uefi_menu"],
+    "recovery": ["lava_dispatcher.actions.boot.recovery"],
+    "uuu": ["lava_dispatcher.actions.boot.uuu"],
+}
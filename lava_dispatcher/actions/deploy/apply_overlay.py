@@ -38,9 +38,14 @@ from lava_dispatcher.utils.filesystem import (
 )
 from lava_dispatcher.utils.shell import which
 from lava_dispatcher.utils.compression import (
+    NewcWriter,
+    append_cpio,
+    compress_command_map,
     compress_file,
     cpio,
+    cpio_listing,
     decompress_file,
+    stream_decompress_map,
     untar_file,
     uncpio,
 )
@@ -535,6 +540,16 @@ class ExtractModules(Action):
         return connection
 
 
+def can_append_cpio(compression):
+    """
+    Check that a cpio segment can be appended to a ramdisk compressed with
+    the given method, without extracting it.
+    """
+    if not compression:
+        return True
+    return compression in compress_command_map and compression in stream_decompress_map
+
+
 class ExtractRamdisk(Action):
     """
     Removes the uboot header, if kernel-type is uboot
@@ -542,6 +557,10 @@ class ExtractRamdisk(Action):
     applies the overlay and then leaves the ramdisk open
     for other actions to modify. Needs CompressRamdisk to
     recreate the ramdisk with modifications.
+
+    When the compression is supported, the ramdisk is not extracted: the
+    other actions fill an empty directory that CompressRamdisk appends to
+    the original ramdisk.
     """
 
     name = "extract-overlay-ramdisk"
@@ -600,8 +619,12 @@ class ExtractRamdisk(Action):
         else:
             # give the file a predictable name
             shutil.move(ramdisk, ramdisk_compressed_data)
-        ramdisk_data = decompress_file(ramdisk_compressed_data, compression)
-        uncpio(ramdisk_data, extracted_ramdisk)
+        append = can_append_cpio(compression)
+        if append:
+            ramdisk_data = ramdisk_compressed_data
+        else:
+            ramdisk_data = decompress_file(ramdisk_compressed_data, compression)
+            uncpio(ramdisk_data, extracted_ramdisk)
 
         # tell other actions where the unpacked ramdisk can be found
         self.set_namespace_data(
@@ -610,6 +633,9 @@ class ExtractRamdisk(Action):
             key="directory",
             value=extracted_ramdisk,
         )
+        self.set_namespace_data(
+            action=self.name, label="extracted_ramdisk", key="append", value=append
+        )
         self.set_namespace_data(
             action=self.name, label="ramdisk_file", key="file", value=ramdisk_data
         )
@@ -694,12 +720,27 @@ class CompressRamdisk(Action):
                     action=self.name, label="file", key="preseed_local", value=filename
                 )
 
-        self.logger.info("Building ramdisk %s containing %s", ramdisk_data, ramdisk_dir)
-        self.logger.debug(">> %s", cpio(ramdisk_dir, ramdisk_data))
-
         # we need to compress the ramdisk with the same method is was submitted with
         compression = self.parameters["ramdisk"].get("compression")
-        final_file = compress_file(ramdisk_data, compression)
+        append = self.get_namespace_data(
+            action="extract-overlay-ramdisk", label="extracted_ramdisk", key="append"
+        )
+        if append:
+            self.logger.info("Appending %s to ramdisk %s", ramdisk_dir, ramdisk_data)
+            entries = cpio_listing(ramdisk_data, compression)
+            segment = os.path.join(os.path.dirname(ramdisk_dir), "overlay.cpio")
+            with open(segment, "wb") as f_out:
+                writer = NewcWriter(f_out, entries)
+                writer.add_directory(ramdisk_dir)
+                writer.close()
+            append_cpio(ramdisk_data, compress_file(segment, compression))
+            final_file = ramdisk_data
+        else:
+            self.logger.info(
+                "Building ramdisk %s containing %s", ramdisk_data, ramdisk_dir
+            )
+            self.logger.debug(">> %s", cpio(ramdisk_dir, ramdisk_data))
+            final_file = compress_file(ramdisk_data, compression)
 
         tftp_dir = os.path.dirname(
             self.get_namespace_data(
@@ -909,9 +950,16 @@ class AppendOverlays(Action):
             action="download-action", label=self.key, key="decompressed"
         )
         self.logger.info("Modifying %r", image)
+        # Some images are kept compressed.
+        if decompressed:
+            compression = None
+        if can_append_cpio(compression):
+            self.append_cpio(image, compression)
+            return
+
         tempdir = self.mkdtemp()
-        # Some images are kept compressed. We should decompress first
-        if compression and not decompressed:
+        # We should decompress first
+        if compression:
             self.logger.debug("* decompressing (%s)", compression)
             image = decompress_file(image, compression)
         # extract the archive
@@ -921,20 +969,7 @@ class AppendOverlays(Action):
 
         # Add overlays
         self.logger.debug("Overlays:")
-        for overlay in self.params["overlays"]:
-            label = "%s.%s" % (self.key, overlay)
-            overlay_image = None
-            path = None
-            if overlay == "lava":
-                overlay_image = self.get_namespace_data(
-                    action="compress-overlay", label="output", key="file"
-                )
-                path = "/"
-            else:
-                overlay_image = self.get_namespace_data(
-                    action="download-action", label=label, key="file"
-                )
-                path = self.params["overlays"][overlay]["path"]
+        for label, overlay_image, path in self.overlays():
             # Take off initial "/" from path, extract relative to this directory
             extract_path = os.path.join(tempdir, path[1:])
             self.logger.debug("- %s: %r to %r", label, overlay_image, extract_path)
@@ -945,10 +980,45 @@ class AppendOverlays(Action):
         # Recreating the archive
         self.logger.debug("* archiving %r", image)
         cpio(tempdir, image)
-        if compression and not decompressed:
+        if compression:
             self.logger.debug("* compressing (%s)", compression)
             image = compress_file(image, compression)
 
+    def append_cpio(self, image, compression):
+        # The kernel extracts the concatenated archives in order: the
+        # overlays are appended as a new archive, without extracting the
+        # original one.
+        self.logger.debug("* listing %r", image)
+        entries = cpio_listing(image, compression)
+        segment = os.path.join(self.mkdtemp(), "overlays.cpio")
+        self.logger.debug("Overlays:")
+        with open(segment, "wb") as f_out:
+            writer = NewcWriter(f_out, entries)
+            for label, overlay_image, path in self.overlays():
+                self.logger.debug("- %s: %r to %r", label, overlay_image, path)
+                writer.add_tarfile(overlay_image, path)
+            writer.close()
+        if compression:
+            self.logger.debug("* compressing (%s)", compression)
+            segment = compress_file(segment, compression)
+        self.logger.debug("* appending to %r", image)
+        append_cpio(image, segment)
+
+    def overlays(self):
+        for overlay in self.params["overlays"]:
+            label = "%s.%s" % (self.key, overlay)
+            if overlay == "lava":
+                overlay_image = self.get_namespace_data(
+                    action="compress-overlay", label="output", key="file"
+                )
+                path = "/"
+            else:
+                overlay_image = self.get_namespace_data(
+                    action="download-action", label=label, key="file"
+                )
+                path = self.params["overlays"][overlay]["path"]
+            yield (label, overlay_image, path)
+
     def update_guestfs(self):
         image = self.get_namespace_data(
             action="download-action", label=self.key, key="file"
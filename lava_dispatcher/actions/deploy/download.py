@@ -40,15 +40,21 @@ from lava_dispatcher.actions.deploy.apply_overlay import AppendOverlays
 from lava_dispatcher.actions.deploy.overlay import OverlayAction
 from lava_dispatcher.connections.serial import ConnectDevice
 from lava_common.exceptions import InfrastructureError, JobError, LAVABug
+from lava_common.utils import prefetch_filename
 from lava_dispatcher.action import Action, Pipeline
 from lava_dispatcher.logical import Deployment, RetryAction
-from lava_dispatcher.utils.compression import untar_file
+from lava_dispatcher.utils.compression import (
+    StreamDecompressor,
+    stream_decompress_map,
+    untar_file,
+)
 from lava_dispatcher.utils.filesystem import (
     copy_to_lxc,
     lava_lxc_home,
     copy_overlay_to_lxc,
 )
 from lava_dispatcher.utils.network import requests_retry
+from lava_dispatcher.utils.stream import StreamStage
 from lava_common.constants import (
     FILE_DOWNLOAD_CHUNK_SIZE,
     HTTP_DOWNLOAD_CHUNK_SIZE,
@@ -146,6 +152,11 @@ class DownloadHandler(Action):
         "zstd": "unzstd",
     }
 
+    # Supported checksums, in the order they are checked
+    checksum_algorithms = ("md5", "sha256", "sha512")
+    # Checksums computed when the job does not request any
+    default_checksum_algorithms = ("sha256",)
+
     def __init__(self, key, path, url, uniquify=True, params=None):
         super().__init__()
         self.url = url
@@ -282,9 +293,6 @@ class DownloadHandler(Action):
 
         connection = super().run(connection, max_end_time)
         # self.cookies = self.job.context.config.lava_cookies  # FIXME: work out how to restore
-        md5 = hashlib.md5()  # nosec - not being used for cryptography.
-        sha256 = hashlib.sha256()
-        sha512 = hashlib.sha512()
 
         # Create a fresh directory if the old one has been removed by a previous cleanup
         # (when retrying inside a RetryAction)
@@ -307,9 +315,17 @@ class DownloadHandler(Action):
             value=bool(compression),
         )
 
-        md5sum = self.params.get("md5sum")
-        sha256sum = self.params.get("sha256sum")
-        sha512sum = self.params.get("sha512sum")
+        # Only compute the checksums that will be checked. When none is
+        # requested, compute sha256 to identify the artefact in the results.
+        checksums = {
+            algorithm: self.params[algorithm + "sum"]
+            for algorithm in self.checksum_algorithms
+            if self.params.get(algorithm + "sum")
+        }
+        hashes = {
+            algorithm: hashlib.new(algorithm)
+            for algorithm in (checksums or self.default_checksum_algorithms)
+        }
 
         if os.path.isdir(self.fname):
             raise JobError("Download '%s' is a directory, not a file" % self.fname)
@@ -333,9 +349,13 @@ class DownloadHandler(Action):
             last_value = -5
             progress = progress_known_total
 
+        decompressor = None
         decompress_command = None
         if compression:
-            if compression in self.decompress_command_map:
+            if compression in stream_decompress_map:
+                decompressor = StreamDecompressor(compression)
+                self.logger.info("Decompressing %s in-process", compression)
+            elif compression in self.decompress_command_map:
                 decompress_command = self.decompress_command_map[compression]
                 self.logger.info(
                     "Using %s to decompress %s", decompress_command, compression
@@ -348,48 +368,77 @@ class DownloadHandler(Action):
         elif not self.params.get("compression", False):
             self.logger.debug("No compression specified")
 
-        def update_progress():
-            nonlocal downloaded_size, last_value, md5, sha256, sha512
-            downloaded_size += len(buff)
-            (printing, new_value, msg) = progress(downloaded_size, last_value)
-            if printing:
-                last_value = new_value
-                self.logger.debug(msg)
-            md5.update(buff)
-            sha256.update(buff)
-            sha512.update(buff)
-
-        if compression and decompress_command:
-            try:
-                with open(self.fname, "wb") as dwnld_file:
-                    proc = subprocess.Popen(  # nosec - internal.
-                        [decompress_command], stdin=subprocess.PIPE, stdout=dwnld_file
+        try:
+            dwnld_file = open(self.fname, "wb")
+            if decompress_command:
+                proc = subprocess.Popen(  # nosec - internal.
+                    [decompress_command], stdin=subprocess.PIPE, stdout=dwnld_file
+                )
+        except OSError as exc:
+            msg = "Unable to open %s: %s" % (self.fname, exc.strerror)
+            self.logger.error(msg)
+            raise InfrastructureError(msg)
+
+        # Each stage runs in its own thread. hashlib, zlib, bz2 and lzma
+        # release the GIL on large buffers so the stages run in parallel with
+        # the network reader.
+        if decompressor:
+            writer = StreamStage(
+                "decompress",
+                lambda buff: dwnld_file.write(decompressor.decompress(buff)),
+                lambda: dwnld_file.write(decompressor.flush()),
+            )
+        elif decompress_command:
+
+            def finish():
+                proc.stdin.close()
+                if proc.wait():
+                    raise JobError(
+                        "%s failed with exit code %d"
+                        % (decompress_command, proc.returncode)
                     )
-            except OSError as exc:
-                msg = "Unable to open %s: %s" % (self.fname, exc.strerror)
-                self.logger.error(msg)
-                raise InfrastructureError(msg)
-
-            with proc.stdin as pipe:
-                for buff in self.reader():
-                    update_progress()
-                    try:
-                        pipe.write(buff)
-                    except BrokenPipeError as exc:
-                        error_message = str(exc)
-                        self.logger.exception(error_message)
-                        msg = (
-                            "Make sure the 'compression' is corresponding "
-                            "to the image file type."
-                        )
-                        self.logger.error(msg)
-                        raise JobError(error_message)
-            proc.wait()
+
+            writer = StreamStage("decompress", proc.stdin.write, finish)
         else:
-            with open(self.fname, "wb") as dwnld_file:
-                for buff in self.reader():
-                    update_progress()
-                    dwnld_file.write(buff)
+            writer = StreamStage("write", dwnld_file.write)
+        stages = [writer] + [
+            StreamStage(algorithm, hashes[algorithm].update) for algorithm in hashes
+        ]
+
+        def feed(buff):
+            try:
+                for stage in stages:
+                    if buff is None:
+                        stage.close()
+                    else:
+                        stage.put(buff)
+            except (BrokenPipeError, JobError) as exc:
+                error_message = str(exc)
+                self.logger.exception(error_message)
+                msg = (
+                    "Make sure the 'compression' is corresponding "
+                    "to the image file type."
+                )
+                self.logger.error(msg)
+                raise JobError(error_message)
+
+        try:
+            for buff in self.reader():
+                downloaded_size += len(buff)
+                (printing, new_value, msg) = progress(downloaded_size, last_value)
+                if printing:
+                    last_value = new_value
+                    self.logger.debug(msg)
+                feed(buff)
+            feed(None)
+        finally:
+            for stage in stages:
+                stage.abort()
+            if decompress_command:
+                with contextlib.suppress(OSError):
+                    proc.stdin.close()
+                proc.wait()
+            dwnld_file.close()
 
         # Log the download speed
         ending = time.time()
@@ -399,6 +448,13 @@ class DownloadHandler(Action):
             round(ending - beginning, 2),
             round(downloaded_size / (1024 * 1024 * (ending - beginning)), 2),
         )
+        for stage in stages:
+            self.logger.debug(
+                "%s: %0.2fs busy (%0.2fMB/s)",
+                stage.name,
+                round(stage.elapsed, 2),
+                round(stage.speed(), 2),
+            )
 
         # If the remote server uses "Content-Encoding: gzip", this calculation will be wrong
         # because requests will decompress the file on the fly, creating a larger file than
@@ -416,21 +472,13 @@ class DownloadHandler(Action):
         self.set_namespace_data(
             action="download-action", label="file", key=self.key, value=self.fname
         )
-        self.set_namespace_data(
-            action="download-action", label=self.key, key="md5", value=md5.hexdigest()
-        )
-        self.set_namespace_data(
-            action="download-action",
-            label=self.key,
-            key="sha256",
-            value=sha256.hexdigest(),
-        )
-        self.set_namespace_data(
-            action="download-action",
-            label=self.key,
-            key="sha512",
-            value=sha512.hexdigest(),
-        )
+        for algorithm in hashes:
+            self.set_namespace_data(
+                action="download-action",
+                label=self.key,
+                key=algorithm,
+                value=hashes[algorithm].hexdigest(),
+            )
 
         # handle archive files
         archive = self.params.get("archive")
@@ -454,9 +502,10 @@ class DownloadHandler(Action):
                 value=target_fname_path,
             )
 
-        self._check_checksum("md5", md5.hexdigest(), md5sum)
-        self._check_checksum("sha256", sha256.hexdigest(), sha256sum)
-        self._check_checksum("sha512", sha512.hexdigest(), sha512sum)
+        for algorithm in checksums:
+            self._check_checksum(
+                algorithm, hashes[algorithm].hexdigest(), checksums[algorithm]
+            )
 
         # certain deployments need prefixes set
         if self.parameters["to"] == "tftp" or self.parameters["to"] == "nbd":
@@ -487,25 +536,13 @@ class DownloadHandler(Action):
         if "lava-xnbd" in self.parameters and nbdroot:
             self.parameters["lava-xnbd"]["nbdroot"] = nbdroot
 
-        self.results = {
-            "label": self.key,
-            "size": downloaded_size,
-            "md5sum": str(
-                self.get_namespace_data(
-                    action="download-action", label=self.key, key="md5"
-                )
-            ),
-            "sha256sum": str(
-                self.get_namespace_data(
-                    action="download-action", label=self.key, key="sha256"
-                )
-            ),
-            "sha512sum": str(
+        self.results = {"label": self.key, "size": downloaded_size}
+        for algorithm in hashes:
+            self.results[algorithm + "sum"] = str(
                 self.get_namespace_data(
-                    action="download-action", label=self.key, key="sha512"
+                    action="download-action", label=self.key, key=algorithm
                 )
-            ),
-        }
+            )
         return connection
 
 
@@ -550,6 +587,10 @@ class HttpDownloadAction(DownloadHandler):
     description = "use http to download the file"
     summary = "http download"
 
+    def __init__(self, key, path, url, uniquify=True, params=None):
+        super().__init__(key, path, url, uniquify=uniquify, params=params)
+        self.prefetched = None
+
     def validate(self):
         super().validate()
         res = None
@@ -566,6 +607,18 @@ class HttpDownloadAction(DownloadHandler):
                     self.errors = "Invalid http_url_format_string: '%s'" % str(exc)
                     return
 
+            # Use the file already downloaded by lava-worker, if any
+            prefetch_dir = self.job.parameters["dispatcher"].get("prefetch_dir")
+            if prefetch_dir:
+                path = os.path.join(prefetch_dir, prefetch_filename(self.params["url"]))
+                with contextlib.suppress(OSError):
+                    self.size = os.stat(path).st_size
+                    self.prefetched = path
+                    self.logger.info(
+                        "Using prefetched file for '%s'", self.params["url"]
+                    )
+                    return
+
             self.logger.debug("Validating that %s exists", self.url.geturl())
             # Force the non-use of Accept-Encoding: gzip, this will permit to know the final size
             res = requests_retry().head(
@@ -601,6 +654,22 @@ class HttpDownloadAction(DownloadHandler):
                 res.close()
 
     def reader(self):
+        if self.prefetched:
+            try:
+                reader = open(self.prefetched, "rb")
+            except OSError as exc:
+                self.logger.warning(
+                    "Unable to open prefetched file %s: %s", self.prefetched, exc
+                )
+                self.prefetched = None
+            else:
+                with reader:
+                    buff = reader.read(FILE_DOWNLOAD_CHUNK_SIZE)
+                    while buff:
+                        yield buff
+                        buff = reader.read(FILE_DOWNLOAD_CHUNK_SIZE)
+                return
+
         res = None
         try:
             # FIXME: When requests 3.0 is released, use the enforce_content_length
@@ -25,9 +25,11 @@ import glob
 import shutil
 import tarfile
 from lava_dispatcher.action import Action, Pipeline
+from lava_common.constants import OVERLAY_CACHE_SIZE
 from lava_common.exceptions import InfrastructureError, LAVABug
 from lava_dispatcher.actions.deploy.testdef import TestDefinitionAction
 from lava_dispatcher.logical import Deployment
+from lava_dispatcher.utils.compression import GzipCache, create_tarball
 from lava_dispatcher.utils.contextmanager import chdir
 from lava_dispatcher.utils.filesystem import check_ssh_identity_file
 from lava_dispatcher.utils.shell import which
@@ -580,17 +582,32 @@ class CompressOverlay(Action):
             self.logger.error(self.errors)
             return connection
         connection = super().run(connection, max_end_time)
+
+        # The content of the big files (test definition repositories, ...)
+        # is compressed once and reused by the next jobs.
+        cache = None
+        dispatcher = self.job.parameters.get("dispatcher", {})
+        if dispatcher.get("overlay_cache_path"):
+            cache = GzipCache(
+                dispatcher["overlay_cache_path"],
+                dispatcher.get("overlay_cache_size", OVERLAY_CACHE_SIZE),
+            )
+
         with chdir(location):
+            paths = [".%s" % lava_test_results_dir]
+            # ssh authorization support
+            if os.path.exists("./root/"):
+                paths.append(".%s" % "/root/")
             try:
-                with tarfile.open(output, "w:gz") as tar:
-                    tar.add(".%s" % lava_test_results_dir)
-                    # ssh authorization support
-                    if os.path.exists("./root/"):
-                        tar.add(".%s" % "/root/")
-            except tarfile.TarError as exc:
+                stats = create_tarball(output, paths, cache)
+            except (OSError, tarfile.TarError) as exc:
                 raise InfrastructureError(
                     "Unable to create lava overlay tarball: %s" % exc
                 )
+        if cache is not None:
+            self.logger.debug(
+                "Overlay cache: %d hits, %d misses", stats["hits"], stats["misses"]
+            )
 
         self.set_namespace_data(
             action=self.name, label="output", key="file", value=output
@@ -18,29 +18,35 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
-# List just the subclasses supported for this base strategy
-# imported by the parser to populate the list of subclasses.
+# Map the "to" deploy parameter to the modules defining the strategies
+# that can accept it. Only the modules used by the job are imported by the
+# parser, in the order of this registry.
 
-# pylint: disable=unused-import
-
-from lava_dispatcher.actions.deploy.docker import Docker
-from lava_dispatcher.actions.deploy.download import Download
-from lava_dispatcher.actions.deploy.downloads import Downloads
-from lava_dispatcher.actions.deploy.image import DeployImages
-from lava_dispatcher.actions.deploy.iso import DeployIso
-from lava_dispatcher.actions.deploy.fastboot import Fastboot
-from lava_dispatcher.actions.deploy.flasher import Flasher
-from lava_dispatcher.actions.deploy.fvp import FVP
-from lava_dispatcher.actions.deploy.lxc import Lxc
-from lava_dispatcher.actions.deploy.overlay import Overlay
-from lava_dispatcher.actions.deploy.nbd import Nbd
-from lava_dispatcher.actions.deploy.nfs import Nfs
-from lava_dispatcher.actions.deploy.removable import MassStorage
-from lava_dispatcher.actions.deploy.mps import Mps
-from lava_dispatcher.actions.deploy.musca import Musca
-from lava_dispatcher.actions.deploy.ssh import Ssh
-from lava_dispatcher.actions.deploy.tftp import Tftp
-from lava_dispatcher.actions.deploy.uboot_ums import UBootUMS
-from lava_dispatcher.actions.deploy.vemsd import VExpressMsd
-from lava_dispatcher.actions.deploy.recovery import RecoveryMode
-from lava_dispatcher.actions.deploy.uuu import UUU
+STRATEGIES = {
+    "docker": ["lava_dispatcher.actions.deploy.docker"],
+    "download": ["lava_dispatcher.actions.deploy.download"],
+    "downloads": ["lava_dispatcher.actions.deploy.downloads"],
+    "tmpfs": ["lava_dispatcher.actions.deploy.image"],
+    "nfs": [
+        "lava_dispatcher.actions.deploy.image",
+        "lava_dispatcher.actions.deploy.nfs",
+    ],
+    "iso-installer": ["lava_dispatcher.actions.deploy.iso"],
+    "fastboot": ["lava_dispatcher.actions.deploy.fastboot"],
+    "flasher": ["lava_dispatcher.actions.deploy.flasher"],
+    "fvp": ["lava_dispatcher.actions.deploy.fvp"],
+    "lxc": ["lava_dispatcher.actions.deploy.lxc"],
+    "overlay": ["lava_dispatcher.actions.deploy.overlay"],
+    "nbd": ["lava_dispatcher.actions.deploy.nbd"],
+    "sata": ["lava_dispatcher.actions.deploy.removable"],
+    "sd": ["lava_dispatcher.actions.deploy.removable"],
+    "usb": ["lava_dispatcher.actions.deploy.removable"],
+    "mps": ["lava_dispatcher.actions.deploy.mps"],
+    "musca": ["lava_dispatcher.actions.deploy.musca"],
+    "ssh": ["lava_dispatcher.actions.deploy.ssh"],
+    "tftp": ["lava_dispatcher.actions.deploy.tftp"],
+    "u-boot-ums": ["lava_dispatcher.actions.deploy.uboot_ums"],
+    "vemsd": ["lava_dispatcher.actions.deploy.vemsd"],
+    "recovery": ["lava_dispatcher.actions.deploy.recovery"],
+    "uuu": ["lava_dispatcher.actions.deploy.uuu"],
+}
@@ -31,7 +31,11 @@ from lava_common.decorators import nottest
 from lava_common.exceptions import InfrastructureError, JobError, LAVABug, TestError
 from lava_dispatcher.action import Action, Pipeline
 from lava_dispatcher.utils.vcs import GitHelper
-from lava_common.constants import DEFAULT_TESTDEF_NAME_CLASS, DISPATCHER_DOWNLOAD_DIR
+from lava_common.constants import (
+    DEFAULT_TESTDEF_NAME_CLASS,
+    DISPATCHER_DOWNLOAD_DIR,
+    GIT_CACHE_TTL,
+)
 from lava_dispatcher.utils.compression import untar_file
 
 
@@ -255,9 +259,81 @@ class GitRepoAction(RepoAction):
             self.errors = "Path to YAML file not specified in the job definition"
         if not self.valid:
             return
-        self.vcs = GitHelper(self.parameters["repository"])
+        dispatcher = self.job.parameters.get("dispatcher", {})
+        self.vcs = GitHelper(
+            self.parameters["repository"],
+            cache_dir=dispatcher.get("git_cache_path"),
+            cache_ttl=dispatcher.get("git_cache_ttl", GIT_CACHE_TTL),
+        )
         super().validate()
 
+        # Record which test definitions share the same checkout
+        checkouts = (
+            self.get_namespace_data(
+                action="repo-action", label="git-checkouts", key="users"
+            )
+            or {}
+        )
+        users = checkouts.setdefault(self.checkout_key(), [])
+        if self.uuid not in users:
+            users.append(self.uuid)
+        self.set_namespace_data(
+            action="repo-action", label="git-checkouts", key="users", value=checkouts
+        )
+
+    def checkout_key(self):
+        revision = self.parameters.get("revision")
+        return "%s|%s|%s|%s|%s" % (
+            self.parameters["repository"],
+            revision,
+            self.parameters.get("branch"),
+            False if revision else self.parameters.get("shallow", True),
+            self.parameters.get("history", True),
+        )
+
+    def checkout(self, runner_path, shallow, revision, branch, history):
+        """
+        Clone the repository into runner_path.
+
+        When the same checkout is used by several test definitions, the
+        repository is cloned only once, in a job temporary directory, and
+        copied for each test definition.
+        """
+        key = self.checkout_key()
+        users = self.get_namespace_data(
+            action="repo-action", label="git-checkouts", key="users"
+        )
+        if not users or len(users.get(key, [])) < 2:
+            return self.vcs.clone(
+                runner_path,
+                shallow=shallow,
+                revision=revision,
+                branch=branch,
+                history=history,
+            )
+
+        clones = (
+            self.get_namespace_data(
+                action="repo-action", label="git-checkouts", key="clones"
+            )
+            or {}
+        )
+        if key in clones and os.path.isdir(clones[key]["path"]):
+            self.logger.info(
+                "Reusing the checkout of %s", self.parameters["repository"]
+            )
+        else:
+            path = os.path.join(self.job.mkdtemp(self.name), "repository")
+            commit_id = self.vcs.clone(
+                path, shallow=shallow, revision=revision, branch=branch, history=history
+            )
+            clones[key] = {"path": path, "commit": commit_id}
+            self.set_namespace_data(
+                action="repo-action", label="git-checkouts", key="clones", value=clones
+            )
+        shutil.copytree(clones[key]["path"], runner_path, symlinks=True)
+        return clones[key]["commit"]
+
     @classmethod
     def accepts(cls, repo_type):
         return repo_type == "git"
@@ -298,7 +374,7 @@ class GitRepoAction(RepoAction):
         if not revision:
             shallow = self.parameters.get("shallow", True)
 
-        commit_id = self.vcs.clone(
+        commit_id = self.checkout(
             runner_path,
             shallow=shallow,
             revision=revision,
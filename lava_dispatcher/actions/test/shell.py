@@ -35,6 +35,7 @@ from lava_common.exceptions import (
 from lava_dispatcher.action import Action, Pipeline
 from lava_dispatcher.logical import LavaTest, RetryAction
 from lava_dispatcher.connection import SignalMatch
+from lava_dispatcher.shell import ShellSelector
 
 
 def handle_testcase(params):
@@ -175,6 +176,7 @@ class TestShellAction(Action):
         # noinspection PyTypeChecker
         self.pattern = PatternFixup(testdef=None, count=0)
         self.current_run = None
+        self.selector = None
 
     def _reset_patterns(self):
         # Extend the list of patterns when creating subclasses.
@@ -306,7 +308,7 @@ class TestShellAction(Action):
         connection.wait()
 
         try:
-            feedbacks = []
+            self.selector = ShellSelector()
             for feedback_ns in self.data.keys():
                 feedback_connection = self.get_namespace_data(
                     action="shared",
@@ -318,10 +320,8 @@ class TestShellAction(Action):
                 if feedback_connection == connection:
                     continue
                 if feedback_connection:
-                    self.logger.debug(
-                        "Will listen to feedbacks from '%s' for 1 second", feedback_ns
-                    )
-                    feedbacks.append((feedback_ns, feedback_connection))
+                    self.logger.debug("Will listen to feedbacks from '%s'", feedback_ns)
+                    self.selector.register(feedback_ns, feedback_connection)
 
             with connection.test_connection() as test_connection:
                 # the structure of lava-test-runner means that there is just one TestAction and it must run all definitions
@@ -339,28 +339,15 @@ class TestShellAction(Action):
                     test_connection.timeout,
                 )
 
-                # Because of the feedbacks, we use a small value for the
-                # timeout.  This allows to grab feedback regularly.
-                last_check = time.time()
+                # The feedbacks are logged by the selector while waiting for
+                # the test connection.
                 while self._keep_running(
                     test_connection, test_connection.timeout, connection.check_char
                 ):
-                    # Only grab the feedbacks every test_connection.timeout
-                    if feedbacks and time.time() - last_check > test_connection.timeout:
-                        for feedback in feedbacks:
-                            # The timeout is really small because the goal is only
-                            # to clean the buffer of the feedback connections:
-                            # the characters are already in the buffer.
-                            # With an higher timeout, this can have a big impact on
-                            # the performances of the overall loop.
-                            bytes_read = feedback[1].listen_feedback(timeout=1)
-                            if bytes_read > 1:
-                                self.logger.debug(
-                                    "Listened to connection for namespace '%s' done",
-                                    feedback[0],
-                                )
-                        last_check = time.time()
+                    pass
         finally:
+            self.selector.close()
+            self.selector = None
             if self.current_run is not None:
                 self.logger.error("Marking unfinished test run as failed")
                 self.current_run["duration"] = "%.02f" % (time.time() - self.start)
@@ -679,7 +666,14 @@ class TestShellAction(Action):
             self.logger.info(
                 "Test case result pattern: %r" % self.patterns["test_case_results"]
             )
-        retval = test_connection.expect(list(self.patterns.values()), timeout=timeout)
+        if self.selector is None:
+            retval = test_connection.expect(
+                list(self.patterns.values()), timeout=timeout
+            )
+        else:
+            retval = self.selector.expect(
+                test_connection, list(self.patterns.values()), timeout
+            )
         return self.check_patterns(
             list(self.patterns.keys())[retval], test_connection, check_char
         )
@@ -18,13 +18,17 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
-# List just the subclasses supported for this base strategy
-# imported by the parser to populate the list of subclasses.
+# Map the test parameters to the modules defining the strategies that can
+# accept them. Only the modules used by the job are imported by the parser,
+# in the order of this registry.
 
-# pylint: disable=unused-import
-
-from lava_dispatcher.actions.test.shell import TestShell
-from lava_dispatcher.actions.test.multinode import MultinodeTestShell
-from lava_dispatcher.actions.test.monitor import TestMonitor
-from lava_dispatcher.actions.test.interactive import TestInteractive
-from lava_dispatcher.actions.test.docker import DockerTestShell
+STRATEGIES = {
+    "definitions": [
+        "lava_dispatcher.actions.test.shell",
+        "lava_dispatcher.actions.test.multinode",
+        "lava_dispatcher.actions.test.docker",
+    ],
+    "definition": ["lava_dispatcher.actions.test.docker"],
+    "monitors": ["lava_dispatcher.actions.test.monitor"],
+    "interactive": ["lava_dispatcher.actions.test.interactive"],
+}
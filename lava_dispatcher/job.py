@@ -71,6 +71,8 @@ class Job:
         self.base_overrides = {}
         self.started = False
         self.test_info = {}
+        # Set by lava-run to profile the actions
+        self.profiler = None
 
     @property
     def context(self):
@@ -18,6 +18,7 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
+import importlib
 import time
 from lava_dispatcher.action import Action
 from lava_common.exceptions import (
@@ -30,6 +31,26 @@ from lava_common.exceptions import (
 from lava_dispatcher.utils.strings import seconds_to_str
 
 
+def strategy_candidates(base, keys):
+    """
+    Import the modules registered in the strategies registry of base for
+    the given keys and return the subclasses of base that they define.
+    When none of the keys is registered, every registered module is
+    imported so that the error lists the reasons of every strategy.
+    The candidates are returned in the order of the registry.
+    """
+    registry = importlib.import_module(base.strategies).STRATEGIES
+    selected = [key for key in registry if key in keys] or list(registry)
+    modules = []
+    for key in selected:
+        for module in registry[key]:
+            if module not in modules:
+                modules.append(module)
+                importlib.import_module(module)
+    subclasses = base.__subclasses__()
+    return [c for module in modules for c in subclasses if c.__module__ == module]
+
+
 class RetryAction(Action):
     """
     RetryAction support failure_retry and repeat.
@@ -141,6 +162,7 @@ class Deployment:
     priority = 0
     section = "deploy"
     compatibility = 0
+    strategies = "lava_dispatcher.actions.deploy.strategies"
 
     @property
     def parameters(self):
@@ -199,7 +221,7 @@ class Deployment:
     @classmethod
     def select(cls, device, parameters):
         cls.deploy_check(device, parameters)
-        candidates = cls.__subclasses__()
+        candidates = strategy_candidates(cls, [parameters["to"]])
         replies = {}
         willing = []
         for c in candidates:
@@ -234,6 +256,7 @@ class Boot:
     priority = 0
     section = "boot"
     compatibility = 0
+    strategies = "lava_dispatcher.actions.boot.strategies"
 
     @classmethod
     def boot_check(cls, device, parameters):
@@ -267,7 +290,7 @@ class Boot:
     @classmethod
     def select(cls, device, parameters):
         cls.boot_check(device, parameters)
-        candidates = cls.__subclasses__()
+        candidates = strategy_candidates(cls, [parameters["method"]])
         replies = {}
         willing = []
         for c in candidates:
@@ -303,6 +326,7 @@ class LavaTest:
     priority = 1
     section = "test"
     compatibility = 1  # used directly
+    strategies = "lava_dispatcher.actions.test.strategies"
 
     @classmethod
     def accepts(cls, device, parameters):
@@ -316,7 +340,7 @@ class LavaTest:
 
     @classmethod
     def select(cls, device, parameters):
-        candidates = cls.__subclasses__()
+        candidates = strategy_candidates(cls, parameters)
         replies = {}
         willing = []
         for c in candidates:
@@ -29,9 +29,6 @@ from lava_dispatcher.connection import Protocol
 # Bring in the strategy subclass lists, ignore pylint warnings.
 # pylint: disable=unused-import
 from lava_dispatcher.actions.commands import CommandAction
-import lava_dispatcher.actions.deploy.strategies
-import lava_dispatcher.actions.boot.strategies
-import lava_dispatcher.actions.test.strategies
 import lava_dispatcher.protocols.strategies
 
 
@@ -38,6 +38,9 @@ from lava_common.exceptions import (
 )
 from lava_common.constants import LAVA_MULTINODE_SYSTEM_TIMEOUT
 
+# Requests that the coordinator can keep until the group condition is met
+BLOCKING_REQUESTS = ["group_data", "lava_sync", "lava_wait", "lava_wait_all"]
+
 
 class MultinodeProtocol(Protocol):
     """
@@ -163,15 +166,18 @@ class MultinodeProtocol(Protocol):
                 return json.dumps({"response": "wait"})
             msg_count = int(header, 16)
             recv_count = 0
-            response = ""
+            chunks = []
             while recv_count < msg_count:
-                response += self.sock.recv(self.blocks).decode("utf-8")
-                recv_count += self.blocks
+                chunk = self.sock.recv(min(self.blocks, msg_count - recv_count))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                recv_count += len(chunk)
         except OSError as exc:
             self.logger.exception("socket error '%d' on response", exc.errno)
             self.sock.close()
             return json.dumps({"response": "wait"})
-        return response
+        return b"".join(chunks).decode("utf-8")
 
     def poll(self, message, timeout=None):
         """
@@ -194,6 +200,11 @@ class MultinodeProtocol(Protocol):
         c_iter = 0
         response = None
         delay = self.settings["poll_delay"]
+        # Ask the coordinator to keep the request until the group condition is
+        # met, instead of polling. Older coordinators ignore the "block" key.
+        request = json.loads(message)
+        blocking = request["request"] in BLOCKING_REQUESTS
+        start = time.monotonic()
         self.logger.debug(
             "Connecting to LAVA Coordinator on %s:%s timeout=%d seconds.",
             self.settings["coordinator_hostname"],
@@ -207,14 +218,19 @@ class MultinodeProtocol(Protocol):
             else:
                 delay += 2
                 continue
+            waited = max(c_iter, int(time.monotonic() - start))
             if not c_iter % int(10 * self.settings["poll_delay"]):
                 self.logger.debug(
                     "sending message: %s waited %s of %s seconds",
-                    json.loads(message)["request"],
-                    c_iter,
+                    request["request"],
+                    waited,
                     timeout,
                 )
+            if blocking:
+                request["block"] = max(1, timeout - waited)
+                message = json.dumps(request)
             # blocking synchronous call
+            sent = time.monotonic()
             if not self._send_message(message):
                 continue
             self.sock.shutdown(socket.SHUT_WR)
@@ -228,10 +244,11 @@ class MultinodeProtocol(Protocol):
                 break
             if json_data["response"] != "wait":
                 break
-            else:
+            elif time.monotonic() - sent < delay:
+                # Not blocked by the coordinator
                 time.sleep(delay)
             # apply the default timeout to each poll operation.
-            if c_iter > timeout:
+            if max(c_iter, time.monotonic() - start) > timeout:
                 self.finalise_protocol()
                 raise MultinodeProtocolTimeoutError("protocol %s timed out" % self.name)
         return response
@@ -21,6 +21,7 @@
 import contextlib
 import logging
 import pexpect
+import selectors
 import sre_constants
 import time
 from lava_dispatcher.action import Action
@@ -34,6 +35,7 @@ from lava_common.exceptions import (
 from lava_common.timeout import Timeout
 from lava_dispatcher.connection import Connection
 from lava_common.constants import LINE_SEPARATOR
+from lava_dispatcher.utils.profiler import blocking
 from lava_dispatcher.utils.strings import seconds_to_str
 
 
@@ -167,18 +169,32 @@ class ShellCommand(pexpect.spawn):
         the TestShellAction make much more useful reports of what was matched
         """
         try:
-            proc = super().expect(*args, **kw)
+            with blocking():
+                return self._expect(*args, **kw)
+        except pexpect.TIMEOUT:
+            raise TestError("ShellCommand command timed out.")
+
+    def expect_available(self, pattern):
+        """
+        Match the pattern against the output received so far, without
+        waiting for more output.
+        :return: the index of the matching pattern or None
+        """
+        with contextlib.suppress(pexpect.TIMEOUT):
+            return self._expect(pattern, timeout=0)
+        return None
+
+    def _expect(self, *args, **kw):
+        try:
+            return super().expect(*args, **kw)
         except sre_constants.error as exc:
             msg = "Invalid regular expression '%s': %s" % (exc.pattern, exc.msg)
             raise TestError(msg)
-        except pexpect.TIMEOUT:
-            raise TestError("ShellCommand command timed out.")
         except ValueError as exc:
             raise TestError(exc)
         except pexpect.EOF:
             # FIXME: deliberately closing the connection (and starting a new one) needs to be supported.
             raise ConnectionClosedError("Connection closed")
-        return proc
 
     def empty_buffer(self):
         """Make sure there is nothing in the pexpect buffer."""
@@ -330,6 +346,87 @@ class ShellSession(Connection):
         return index
 
 
+class ShellSelector:
+    """
+    Wait for the output of a ShellCommand while logging the output of the
+    feedback connections as soon as it arrives.
+
+    All the connections are watched at once with a selector instead of
+    polling each feedback connection in turn.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.logger = logging.getLogger("dispatcher")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.selector.close()
+
+    def register(self, namespace, connection):
+        """
+        Log the output of the connection as feedback from namespace.
+        """
+        if not connection.raw_connection:
+            return
+        try:
+            self.selector.register(
+                connection.raw_connection.child_fd,
+                selectors.EVENT_READ,
+                (namespace, connection),
+            )
+        except (KeyError, ValueError):
+            # Already registered or already closed
+            return
+
+    def _read_feedback(self, key):
+        (namespace, connection) = key.data
+        connection.listen_feedback(timeout=0)
+        if not connection.raw_connection or connection.raw_connection.flag_eof:
+            self.logger.debug("Connection for namespace '%s' closed", namespace)
+            self.selector.unregister(key.fd)
+
+    def expect(self, test_connection, pattern, timeout):
+        """
+        Same as test_connection.expect(pattern, timeout=timeout) but the
+        feedback connections are read while waiting.
+        """
+        if not self.selector.get_map():
+            return test_connection.expect(pattern, timeout=timeout)
+
+        patterns = pattern if isinstance(pattern, list) else [pattern]
+        # pexpect.TIMEOUT would match as soon as no output is available
+        indexes = [i for (i, p) in enumerate(patterns) if p is not pexpect.TIMEOUT]
+        available = [patterns[i] for i in indexes]
+
+        end_time = time.monotonic() + timeout
+        if test_connection.child_fd in self.selector.get_map():
+            # The test connection is not a feedback connection
+            self.selector.unregister(test_connection.child_fd)
+        self.selector.register(test_connection.child_fd, selectors.EVENT_READ)
+        try:
+            while True:
+                index = test_connection.expect_available(available)
+                if index is not None:
+                    return indexes[index]
+                remaining = end_time - time.monotonic()
+                if remaining <= 0:
+                    # Let pexpect handle the timeout
+                    return test_connection.expect(pattern, timeout=0)
+                with blocking():
+                    events = self.selector.select(remaining)
+                for (key, _) in events:
+                    if key.data:
+                        self._read_feedback(key)
+        finally:
+            self.selector.unregister(test_connection.child_fd)
+
+
 class ExpectShellSession(Action):
     """
     Waits for a shell connection to the device for the current job.
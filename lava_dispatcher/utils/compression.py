@@ -24,10 +24,33 @@
 # android images: tar + xz,bz2,gz, or just gz,xz,bzip2
 # vexpress recovery images: any compression though usually zip
 
+import bz2
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
+import logging
+import lzma
 import os
+import posixpath
+import shutil
+import stat
 import subprocess  # nosec - internal use.
 import tarfile
+import tempfile
+import zlib
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from lava_common.constants import (
+    FILE_DOWNLOAD_CHUNK_SIZE,
+    GZIP_CHUNK_SIZE,
+    OVERLAY_CACHE_MIN_SIZE,
+    OVERLAY_CACHE_SIZE,
+)
 from lava_common.exceptions import InfrastructureError, JobError
 
 from lava_dispatcher.utils.contextmanager import chdir
@@ -44,6 +67,63 @@ decompress_command_map = {
 }
 
 
+# In-process decompressors, used when streaming downloads
+stream_decompress_map = {
+    "bz2": bz2.BZ2Decompressor,
+    "gz": lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+    "xz": lzma.LZMADecompressor,
+}
+stream_decompress_errors = (EOFError, OSError, ValueError, lzma.LZMAError, zlib.error)
+if zstandard is not None:
+    stream_decompress_map["zstd"] = lambda: zstandard.ZstdDecompressor().decompressobj()
+    stream_decompress_errors += (zstandard.ZstdError,)
+
+
+class StreamDecompressor:
+    """
+    Incrementally decompress a stream without spawning an external command.
+
+    Like unxz, gunzip and bunzip2, concatenated streams (as produced by pxz,
+    pigz or pbzip2) are decompressed one after the other and the null
+    padding between streams is skipped.
+    """
+
+    def __init__(self, compression):
+        if compression not in stream_decompress_map:
+            raise JobError("Cannot decompress '%s' in-process" % compression)
+        self.compression = compression
+        self._factory = stream_decompress_map[compression]
+        self._decompressor = self._factory()
+        self._pending = False
+        self._streams = 0
+
+    def decompress(self, data):
+        output = []
+        if self._streams and not self._pending:
+            # The padding may span several buffers
+            data = data.lstrip(b"\x00")
+        while data:
+            self._pending = True
+            try:
+                output.append(self._decompressor.decompress(data))
+            except stream_decompress_errors as exc:
+                raise JobError(
+                    "Unable to decompress %s data: %s" % (self.compression, exc)
+                )
+            if not getattr(self._decompressor, "eof", False):
+                break
+            data = self._decompressor.unused_data.lstrip(b"\x00")
+            self._decompressor = self._factory()
+            self._pending = False
+            self._streams += 1
+        return b"".join(output)
+
+    def flush(self):
+        if self._pending and not getattr(self._decompressor, "eof", True):
+            raise JobError("Truncated %s data" % self.compression)
+        return b""
+
+
 def compress_file(infile, compression):
     if not compression:
         return infile
@@ -89,6 +169,213 @@ def decompress_file(infile, compression):
             )
 
 
+def gzip_compress(data, level=6):
+    """
+    Compress data into a gzip member. Unlike gzip.compress, the output does
+    not depend on the current time.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class ParallelGzipWriter:
+    """
+    File-like object compressing the data written to it into a gzip file.
+
+    The data is cut into chunks that are compressed in parallel (zlib
+    releases the GIL) and written as consecutive gzip members. Concatenated
+    members are decompressed as a single stream by gzip, busybox and python.
+    Already compressed members can be inserted with write_member().
+    """
+
+    def __init__(self, fileobj, executor, chunk_size=GZIP_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.max_pending = 2 * (os.cpu_count() or 1)
+        self.buffer = []
+        self.buffered = 0
+        self.position = 0
+        self.pending = collections.deque()
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        self.buffer.append(bytes(data))
+        self.buffered += len(data)
+        self.position += len(data)
+        if self.buffered >= self.chunk_size:
+            self._submit()
+        return len(data)
+
+    def write_member(self, member, size):
+        """
+        Insert a gzip member that decompresses to size bytes.
+        """
+        self._submit()
+        self.pending.append(member)
+        self.position += size
+
+    def close(self):
+        self._submit()
+        self._drain(0)
+
+    def _submit(self):
+        if self.buffered:
+            data = b"".join(self.buffer)
+            self.buffer = []
+            self.buffered = 0
+            self.pending.append(self.executor.submit(gzip_compress, data))
+        self._drain(self.max_pending)
+
+    def _drain(self, limit):
+        while self.pending and (
+            len(self.pending) > limit
+            or isinstance(self.pending[0], bytes)
+            or self.pending[0].done()
+        ):
+            item = self.pending.popleft()
+            self.fileobj.write(item if isinstance(item, bytes) else item.result())
+
+
+class GzipCache:
+    """
+    Content addressed cache of gzip members, bounded in size.
+
+    The least recently used entries are removed by prune(). The cache is
+    only an optimization: failing to write to it is never an error.
+    """
+
+    def __init__(self, path, size=OVERLAY_CACHE_SIZE):
+        self.path = path
+        self.size = size
+        with contextlib.suppress(OSError):
+            os.makedirs(self.path, mode=0o755, exist_ok=True)
+
+    def get(self, key):
+        filename = os.path.join(self.path, key + ".gz")
+        try:
+            with open(filename, "rb") as f_in:
+                data = f_in.read()
+            os.utime(filename)
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        f_out = None
+        try:
+            # The entries are only visible once complete
+            with tempfile.NamedTemporaryFile(
+                dir=self.path, suffix=".tmp", delete=False
+            ) as f_out:
+                f_out.write(data)
+            os.replace(f_out.name, os.path.join(self.path, key + ".gz"))
+        except OSError as exc:
+            logger = logging.getLogger("dispatcher")
+            logger.warning("Unable to add %s to the overlay cache: %s", key, exc)
+            if f_out is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(f_out.name)
+
+    def prune(self):
+        entries = []
+        try:
+            # The temporary files of the jobs writing to the cache are skipped
+            for entry in os.scandir(self.path):
+                if not entry.name.endswith(".gz"):
+                    continue
+                with contextlib.suppress(OSError):
+                    stat_result = entry.stat()
+                    entries.append((stat_result.st_mtime, stat_result.st_size, entry))
+        except OSError:
+            return
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, entry) in sorted(entries, key=lambda e: e[0]):
+            if total <= self.size:
+                break
+            with contextlib.suppress(OSError):
+                os.unlink(entry.path)
+            total -= size
+
+
+def create_tarball(output, paths, cache=None, min_size=OVERLAY_CACHE_MIN_SIZE):
+    """
+    Create a gzip compressed tarball of the given paths, like
+    tarfile.open(output, "w:gz") and tar.add() would do.
+
+    The tarball is compressed in parallel. When a GzipCache is given, the
+    compressed content of the files bigger than min_size is stored in the
+    cache, keyed by the hash of the content, and reused by the next calls.
+    Only the tar headers, that depend on the file names, and the small files
+    are compressed every time.
+
+    Return the number of cache hits and misses.
+    """
+    stats = {"hits": 0, "misses": 0}
+
+    def compress_file(tar, writer, executor, name, tarinfo):
+        blocks, remainder = divmod(tarinfo.size, tarfile.BLOCKSIZE)
+        if remainder:
+            blocks += 1
+        padding = blocks * tarfile.BLOCKSIZE - tarinfo.size
+
+        sha256 = hashlib.sha256()
+        with open(name, "rb") as f_in:
+            for data in iter(lambda: f_in.read(GZIP_CHUNK_SIZE), b""):
+                sha256.update(data)
+        key = sha256.hexdigest()
+
+        member = cache.get(key)
+        if member is None:
+            stats["misses"] += 1
+            futures = []
+            with open(name, "rb") as f_in:
+                for data in iter(lambda: f_in.read(GZIP_CHUNK_SIZE), b""):
+                    futures.append(executor.submit(gzip_compress, data))
+            futures.append(executor.submit(gzip_compress, tarfile.NUL * padding))
+            member = b"".join(future.result() for future in futures)
+            cache.put(key, member)
+        else:
+            stats["hits"] += 1
+
+        # Write the header and the cached content directly, tarfile does
+        # not know about gzip members.
+        header = tarinfo.tobuf(tar.format, tar.encoding, tar.errors)
+        writer.write(header)
+        writer.write_member(member, tarinfo.size + padding)
+        tar.offset += len(header) + tarinfo.size + padding
+
+    def add(tar, writer, executor, name):
+        tarinfo = tar.gettarinfo(name)
+        if tarinfo is None:
+            return
+        if tarinfo.isreg():
+            if cache is not None and tarinfo.size >= min_size:
+                compress_file(tar, writer, executor, name, tarinfo)
+            else:
+                with open(name, "rb") as f_in:
+                    tar.addfile(tarinfo, f_in)
+        else:
+            tar.addfile(tarinfo)
+        if tarinfo.isdir():
+            for filename in sorted(os.listdir(name)):
+                add(tar, writer, executor, os.path.join(name, filename))
+
+    with open(output, "wb") as f_out:
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            writer = ParallelGzipWriter(f_out, executor)
+            with tarfile.open(fileobj=writer, mode="w") as tar:
+                for path in paths:
+                    add(tar, writer, executor, path)
+            writer.close()
+
+    if cache is not None:
+        cache.prune()
+    return stats
+
+
 def untar_file(infile, outdir):
     try:
         with tarfile.open(infile, encoding="utf-8") as tar:
@@ -137,3 +424,332 @@ def uncpio(filename, directory):
             raise InfrastructureError(
                 "Unable to extract cpio archive %r: %s" % (filename, exc)
             )
+
+
+# newc (SVR4 without checksum) cpio format, as used by the kernel initramfs
+# https://www.kernel.org/doc/Documentation/early-userspace/buffer-format.txt
+CPIO_NEWC_MAGIC = b"070701"
+CPIO_NEWC_HEADER_SIZE = 110
+CPIO_TRAILER = "TRAILER!!!"
+
+
+def _cpio_name(name):
+    name = posixpath.normpath("/" + name).lstrip("/")
+    return name
+
+
+def _cpio_padding(offset):
+    return (4 - offset % 4) % 4
+
+
+class _ChunkReader:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def _fill(self, size):
+        while len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer.extend(chunk)
+
+    def peek(self, size):
+        self._fill(size)
+        return bytes(self.buffer[:size])
+
+    def read(self, size):
+        self._fill(size)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.offset += len(data)
+        return data
+
+    def skip(self, size):
+        while size:
+            self._fill(1)
+            if not self.buffer:
+                break
+            length = min(size, len(self.buffer))
+            del self.buffer[:length]
+            self.offset += length
+            size -= length
+        return size == 0
+
+
+def cpio_listing(filename, compression=None):
+    """
+    List the entries of a (possibly compressed) newc cpio archive without
+    extracting it.
+
+    Like the kernel, concatenated archives and null padding are accepted.
+    Return a dictionary of the normalized names, mapped to a (mode, target)
+    tuple, target being the destination of symlinks or None.
+    """
+
+    def chunks(f_in):
+        decompressor = StreamDecompressor(compression) if compression else None
+        while True:
+            data = f_in.read(FILE_DOWNLOAD_CHUNK_SIZE)
+            if not data:
+                break
+            if decompressor is not None:
+                data = decompressor.decompress(data)
+            yield data
+        if decompressor is not None:
+            decompressor.flush()
+
+    entries = {}
+    try:
+        with open(filename, "rb") as f_in:
+            reader = _ChunkReader(chunks(f_in))
+            base = None
+            while True:
+                if base is None:
+                    # Skip the padding between archives
+                    while reader.peek(1) == b"\x00":
+                        reader.read(1)
+                    base = reader.offset
+                header = reader.read(CPIO_NEWC_HEADER_SIZE)
+                if not header:
+                    break
+                if len(header) != CPIO_NEWC_HEADER_SIZE or not header.startswith(
+                    CPIO_NEWC_MAGIC
+                ):
+                    raise JobError("Invalid cpio archive %r: not newc" % filename)
+                fields = [int(header[i : i + 8], 16) for i in range(6, 110, 8)]
+                mode, filesize, namesize = fields[1], fields[6], fields[11]
+                name = reader.read(namesize)[:-1].decode("utf-8", errors="replace")
+                reader.read(_cpio_padding(reader.offset - base))
+                if name == CPIO_TRAILER:
+                    base = None
+                    continue
+                target = None
+                if stat.S_ISLNK(mode):
+                    data = reader.read(filesize)
+                    target = data.decode("utf-8", errors="replace")
+                    complete = len(data) == filesize
+                else:
+                    complete = reader.skip(filesize)
+                if not complete:
+                    raise JobError("Invalid cpio archive %r: truncated" % filename)
+                reader.read(_cpio_padding(reader.offset - base))
+                entries[_cpio_name(name)] = (mode, target)
+    except ValueError as exc:
+        raise JobError("Invalid cpio archive %r: %s" % (filename, exc))
+    except OSError as exc:
+        raise InfrastructureError("Unable to read %r: %s" % (filename, exc))
+    return entries
+
+
+class NewcWriter:
+    """
+    Stream files into a newc cpio archive, without calling cpio.
+
+    The resulting archive is meant to be appended to an existing
+    initramfs: the kernel extracts the archives one after the other,
+    overwriting the existing files. The entries of the existing archive
+    (see cpio_listing) are used to resolve the symlinks to directories,
+    like when extracting the files on top of the unpacked ramdisk, and to
+    add the missing parent directories.
+    """
+
+    def __init__(self, fileobj, entries=None):
+        self.fileobj = fileobj
+        self.entries = dict(entries or {})
+        self.offset = 0
+        self.ino = 0
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self.offset += len(data)
+
+    def _pad(self):
+        self._write(b"\x00" * _cpio_padding(self.offset))
+
+    def _header(self, name, mode, uid=0, gid=0, mtime=0, size=0, rdev=(0, 0)):
+        self.ino += 1
+        encoded = name.encode("utf-8") + b"\x00"
+        fields = (
+            self.ino,
+            mode,
+            uid,
+            gid,
+            2 if stat.S_ISDIR(mode) else 1,
+            int(mtime),
+            size,
+            0,
+            0,
+            rdev[0],
+            rdev[1],
+            len(encoded),
+            0,
+        )
+        self._write(CPIO_NEWC_MAGIC + b"".join(b"%08X" % f for f in fields))
+        self._write(encoded)
+        self._pad()
+
+    def _resolve(self, name, follow=False):
+        # Resolve the symlinks in the parent directories (and in the entry
+        # itself when following), as extracting on the filesystem would do.
+        for _ in range(40):
+            parts = name.split("/")
+            last = len(parts) if follow else len(parts) - 1
+            for index in range(1, last + 1):
+                prefix = "/".join(parts[:index])
+                mode, target = self.entries.get(prefix, (0, None))
+                if stat.S_ISLNK(mode):
+                    base = posixpath.dirname(prefix)
+                    if target.startswith("/"):
+                        base = ""
+                    name = _cpio_name(posixpath.join(base, target, *parts[index:]))
+                    break
+            else:
+                return name
+        raise JobError("Too many levels of symbolic links: %r" % name)
+
+    def _parents(self, name):
+        parts = name.split("/")[:-1]
+        for index in range(1, len(parts) + 1):
+            prefix = "/".join(parts[:index])
+            if prefix not in self.entries:
+                self.add(prefix, stat.S_IFDIR | 0o755)
+
+    def add(
+        self,
+        name,
+        mode,
+        uid=0,
+        gid=0,
+        mtime=0,
+        data=b"",
+        fileobj=None,
+        size=0,
+        rdev=(0, 0),
+    ):
+        name = _cpio_name(name)
+        if not name:
+            return
+        name = self._resolve(name, follow=stat.S_ISDIR(mode))
+        if not name:
+            return
+        self._parents(name)
+        if fileobj is None:
+            size = len(data)
+        self._header(name, mode, uid, gid, mtime, size, rdev)
+        if fileobj is None:
+            self._write(data)
+        else:
+            copied = 0
+            while copied < size:
+                buff = fileobj.read(min(FILE_DOWNLOAD_CHUNK_SIZE, size - copied))
+                if not buff:
+                    raise InfrastructureError("Unable to read %r: truncated" % name)
+                self._write(buff)
+                copied += len(buff)
+        self._pad()
+        target = data.decode("utf-8", errors="replace") if stat.S_ISLNK(mode) else None
+        self.entries[name] = (mode, target)
+
+    def add_tarfile(self, filename, path="/"):
+        """
+        Add the content of a tarball, relative to path.
+        """
+        path = _cpio_name(path)
+        try:
+            with tarfile.open(filename, encoding="utf-8") as tar:
+                for member in tar:
+                    name = posixpath.join(path, member.name)
+                    attrs = {
+                        "uid": member.uid,
+                        "gid": member.gid,
+                        "mtime": member.mtime,
+                    }
+                    mode = member.mode & 0o7777
+                    if member.isdir():
+                        self.add(name, stat.S_IFDIR | mode, **attrs)
+                    elif member.issym():
+                        self.add(
+                            name,
+                            stat.S_IFLNK | 0o777,
+                            data=member.linkname.encode("utf-8"),
+                            **attrs
+                        )
+                    elif member.isreg() or member.islnk():
+                        # Hard links are stored as copies
+                        self.add(
+                            name,
+                            stat.S_IFREG | mode,
+                            fileobj=tar.extractfile(member),
+                            size=tar.getmember(member.linkname).size
+                            if member.islnk()
+                            else member.size,
+                            **attrs
+                        )
+                    elif member.ischr() or member.isblk() or member.isfifo():
+                        kind = (
+                            stat.S_IFCHR
+                            if member.ischr()
+                            else stat.S_IFBLK
+                            if member.isblk()
+                            else stat.S_IFIFO
+                        )
+                        self.add(
+                            name,
+                            kind | mode,
+                            rdev=(member.devmajor, member.devminor),
+                            **attrs
+                        )
+        except tarfile.TarError as exc:
+            raise JobError("Unable to unpack %s: %s" % (filename, str(exc)))
+        except OSError as exc:
+            raise InfrastructureError("Unable to unpack %s: %s" % (filename, str(exc)))
+
+    def add_directory(self, directory):
+        """
+        Add the content of a directory, like "find . | cpio" would do.
+        """
+        try:
+            for root, dirs, files in os.walk(directory):
+                dirs.sort()
+                for name in dirs + sorted(files):
+                    full = os.path.join(root, name)
+                    st = os.lstat(full)
+                    attrs = {"uid": st.st_uid, "gid": st.st_gid, "mtime": st.st_mtime}
+                    rel = os.path.relpath(full, directory)
+                    if stat.S_ISLNK(st.st_mode):
+                        self.add(
+                            rel,
+                            st.st_mode,
+                            data=os.fsencode(os.readlink(full)),
+                            **attrs
+                        )
+                    elif stat.S_ISREG(st.st_mode):
+                        with open(full, "rb") as f_in:
+                            self.add(
+                                rel, st.st_mode, fileobj=f_in, size=st.st_size, **attrs
+                            )
+                    else:
+                        rdev = (os.major(st.st_rdev), os.minor(st.st_rdev))
+                        self.add(rel, st.st_mode, rdev=rdev, **attrs)
+        except OSError as exc:
+            raise InfrastructureError("Unable to archive %s: %s" % (directory, exc))
+
+    def close(self):
+        self._header(CPIO_TRAILER, 0)
+        self._pad()
+
+
+def append_cpio(image, segment):
+    """
+    Append a (possibly compressed) cpio archive to an initramfs.
+    The kernel requires uncompressed archives to be aligned on 4 bytes and
+    skips the null padding.
+    """
+    try:
+        with open(image, "ab") as f_out, open(segment, "rb") as f_in:
+            f_out.write(b"\x00" * _cpio_padding(f_out.tell()))
+            shutil.copyfileobj(f_in, f_out, FILE_DOWNLOAD_CHUNK_SIZE)
+    except OSError as exc:
+        raise InfrastructureError("Unable to append to %s: %s" % (image, exc))
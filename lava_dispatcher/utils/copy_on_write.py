@@ -0,0 +1,251 @@
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA Dispatcher.
+#
+# LAVA Dispatcher is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# LAVA Dispatcher is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along
+# with this program; if not, see <http://www.gnu.org/licenses>.
+
+import copy
+
+import yaml
+
+from lava_common.compat import Dumper, SafeDumper
+
+# Values that can be shared without copying
+ATOMIC_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+def cow_copy(value, stats=None):
+    """
+    Return a copy of value that can be modified without altering value.
+
+    Plain dictionaries and lists are copied lazily: only the top level is
+    copied, and the nested dictionaries and lists are copied when they are
+    accessed. Atomic values are shared and any other object is deep copied.
+    """
+    if isinstance(value, ATOMIC_TYPES):
+        return value
+    if stats is not None:
+        stats.copies += 1
+    if type(value) is dict:
+        return CopyOnWriteDict(value, stats)
+    if type(value) is list:
+        return CopyOnWriteList(value, stats)
+    if type(value) is tuple and all(isinstance(v, ATOMIC_TYPES) for v in value):
+        return value
+    if stats is not None:
+        stats.deepcopies += 1
+    return copy.deepcopy(value)
+
+
+class CopyOnWriteDict(dict):
+    """
+    Shallow copy of a dictionary, copying the nested values on access.
+
+    Every method returning a value goes through __getitem__ so that the
+    original nested values are never handed out.
+    """
+
+    def __init__(self, value, stats=None):
+        super().__init__(value)
+        self._shared = set(
+            k for (k, v) in value.items() if not isinstance(v, ATOMIC_TYPES)
+        )
+        self._stats = stats
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if key in self._shared:
+            self._shared.discard(key)
+            value = cow_copy(value, self._stats)
+            super().__setitem__(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._shared.discard(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._shared.discard(key)
+        super().__delitem__(key)
+
+    def __iter__(self):
+        # Overriding __iter__ prevents dict(), {**d} and dict.update() from
+        # reading the underlying dictionary directly.
+        return super().__iter__()
+
+    def __copy__(self):
+        return dict(self.items())
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self.items()), memo)
+
+    def __reduce__(self):
+        return (dict, (dict(self.items()),))
+
+    def copy(self):
+        return self.__copy__()
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(k, self[k]) for k in self]
+
+    def values(self):
+        return [self[k] for k in self]
+
+    def pop(self, key, *args):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super().pop(key, *args)
+
+    def popitem(self):
+        if not self:
+            raise KeyError("popitem(): dictionary is empty")
+        key = list(self)[-1]
+        return (key, self.pop(key))
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self):
+        self._shared.clear()
+        super().clear()
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+class CopyOnWriteList(list):
+    """
+    Shallow copy of a list, copying the nested values on access.
+    """
+
+    def __init__(self, value, stats=None):
+        super().__init__(value)
+        self._shared = [not isinstance(v, ATOMIC_TYPES) for v in value]
+        self._stats = stats
+
+    def _resolve(self, index):
+        if self._shared[index]:
+            self._shared[index] = False
+            value = cow_copy(super().__getitem__(index), self._stats)
+            super().__setitem__(index, value)
+        return super().__getitem__(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._resolve(i) for i in range(*index.indices(len(self)))]
+        return self._resolve(index)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            data = list(self)
+            data[index] = value
+            self.clear()
+            self.extend(data)
+            return
+        self._shared[index] = False
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        del self._shared[index]
+        super().__delitem__(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._resolve(index)
+
+    def __reversed__(self):
+        for index in reversed(range(len(self))):
+            yield self._resolve(index)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __mul__(self, count):
+        return list(self) * count
+
+    def __imul__(self, count):
+        data = list(self) * count
+        self.clear()
+        self.extend(data)
+        return self
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(list(self), memo)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def copy(self):
+        return self.__copy__()
+
+    def append(self, value):
+        self._shared.append(False)
+        super().append(value)
+
+    def extend(self, values):
+        values = list(values)
+        self._shared.extend([False] * len(values))
+        super().extend(values)
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def insert(self, index, value):
+        self._shared.insert(index, False)
+        super().insert(index, value)
+
+    def pop(self, index=-1):
+        value = self._resolve(index)
+        del self[index]
+        return value
+
+    def remove(self, value):
+        del self[self.index(value)]
+
+    def clear(self):
+        self._shared.clear()
+        super().clear()
+
+    def reverse(self):
+        data = list(self)
+        data.reverse()
+        self.clear()
+        self.extend(data)
+
+    def sort(self, *args, **kwargs):
+        data = list(self)
+        data.sort(*args, **kwargs)
+        self.clear()
+        self.extend(data)
+
+
+# The copies are serialized like the original values
+for dumper in set([yaml.Dumper, yaml.SafeDumper, Dumper, SafeDumper]):
+    dumper.add_representer(CopyOnWriteDict, dumper.represent_dict)
+    dumper.add_representer(CopyOnWriteList, dumper.represent_list)
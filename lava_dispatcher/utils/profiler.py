@@ -0,0 +1,121 @@
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA Dispatcher.
+#
+# LAVA Dispatcher is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# LAVA Dispatcher is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along
+# with this program; if not, see <http://www.gnu.org/licenses>.
+
+import contextlib
+import resource
+import time
+
+from lava_common.compat import yaml_safe_dump
+
+
+# Time spent waiting for the connections, since the start of the process
+_blocked = 0.0
+
+
+@contextlib.contextmanager
+def blocking():
+    """
+    Account the time spent in the block as time blocked on a connection.
+    """
+    global _blocked
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        _blocked += time.monotonic() - start
+
+
+def blocked_time():
+    return _blocked
+
+
+class Profiler:
+    """
+    Record the wall time, cpu time, growth of the peak rss, the time spent
+    blocked on the connections and the reads of the namespace data for each
+    action.
+
+    Only a few system calls are done at the start and the end of each
+    action so the profiler can be left enabled in production.
+    Nested actions are included in the measures of their parents.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def _sample(self):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return (
+            time.monotonic(),
+            time.process_time(),
+            children.ru_utime + children.ru_stime,
+            blocked_time(),
+            usage.ru_maxrss,
+            children.ru_maxrss,
+        )
+
+    def _namespace_sample(self, action):
+        stats = action.namespace_stats
+        return (stats.reads, stats.copies, stats.deepcopies, stats.duration)
+
+    def start(self, action):
+        record = {
+            "level": action.level,
+            "name": action.name,
+            "namespace": action.parameters.get("namespace", "common"),
+        }
+        self.records.append(record)
+        return (record, action, self._sample(), self._namespace_sample(action))
+
+    def stop(self, token, failed=False):
+        (record, action, start, ns_start) = token
+        end = self._sample()
+        ns_end = self._namespace_sample(action)
+        record.update(
+            {
+                "wall": round(end[0] - start[0], 6),
+                "cpu": round(end[1] - start[1], 6),
+                "cpu_children": round(end[2] - start[2], 6),
+                "blocked": round(end[3] - start[3], 6),
+                # ru_maxrss is the peak of the whole process lifetime, in
+                # kilobytes on Linux: only report how much the action raised it
+                "max_rss": end[4] - start[4],
+                "max_rss_children": end[5] - start[5],
+                # Reads and copies of the namespace data, nested actions
+                # excluded
+                "namespace_reads": ns_end[0] - ns_start[0],
+                "namespace_copies": ns_end[1] - ns_start[1],
+                "namespace_deepcopies": ns_end[2] - ns_start[2],
+                "namespace_time": round(ns_end[3] - ns_start[3], 6),
+                "result": "fail" if failed else "pass",
+            }
+        )
+
+    def report(self):
+        # Only count the top level actions: the measures are cumulative
+        top = [r for r in self.records if "." not in str(r["level"]) and "wall" in r]
+        total = {
+            key: round(sum(r[key] for r in top), 6)
+            for key in ["wall", "cpu", "cpu_children", "blocked"]
+        }
+        return {"actions": self.records, "total": total}
+
+    def write(self, filename):
+        with open(filename, "w", encoding="utf-8") as f_out:
+            f_out.write(yaml_safe_dump(self.report(), default_flow_style=False))
@@ -0,0 +1,99 @@
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA Dispatcher.
+#
+# LAVA Dispatcher is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# LAVA Dispatcher is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along
+# with this program; if not, see <http://www.gnu.org/licenses>.
+
+import queue
+import threading
+import time
+
+from lava_common.constants import STREAM_QUEUE_DEPTH
+
+
+class StreamStage(threading.Thread):
+    """
+    Process the buffers of a stream (hashing, decompression, writing to
+    disk, ...) in a dedicated thread.
+
+    Buffers are handed over through a bounded queue: a slow stage applies
+    back pressure on the producer without slowing down the other stages.
+    An exception raised by the stage is re-raised in the producer thread,
+    by the next call to put() or by close().
+    """
+
+    def __init__(self, name, process, finish=None, depth=STREAM_QUEUE_DEPTH):
+        super().__init__(name=name, daemon=True)
+        self.process = process
+        self.finish = finish
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.size = 0
+        self.elapsed = 0.0
+        self.start()
+
+    def run(self):
+        while True:
+            buff = self.queue.get()
+            if buff is None:
+                break
+            # Keep draining the queue on error so that the producer is never
+            # blocked on a full queue.
+            if self.error is not None:
+                continue
+            beginning = time.monotonic()
+            try:
+                self.process(buff)
+            except Exception as exc:
+                self.error = exc
+            self.elapsed += time.monotonic() - beginning
+            self.size += len(buff)
+
+        if self.error is None and self.finish is not None:
+            beginning = time.monotonic()
+            try:
+                self.finish()
+            except Exception as exc:
+                self.error = exc
+            self.elapsed += time.monotonic() - beginning
+
+    def put(self, buff):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(buff)
+
+    def close(self):
+        self.queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def abort(self):
+        """
+        Stop the stage, discarding any error. Used when the producer failed.
+        """
+        if self.is_alive():
+            self.error = self.error or StopIteration()
+            self.queue.put(None)
+            self.join()
+
+    def speed(self):
+        """
+        Return the throughput of the stage in MB/s, not counting the time
+        spent waiting for buffers.
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.size / (1024 * 1024 * self.elapsed)
@@ -18,11 +18,17 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
+import contextlib
+import fcntl
+import hashlib
 import logging
 import os
+import pathlib
 import shutil
 import subprocess  # nosec - internal use.
+import time
 
+from lava_common.constants import GIT_CACHE_TTL
 from lava_common.exceptions import InfrastructureError
 
 
@@ -43,20 +49,112 @@ class GitHelper(VCSHelper):
       commit_id = git.clone('destination')
       commit_id = git.clone('destination2, 'hash')
 
+    When cache_dir is set, the repository is fetched into a bare mirror kept
+    in cache_dir and shared by every job running on the worker. The mirror is
+    only refreshed when older than cache_ttl seconds or when the requested
+    revision or branch is missing. The destination is then cloned from this
+    local mirror.
+
     This helper will raise a InfrastructureError for any error encountered.
     """
 
-    def __init__(self, url):
+    def __init__(self, url, cache_dir=None, cache_ttl=GIT_CACHE_TTL):
         super().__init__(url)
         self.binary = "/usr/bin/git"
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+
+    def _run(self, *args):
+        logger = logging.getLogger("dispatcher")
+        cmd_args = [self.binary] + list(args)
+        logger.debug("Running '%s'", " ".join(cmd_args))
+        return subprocess.check_output(  # nosec - internal use.
+            cmd_args, stderr=subprocess.STDOUT
+        )
+
+    def _has_ref(self, mirror, ref):
+        try:
+            self._run("-C", mirror, "rev-parse", "--quiet", "--verify", ref)
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+    @contextlib.contextmanager
+    def mirror(self, revision=None, branch=None):
+        """
+        Create or refresh the bare mirror of the repository and yield its path.
+
+        The mirror is protected by a lock file: it's updated under an
+        exclusive lock and cloned from under a shared lock.
+        """
+        logger = logging.getLogger("dispatcher")
+        os.makedirs(self.cache_dir, mode=0o755, exist_ok=True)
+        name = hashlib.sha256(self.url.encode("utf-8")).hexdigest()
+        mirror = os.path.join(self.cache_dir, name + ".git")
+        stamp = os.path.join(mirror, "lava-fetched")
+
+        with open(mirror + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if not os.path.exists(stamp):
+                    if os.path.exists(mirror):
+                        shutil.rmtree(mirror)
+                    logger.info("Creating git mirror of %s", self.url)
+                    self._run("clone", "--mirror", self.url, mirror)
+                else:
+                    age = time.time() - os.stat(stamp).st_mtime
+                    missing = (
+                        revision is not None
+                        and not self._has_ref(mirror, "%s^{commit}" % revision)
+                    ) or (
+                        branch is not None
+                        and not self._has_ref(mirror, "refs/heads/%s" % branch)
+                    )
+                    if age >= self.cache_ttl or missing:
+                        logger.info("Updating git mirror of %s", self.url)
+                        self._run("-C", mirror, "remote", "update", "--prune")
+                    else:
+                        logger.info(
+                            "Using git mirror of %s (%ds old)", self.url, int(age)
+                        )
+                        stamp = None
+                if stamp is not None:
+                    pathlib.Path(stamp).touch()
+            except subprocess.CalledProcessError as exc:
+                if exc.stdout:
+                    logger.warning(exc.stdout.decode("utf-8", errors="replace"))
+                raise InfrastructureError(
+                    "Unable to update the git mirror of '%s'" % (self.url)
+                )
+            # Allow other jobs to clone from the mirror at the same time
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            yield mirror
 
     def clone(self, dest_path, shallow=False, revision=None, branch=None, history=True):
+        logger = logging.getLogger("dispatcher")
+        if self.cache_dir is not None:
+            try:
+                with self.mirror(revision, branch) as mirror:
+                    # Local clones hardlink the objects. Use a file:// url for
+                    # shallow clones, otherwise --depth is ignored.
+                    if shallow:
+                        mirror = "file://" + mirror
+                    return self._clone(
+                        mirror, dest_path, shallow, revision, branch, history
+                    )
+            except (InfrastructureError, OSError) as exc:
+                logger.warning("Unable to use the git cache: %s", exc)
+                if os.path.exists(dest_path):
+                    shutil.rmtree(dest_path)
+        return self._clone(self.url, dest_path, shallow, revision, branch, history)
+
+    def _clone(self, url, dest_path, shallow, revision, branch, history):
         logger = logging.getLogger("dispatcher")
         try:
             if branch is not None:
-                cmd_args = [self.binary, "clone", "-b", branch, self.url, dest_path]
+                cmd_args = [self.binary, "clone", "-b", branch, url, dest_path]
             else:
-                cmd_args = [self.binary, "clone", self.url, dest_path]
+                cmd_args = [self.binary, "clone", url, dest_path]
 
             if shallow:
                 cmd_args.append("--depth=1")
@@ -66,6 +164,20 @@ class GitHelper(VCSHelper):
                 cmd_args, stderr=subprocess.STDOUT
             )
 
+            if url != self.url:
+                subprocess.check_output(  # nosec - internal use.
+                    [
+                        self.binary,
+                        "-C",
+                        dest_path,
+                        "remote",
+                        "set-url",
+                        "origin",
+                        self.url,
+                    ],
+                    stderr=subprocess.STDOUT,
+                )
+
             if revision is not None:
                 logger.debug("Running '%s checkout %s", self.binary, str(revision))
                 subprocess.check_output(  # nosec - internal use.
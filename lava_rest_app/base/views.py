@@ -18,8 +18,14 @@
 # along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
 
 import io
+import itertools
 import junit_xml
+import re
 import tap
+import xml.etree.ElementTree as ET
+
+from collections import deque
+from xml.sax.saxutils import quoteattr
 
 from lava_scheduler_app.models import (
     Device,
@@ -34,7 +40,8 @@ from lava_results_app.models import TestCase
 from lava_scheduler_app.logutils import logs_instance
 from linaro_django_xmlrpc.models import AuthToken
 
-from django.http.response import FileResponse, HttpResponse
+from django.db.models import Case, Count, IntegerField, Sum, When
+from django.http.response import FileResponse, HttpResponse, StreamingHttpResponse
 
 from rest_framework import status, viewsets
 from rest_framework.permissions import BasePermission
@@ -50,10 +57,10 @@ except ImportError:
 
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.exceptions import NotFound, AuthenticationFailed
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
 from lava_rest_app import filters
+from lava_rest_app.pagination import PageNumberPagination
 
 from . import serializers
 
@@ -67,6 +74,219 @@ def safe_str2int(in_value):
     return out_value
 
 
+ILLEGAL_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def testcases_batches(job, size=500):
+    """
+    Yield the test cases of the job in batches, ordered by suite and id.
+    Every test case is fetched by a single query, using a database cursor.
+    """
+    query = (
+        TestCase.objects.filter(suite__job=job)
+        .select_related("suite")
+        .order_by("suite_id", "id")
+    )
+    batch = []
+    for case in query.iterator():
+        batch.append(case)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def testcases_logs(job, cases):
+    """
+    Return the logs of the failed test cases, by test case id.
+    The logs are read in one pass, in the order of the log lines.
+    """
+    failed = sorted(
+        [
+            case
+            for case in cases
+            if case.result == TestCase.RESULT_FAIL
+            and case.start_log_line is not None
+            and case.end_log_line is not None
+        ],
+        key=lambda case: case.start_log_line,
+    )
+    ranges = [(case.start_log_line, case.end_log_line) for case in failed]
+    return {
+        case.id: logs
+        for (case, logs) in zip(failed, logs_instance.read_many(job, ranges))
+    }
+
+
+def testcase_duration(case):
+    md = case.action_metadata
+    duration = None
+    if md is not None:
+        duration = md.get("duration")
+        if duration is not None:
+            duration = float(duration)
+    return duration
+
+
+def xml_tag(tag, attributes):
+    return "<%s%s>" % (
+        tag,
+        "".join(" %s=%s" % (k, quoteattr(str(v))) for (k, v) in attributes.items()),
+    )
+
+
+def junit_stream(job):
+    """
+    Stream the junit document, with the same content as junit_xml.
+    The suite attributes are computed beforehand, with aggregate queries.
+    """
+    stats = {
+        row["suite_id"]: row
+        for row in TestCase.objects.filter(suite__job=job)
+        .order_by()
+        .values("suite_id")
+        .annotate(
+            tests=Count("id"),
+            errors=Sum(
+                Case(
+                    When(result=TestCase.RESULT_FAIL, then=1),
+                    default=0,
+                    output_field=IntegerField(),
+                )
+            ),
+            skipped=Sum(
+                Case(
+                    When(result=TestCase.RESULT_SKIP, then=1),
+                    default=0,
+                    output_field=IntegerField(),
+                )
+            ),
+        )
+    }
+    # Only parse the metadata that could contain a duration
+    durations = {}
+    times = {}
+    for case in (
+        TestCase.objects.filter(suite__job=job, metadata__contains="duration")
+        .only("id", "suite_id", "metadata")
+        .iterator()
+    ):
+        duration = testcase_duration(case)
+        if duration:
+            durations[case.id] = duration
+            times[case.suite_id] = times.get(case.suite_id, 0) + duration
+
+    def suite_tag(suite_id, name):
+        row = stats.get(suite_id, {})
+        return "\t%s\n" % xml_tag(
+            "testsuite",
+            {
+                "disabled": 0,
+                "errors": row.get("errors", 0),
+                "failures": 0,
+                "name": name,
+                "skipped": row.get("skipped", 0),
+                "tests": row.get("tests", 0),
+                "time": times.get(suite_id, 0),
+            },
+        )
+
+    suites = deque(job.testsuite_set.all().order_by("id").values_list("id", "name"))
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield ILLEGAL_XML_CHARS.sub(
+        "",
+        "%s\n"
+        % xml_tag(
+            "testsuites",
+            {
+                "disabled": 0,
+                "errors": sum(row["errors"] for row in stats.values()),
+                "failures": 0,
+                "tests": sum(row["tests"] for row in stats.values()),
+                "time": float(sum(times.values())),
+            },
+        ),
+    )
+
+    current = None
+    for batch in testcases_batches(job):
+        logs = testcases_logs(job, batch)
+        data = []
+        for (suite_id, cases) in itertools.groupby(batch, key=lambda c: c.suite_id):
+            cases = list(cases)
+            if suite_id != current:
+                if current is not None:
+                    data.append("\t</testsuite>\n")
+                # Empty suites
+                while suites and suites[0][0] < suite_id:
+                    data.append(suite_tag(*suites.popleft()))
+                    data.append("\t</testsuite>\n")
+                if suites and suites[0][0] == suite_id:
+                    suites.popleft()
+                data.append(suite_tag(suite_id, cases[0].suite.name))
+                current = suite_id
+
+            # Build the test case junit objects
+            tcs = []
+            for case in cases:
+                tc = junit_xml.TestCase(
+                    case.name,
+                    elapsed_sec=durations.get(case.id),
+                    classname=case.suite.name,
+                    timestamp=case.logged,
+                )
+                if case.result == TestCase.RESULT_FAIL:
+                    # TODO: is this of any use? (yaml inside xml!)
+                    tc.add_error_info("failed", output=logs.get(case.id))
+                elif case.result == TestCase.RESULT_SKIP:
+                    tc.add_skipped_info("skipped")
+                tcs.append(tc)
+            element = junit_xml.TestSuite(cases[0].suite.name, tcs).build_xml_doc()
+            for child in element:
+                data.append("\t\t%s\n" % ET.tostring(child, encoding="unicode"))
+        yield ILLEGAL_XML_CHARS.sub("", "".join(data))
+
+    data = []
+    if current is not None:
+        data.append("\t</testsuite>\n")
+    for suite in suites:
+        data.append(suite_tag(*suite))
+        data.append("\t</testsuite>\n")
+    data.append("</testsuites>\n")
+    yield ILLEGAL_XML_CHARS.sub("", "".join(data))
+
+
+def tap13_stream(job):
+    stream = io.StringIO()
+    count = TestCase.objects.filter(suite__job=job).count()
+    tracker = tap.tracker.Tracker(plan=count, streaming=True, stream=stream)
+
+    # Loop on all test cases
+    for batch in testcases_batches(job):
+        logs = testcases_logs(job, batch)
+        for case in batch:
+            suite = case.suite
+            if case.result == TestCase.RESULT_FAIL:
+                if case.id in logs:
+                    data = "\n ".join(logs[case.id].split("\n"))
+                    tracker.add_not_ok(
+                        suite.name, case.name, diagnostics=" ---\n " + data + "..."
+                    )
+                else:
+                    tracker.add_not_ok(suite.name, case.name)
+            elif case.result == TestCase.RESULT_SKIP:
+                tracker.add_skip(suite.name, case.name, "test skipped")
+            elif case.result == TestCase.RESULT_UNKNOWN:
+                tracker.add_not_ok(suite.name, case.name, "TODO unknown result")
+            else:
+                tracker.add_ok(suite.name, case.name)
+        yield stream.getvalue()
+        stream.seek(0)
+        stream.truncate()
+    yield stream.getvalue()
+
+
 class LavaObtainAuthToken(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(
@@ -140,6 +360,7 @@ class TestJobViewSet(viewsets.ModelViewSet):
         "failure_comment",
     )
     ordering_fields = ("id", "start_time", "end_time", "submit_time")
+    cursor_ordering_fields = ("id", "submit_time")
     filter_class = filters.TestJobFilter
 
     def get_queryset(self):
@@ -151,46 +372,11 @@ class TestJobViewSet(viewsets.ModelViewSet):
 
     @detail_route(methods=["get"], suffix="junit")
     def junit(self, request, **kwargs):
-        suites = []
-        for suite in self.get_object().testsuite_set.all().order_by("id"):
-            cases = []
-            for case in suite.testcase_set.all().order_by("id"):
-                # Grab the duration
-                md = case.action_metadata
-                duration = None
-                if md is not None:
-                    duration = md.get("duration")
-                    if duration is not None:
-                        duration = float(duration)
-
-                # Build the test case junit object
-                tc = junit_xml.TestCase(
-                    case.name,
-                    elapsed_sec=duration,
-                    classname=case.suite.name,
-                    timestamp=case.logged,
-                )
-                if case.result == TestCase.RESULT_FAIL:
-                    logs = None
-                    # TODO: is this of any use? (yaml inside xml!)
-                    if (
-                        case.start_log_line is not None
-                        and case.end_log_line is not None
-                    ):
-                        logs = logs_instance.read(
-                            self.get_object(), case.start_log_line, case.end_log_line
-                        )
-                    tc.add_error_info("failed", output=logs)
-                elif case.result == TestCase.RESULT_SKIP:
-                    tc.add_skipped_info("skipped")
-                cases.append(tc)
-            suites.append(junit_xml.TestSuite(suite.name, test_cases=cases))
-
-        data = junit_xml.TestSuite.to_xml_string(suites, encoding="utf-8")
-        response = HttpResponse(data, content_type="application/xml")
-        response["Content-Disposition"] = (
-            "attachment; filename=job_%d.xml" % self.get_object().id
+        job = self.get_object()
+        response = StreamingHttpResponse(
+            junit_stream(job), content_type="application/xml"
         )
+        response["Content-Disposition"] = "attachment; filename=job_%d.xml" % job.id
         return response
 
     @detail_route(methods=["get"], suffix="logs")
@@ -225,40 +411,11 @@ class TestJobViewSet(viewsets.ModelViewSet):
 
     @detail_route(methods=["get"], suffix="tap13")
     def tap13(self, request, **kwargs):
-        stream = io.StringIO()
-        count = TestCase.objects.filter(suite__job=self.get_object()).count()
-        tracker = tap.tracker.Tracker(plan=count, streaming=True, stream=stream)
-
-        # Loop on all test cases
-        for suite in self.get_object().testsuite_set.all().order_by("id"):
-            for case in suite.testcase_set.all().order_by("id"):
-                if case.result == TestCase.RESULT_FAIL:
-                    if (
-                        case.start_log_line is not None
-                        and case.end_log_line is not None
-                    ):
-                        logs = logs_instance.read(
-                            self.get_object(), case.start_log_line, case.end_log_line
-                        )
-                        logs = "\n ".join(logs.split("\n"))
-                        tracker.add_not_ok(
-                            suite.name, case.name, diagnostics=" ---\n " + logs + "..."
-                        )
-                    else:
-                        tracker.add_not_ok(suite.name, case.name)
-                elif case.result == TestCase.RESULT_SKIP:
-                    tracker.add_skip(suite.name, case.name, "test skipped")
-                elif case.result == TestCase.RESULT_UNKNOWN:
-                    tracker.add_not_ok(suite.name, case.name, "TODO unknown result")
-                else:
-                    tracker.add_ok(suite.name, case.name)
-
-        # Send back the stream
-        stream.seek(0)
-        response = HttpResponse(stream, content_type="application/yaml")
-        response["Content-Disposition"] = (
-            "attachment; filename=job_%d.yaml" % self.get_object().id
+        job = self.get_object()
+        response = StreamingHttpResponse(
+            tap13_stream(job), content_type="application/yaml"
         )
+        response["Content-Disposition"] = "attachment; filename=job_%d.yaml" % job.id
         return response
 
     @detail_route(methods=["get"], suffix="tests")
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+from rest_framework import pagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """
+    Cursor pagination on the primary key or on the fields listed in the
+    view "cursor_ordering_fields", with the primary key as tie-breaker.
+    Pages are selected with a WHERE clause on the ordering field, without
+    OFFSET nor COUNT(*).
+    """
+
+    ordering = "pk"
+    page_size_query_param = "limit"
+
+    def get_ordering(self, request, queryset, view):
+        fields = ["pk"] + list(getattr(view, "cursor_ordering_fields", []))
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM)
+        if not ordering:
+            return (self.ordering,)
+        ordering = ordering.strip()
+        field = ordering.lstrip("-")
+        if field not in fields:
+            msg = "cursor pagination requires ordering by %s" % ", ".join(fields)
+            raise ValidationError({api_settings.ORDERING_PARAM: msg})
+        if field == "pk":
+            return (ordering,)
+        return (ordering, "-pk" if ordering.startswith("-") else "pk")
+
+
+class CursorOptInMixin:
+    """
+    Use the KeysetPagination when the request has a "cursor" query
+    parameter ("?cursor=" for the first page). The other requests are
+    paginated by the parent class.
+    """
+
+    cursor_query_param = KeysetPagination.cursor_query_param
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = KeysetPagination()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+
+class LimitOffsetPagination(CursorOptInMixin, pagination.LimitOffsetPagination):
+    pass
+
+
+class PageNumberPagination(CursorOptInMixin, pagination.PageNumberPagination):
+    pass
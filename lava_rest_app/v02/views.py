@@ -25,20 +25,27 @@ import yaml
 import lava_common.schemas as schemas
 
 from django.conf import settings
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, StreamingHttpResponse
 from django.http import Http404
+from django.utils import timezone
 
 from lava_common.version import __version__
 from lava_common.compat import yaml_dump, yaml_safe_load
 from lava_results_app.models import TestSuite, TestCase
 from lava_results_app.utils import (
+    StreamEcho,
     export_testcase,
     get_testcases_with_limit,
     testcase_export_fields,
 )
 from lava_rest_app.base import views as base_views
 from lava_rest_app import filters
-from lava_scheduler_app.dbutils import testjob_submission
+from lava_scheduler_app.dbutils import (
+    submission_error_message,
+    testjob_submission,
+    testjob_submission_many,
+)
+from lava_scheduler_app.estimates import job_estimate
 from lava_scheduler_app.schema import SubmissionException
 from lava_server.files import File
 
@@ -60,6 +67,7 @@ from lava_scheduler_app.models import (
     GroupDeviceTypePermission,
     GroupDevicePermission,
     Tag,
+    TestJob,
 )
 
 from . import serializers
@@ -85,6 +93,14 @@ class TestJobViewSet(base_views.TestJobViewSet):
 
     * `/jobs/validate/`
 
+    You can submit many jobs at once via POST request on:
+
+    * `/jobs/submit_many/`
+
+    The expected duration and start time of a job are available at:
+
+    * `/jobs/<job_id>/estimate/`
+
     The logs, test results and test suites of a specific TestJob are available at:
 
     * `/jobs/<job_id>/logs/`
@@ -113,47 +129,63 @@ class TestJobViewSet(base_views.TestJobViewSet):
 
     @detail_route(methods=["get"], suffix="csv")
     def csv(self, request, **kwargs):
-        limit = request.query_params.get("limit", None)
-        offset = request.query_params.get("offset", None)
-
-        output = io.StringIO()
-        writer = csv.DictWriter(
-            output,
-            quoting=csv.QUOTE_ALL,
-            extrasaction="ignore",
-            fieldnames=testcase_export_fields(),
-        )
-        writer.writeheader()
-        for test_suite in self.get_object().testsuite_set.all():
-            for row in test_suite.testcase_set.all():
-                writer.writerow(export_testcase(row))
+        job = self.get_object()
+
+        def testjob_stream(pseudo_buffer):
+            writer = csv.DictWriter(
+                pseudo_buffer,
+                quoting=csv.QUOTE_ALL,
+                extrasaction="ignore",
+                fieldnames=testcase_export_fields(),
+            )
+            # writer.writeheader does not return the string
+            yield writer.writerow(dict(zip(writer.fieldnames, writer.fieldnames)))
+            for batch in base_views.testcases_batches(job):
+                yield "".join(writer.writerow(export_testcase(row)) for row in batch)
 
-        response = HttpResponse(output.getvalue(), content_type="application/csv")
-        response["Content-Disposition"] = (
-            "attachment; filename=job_%d.csv" % self.get_object().id
+        response = StreamingHttpResponse(
+            testjob_stream(StreamEcho()), content_type="application/csv"
         )
+        response["Content-Disposition"] = "attachment; filename=job_%d.csv" % job.id
         return response
 
     @detail_route(methods=["get"], suffix="yaml")
     def yaml(self, request, **kwargs):
-        limit = request.query_params.get("limit", None)
-        offset = request.query_params.get("offset", None)
-
-        yaml_list = []
-        for test_suite in self.get_object().testsuite_set.all():
-            for test_case in test_suite.testcase_set.all():
-                yaml_list.append(export_testcase(test_case))
-
-        response = HttpResponse(yaml_dump(yaml_list), content_type="application/yaml")
-        response["Content-Disposition"] = (
-            "attachment; filename=job_%d.yaml" % self.get_object().id
+        job = self.get_object()
+
+        def testjob_stream():
+            empty = True
+            for batch in base_views.testcases_batches(job):
+                empty = False
+                yield yaml_dump([export_testcase(test_case) for test_case in batch])
+            if empty:
+                yield yaml_dump([])
+
+        response = StreamingHttpResponse(
+            testjob_stream(), content_type="application/yaml"
         )
+        response["Content-Disposition"] = "attachment; filename=job_%d.yaml" % job.id
         return response
 
     @detail_route(methods=["get"], suffix="metadata")
     def metadata(self, request, **kwargs):
         return Response({"metadata": self.get_object().get_metadata_dict()})
 
+    @detail_route(methods=["get"], suffix="estimate")
+    def estimate(self, request, **kwargs):
+        job = self.get_object()
+        estimate = job_estimate(job)
+        data = {"duration": None, "start_time": None, "queue_wait": None}
+        if estimate["duration"] is not None:
+            data["duration"] = estimate["duration"].total_seconds()
+        if estimate["start_time"] is not None:
+            data["start_time"] = estimate["start_time"].isoformat()
+            if job.state == TestJob.STATE_SUBMITTED:
+                data["queue_wait"] = max(
+                    0, (estimate["start_time"] - timezone.now()).total_seconds()
+                )
+        return Response(data)
+
     @action(methods=["post"], detail=False, suffix="validate")
     def validate(self, request, **kwargs):
         definition = request.data.get("definition", None)
@@ -174,6 +206,33 @@ class TestJobViewSet(base_views.TestJobViewSet):
                 {"message": "Job invalid: %s" % exc.msg}, status=status.HTTP_200_OK
             )
 
+    @action(methods=["post"], detail=False, suffix="submit_many")
+    def submit_many(self, request, **kwargs):
+        definitions = request.data.get("definitions", None)
+        if not definitions or not isinstance(definitions, list):
+            raise ValidationError(
+                {"definitions": "A list of test job definitions is required."}
+            )
+
+        results = []
+        for job in testjob_submission_many(definitions, self.request.user):
+            if isinstance(job, Exception):
+                results.append({"error": submission_error_message(job)})
+            elif isinstance(job, list):
+                results.append({"job_ids": [j.sub_id for j in job]})
+            else:
+                results.append({"job_ids": [job.id]})
+
+        if any("job_ids" in result for result in results):
+            return Response(
+                {"message": "job(s) successfully submitted", "results": results},
+                status=status.HTTP_201_CREATED,
+            )
+        return Response(
+            {"message": "no job submitted", "results": results},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
     @action(methods=["post"], detail=True, suffix="resubmit")
     def resubmit(self, request, **kwargs):
         if self.get_object().is_multinode:
@@ -263,21 +263,29 @@ class ResultsAPI(ExposedAPI):
                 "refresh all queries." % self.user.username,
             )
 
+        # Refresh every query before reporting the failures
+        code = 400
+        errors = []
         for query in Query.objects.all().filter(is_live=False):
             try:
                 query.refresh_view()
             except QueryUpdatedError:
-                raise xmlrpc.client.Fault(
-                    400,
+                errors.append(
                     "Query with name %s owned by user %s was recently refreshed."
-                    % (query.name, self.user.username),
+                    % (query.name, query.owner.username)
                 )
             except Exception as exc:
-                raise xmlrpc.client.Fault(
-                    401,
-                    "Refresh operation for query with name %s owned by user %s failed. Please contact system administrator. Error: %s"
-                    % (query.name, query.owner.username, str(exc)),
+                code = 401
+                errors.append(
+                    "Refresh operation for query with name %s owned by user %s failed. Error: %s"
+                    % (query.name, query.owner.username, str(exc))
                 )
+        if errors:
+            raise xmlrpc.client.Fault(
+                code,
+                "%d queries were not refreshed. Please contact system administrator.\n%s"
+                % (len(errors), "\n".join(errors)),
+            )
 
     def get_testjob_results_yaml(self, job_id):
         """
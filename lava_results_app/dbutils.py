@@ -27,6 +27,8 @@ from urllib.parse import quote
 
 from collections import OrderedDict  # pylint: disable=unused-import
 
+from django.contrib.contenttypes.models import ContentType
+
 from lava_common.compat import yaml_dump, yaml_load, yaml_safe_load
 from lava_common.version import __version__
 from lava_results_app.models import (
@@ -36,6 +38,7 @@ from lava_results_app.models import (
     TestData,
     ActionData,
     MetaType,
+    NamedTestAttribute,
 )
 from lava_common.timeout import Timeout
 
@@ -329,17 +332,22 @@ def _get_action_metadata(data):
     return retval
 
 
-def build_action(action_data, testdata, submission):
+def build_action(action_data, testdata, submission, meta_types, test_cases):
+    """
+    Return the unsaved ActionData for this action or None.
+    :param meta_types: the MetaType already used, by (name, metatype)
+    :param test_cases: the lava test cases of the job, by action level
+    """
     # test for a known section
     logger = logging.getLogger("lava-master")
     if "section" not in action_data:
         logger.warning("Invalid action data - missing section")
-        return
+        return None
 
     metatype = MetaType.get_section(action_data["section"])
     if metatype is None:  # 0 is allowed
         logger.debug("Unrecognised metatype in action_data: %s", action_data["section"])
-        return
+        return None
     # lookup the type from the job definition.
     type_name = MetaType.get_type_name(action_data, submission)
     if not type_name:
@@ -348,39 +356,56 @@ def build_action(action_data, testdata, submission):
             action_data["section"],
             MetaType.TYPE_CHOICES[metatype],
         )
-        return
-    action_meta, _ = MetaType.objects.get_or_create(name=type_name, metatype=metatype)
+        return None
+    if (type_name, metatype) not in meta_types:
+        meta_types[(type_name, metatype)], _ = MetaType.objects.get_or_create(
+            name=type_name, metatype=metatype
+        )
     max_retry = action_data.get("max_retries")
 
-    # find corresponding test case
-    match_case = None
-    test_cases = TestCase.objects.filter(
-        suite__job=testdata.testjob, suite__name="lava"
-    )
-    for case in test_cases:
-        if case.action_metadata:
-            if case.action_metadata.get("level") == action_data["level"]:
-                match_case = case
-
     # maps the static testdata derived from the definition to the runtime pipeline construction
-    ActionData.objects.create(
+    return ActionData(
         action_name=action_data["name"],
         action_level=action_data["level"],
         action_summary=action_data["summary"],
         testdata=testdata,
         action_description=action_data["description"],
-        meta_type=action_meta,
+        meta_type=meta_types[(type_name, metatype)],
         max_retries=max_retry,
         timeout=int(Timeout.parse(action_data["timeout"])),
-        testcase=match_case,
+        testcase=test_cases.get(action_data["level"]),
     )
 
 
-def walk_actions(data, testdata, submission):
+def walk_actions(data, testdata, submission, meta_types, test_cases):
+    """
+    Return the unsaved ActionData of the pipeline, depth first.
+    """
+    actions = []
     for action in data:
-        build_action(action, testdata, submission)
+        action_data = build_action(action, testdata, submission, meta_types, test_cases)
+        if action_data is not None:
+            actions.append(action_data)
         if "pipeline" in action:
-            walk_actions(action["pipeline"], testdata, submission)
+            actions.extend(
+                walk_actions(
+                    action["pipeline"], testdata, submission, meta_types, test_cases
+                )
+            )
+    return actions
+
+
+def _get_lava_test_cases(job):
+    """
+    Return the test cases of the lava test suite, by action level.
+    When several test cases match the same level, the last one is used.
+    """
+    test_cases = {}
+    for case in TestCase.objects.filter(suite__job=job, suite__name="lava"):
+        metadata = case.action_metadata
+        if metadata and metadata.get("level") is not None:
+            test_cases[metadata["level"]] = case
+    return test_cases
 
 
 def map_metadata(description, job):
@@ -417,17 +442,18 @@ def map_metadata(description, job):
     if "job" not in description_data:
         logger.warning("[%s] skipping description without a job.", job.id)
         return False
+    attributes = []
     action_values = _get_action_metadata(description_data["job"]["actions"])
     for key, value in action_values.items():
         if not key or not value:
             logger.warning("[%s] Missing element in job. %s: %s", job.id, key, value)
             continue
-        testdata.attributes.create(name=key, value=value)
+        attributes.append((key, value))
 
     # get common job metadata
     job_metadata = _get_job_metadata(job)
     for key, value in job_metadata.items():
-        testdata.attributes.create(name=key, value=value)
+        attributes.append((key, value))
 
     # get metadata from device
     device_values = {}
@@ -436,7 +462,7 @@ def map_metadata(description, job):
         if not key or not value:
             logger.warning("[%s] Missing element in device. %s: %s", job.id, key, value)
             continue
-        testdata.attributes.create(name=key, value=value)
+        attributes.append((key, value))
 
     # Add metadata from job submission data.
     if "metadata" in submission_data:
@@ -447,9 +473,27 @@ def map_metadata(description, job):
                     "[%s] Missing element in job. %s: %s", job.id, key, value
                 )
                 continue
-            testdata.attributes.create(name=key, value=value)
+            attributes.append((key, value))
 
-    walk_actions(description_data["pipeline"], testdata, submission_data)
+    content_type = ContentType.objects.get_for_model(TestData)
+    NamedTestAttribute.objects.bulk_create(
+        [
+            NamedTestAttribute(
+                content_type=content_type, object_id=testdata.id, name=key, value=value
+            )
+            for (key, value) in attributes
+        ]
+    )
+
+    ActionData.objects.bulk_create(
+        walk_actions(
+            description_data["pipeline"],
+            testdata,
+            submission_data,
+            {},
+            _get_lava_test_cases(job),
+        )
+    )
     return True
 
 
@@ -18,6 +18,8 @@
 # along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
 
 import sys
+import time
+
 from django.core.management.base import BaseCommand
 from lava_results_app.models import Query, QueryUpdatedError, RefreshLiveQueryError
 
@@ -37,11 +39,30 @@ class Command(BaseCommand):
         parser.add_argument(
             "--all", dest="all", action="store_true", help="Refresh all queries"
         )
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Refresh the queries affected by the jobs finished since their "
+            "last refresh, once their staleness budget is spent",
+        )
+        parser.add_argument(
+            "--loop",
+            type=int,
+            default=0,
+            metavar="SECONDS",
+            help="With --stale, look for stale queries every SECONDS seconds",
+        )
 
     def handle(self, *args, **options):
-        if not options["name"] and not options["all"]:
-            self.stderr.write("Please specify a query or use --all")
+        if not options["name"] and not options["all"] and not options["stale"]:
+            self.stderr.write("Please specify a query or use --all or --stale")
             sys.exit(2)
+        if options["stale"]:
+            while True:
+                self._refresh_stale_queries()
+                if not options["loop"]:
+                    return
+                time.sleep(options["loop"])
         query_name = options["name"]
         if query_name:
             if not options["username"]:
@@ -64,6 +85,19 @@ class Command(BaseCommand):
             for query in Query.objects.all().filter(is_live=False, is_archived=False):
                 self._refresh_query(query)
 
+    def _refresh_stale_queries(self):
+        (refreshed, failures) = Query.refresh_stale_views()
+        for query in refreshed:
+            self.stdout.write(
+                "Query with name %s owned by user %s refreshed."
+                % (query.name, query.owner.username)
+            )
+        for (query, exc) in failures:
+            self.stderr.write(
+                "Refresh operation for query with name %s owned by user %s failed: %s"
+                % (query.name, query.owner.username, str(exc))
+            )
+
     def _refresh_query(self, query):
         if query.is_archived:
             self.stderr.write(
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.12 on 2020-06-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("lava_results_app", "0018_drop_buglink")]
+
+    operations = [
+        migrations.AddField(
+            model_name="query",
+            name="staleness_budget",
+            field=models.PositiveIntegerField(
+                default=60,
+                help_text="Minimum delay between two automatic refreshes of the results",
+                verbose_name="Staleness budget (minutes)",
+            ),
+        )
+    ]
@@ -29,6 +29,7 @@ TestCase is a single lava-test-case record or Action result.
 """
 
 from datetime import timedelta
+import hashlib
 import logging
 from urllib.parse import quote
 import yaml
@@ -38,9 +39,10 @@ from django.conf import settings
 from django.contrib.auth.models import User, Group
 from django.contrib.contenttypes import fields
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models, connection, transaction
-from django.db.models import Case, IntegerField, Lookup, Q, Sum, When
+from django.db.models import Case, IntegerField, Lookup, Max, Q, Sum, When
 from django.db.models.fields import Field
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
@@ -77,6 +79,40 @@ class RefreshLiveQueryError(Exception):
     """ Error raised if refreshing the live query is attempted. """
 
 
+def _testcase_result_counts(field):
+    """
+    Aggregates counting the test cases of each result, to be used with
+    annotate() or aggregate().
+    """
+    return {
+        name: Sum(
+            Case(
+                When(**{field: value, "then": 1}),
+                default=0,
+                output_field=IntegerField(),
+            )
+        )
+        for (value, name) in TestCase.RESULT_REVERSE.items()
+    }
+
+
+def _load_metadata(metadata):
+    if not metadata:
+        return {}
+    try:
+        ret = yaml_load(metadata)
+    except yaml.YAMLError:
+        return {}
+    return ret if isinstance(ret, dict) else {}
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class Queryable:
     """All Queryable objects should inherit this."""
 
@@ -113,8 +149,10 @@ class QueryMaterializedView(MaterializedView):
         abstract = True
 
     CREATE_VIEW = "CREATE MATERIALIZED VIEW %s%s AS %s;"
+    CREATE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS %s%s_id ON %s%s (id);"
     DROP_VIEW = "DROP MATERIALIZED VIEW IF EXISTS %s%s;"
     REFRESH_VIEW = "REFRESH MATERIALIZED VIEW %s%s;"
+    REFRESH_VIEW_CONCURRENTLY = "REFRESH MATERIALIZED VIEW CONCURRENTLY %s%s;"
     VIEW_EXISTS = "SELECT EXISTS(SELECT * FROM pg_class WHERE relname='%s%s');"
     QUERY_VIEW_PREFIX = "query_"
 
@@ -134,11 +172,42 @@ class QueryMaterializedView(MaterializedView):
             # view is not created? - new field update_status?
             query_str = cls.CREATE_VIEW % (cls.QUERY_VIEW_PREFIX, query.id, query_str)
             cursor.execute(query_str)
+            if cls.supports_concurrent_refresh():
+                cls.create_index(query.id)
+
+    @classmethod
+    def create_index(cls, query_id):
+        # The unique index is required to refresh the view concurrently.
+        index_sql = cls.CREATE_INDEX % (
+            cls.QUERY_VIEW_PREFIX,
+            query_id,
+            cls.QUERY_VIEW_PREFIX,
+            query_id,
+        )
+        cursor = connection.cursor()
+        cursor.execute(index_sql)
+
+    @classmethod
+    def supports_concurrent_refresh(cls):
+        # "IF NOT EXISTS" for indexes is only available since PostgreSQL 9.5
+        return connection.vendor == "postgresql" and connection.pg_version >= 90500
 
     @classmethod
     def refresh(cls, query_id):
-        refresh_sql = cls.REFRESH_VIEW % (cls.QUERY_VIEW_PREFIX, query_id)
+        """
+        Refresh the view, without locking out the readers when the database
+        supports it.
+        """
         cursor = connection.cursor()
+        if cls.supports_concurrent_refresh():
+            # Views created by older versions do not have the index.
+            cls.create_index(query_id)
+            refresh_sql = cls.REFRESH_VIEW_CONCURRENTLY % (
+                cls.QUERY_VIEW_PREFIX,
+                query_id,
+            )
+        else:
+            refresh_sql = cls.REFRESH_VIEW % (cls.QUERY_VIEW_PREFIX, query_id)
         cursor.execute(refresh_sql)
 
     @classmethod
@@ -174,37 +243,7 @@ class TestSuite(models.Model, Queryable):
 
     def testcase_count(self, value=None):
         if not hasattr(self, "_testcase_count"):
-            res = self.testcase_set.values("result")
-            res = res.aggregate(
-                PASS=Sum(
-                    Case(
-                        When(result=TestCase.RESULT_PASS, then=1),
-                        default=0,
-                        output_field=IntegerField(),
-                    )
-                ),
-                FAIL=Sum(
-                    Case(
-                        When(result=TestCase.RESULT_FAIL, then=1),
-                        default=0,
-                        output_field=IntegerField(),
-                    )
-                ),
-                SKIP=Sum(
-                    Case(
-                        When(result=TestCase.RESULT_SKIP, then=1),
-                        default=0,
-                        output_field=IntegerField(),
-                    )
-                ),
-                UNKNOWN=Sum(
-                    Case(
-                        When(result=TestCase.RESULT_UNKNOWN, then=1),
-                        default=0,
-                        output_field=IntegerField(),
-                    )
-                ),
-            )
+            res = self.testcase_set.aggregate(**_testcase_result_counts("result"))
             self._testcase_count = {k.lower(): (v or 0) for (k, v) in res.items()}
 
         if value is None:
@@ -798,6 +837,12 @@ class Query(models.Model):
 
     last_updated = models.DateTimeField(blank=True, null=True)
 
+    staleness_budget = models.PositiveIntegerField(
+        default=60,
+        verbose_name="Staleness budget (minutes)",
+        help_text="Minimum delay between two automatic refreshes of the results",
+    )
+
     group_by_attribute = models.CharField(
         blank=True, null=True, max_length=20, verbose_name="group by attribute"
     )
@@ -990,6 +1035,81 @@ class Query(models.Model):
             self.is_updating = False
             self.save()
 
+    def is_affected(self):
+        """
+        Returns True if the results could have changed since the last refresh.
+
+        The results are coming from finished jobs, so only the jobs that
+        finished after the last refresh can add or change results.
+        """
+        if self.last_updated is None or self.is_changed or not self.has_view():
+            return True
+
+        relation = QueryCondition.RELATION_MAP[self.content_type.model_class()][TestJob]
+        end_time = "end_time__gt" if relation is None else "%s__end_time__gt" % relation
+        return (
+            Query.get_queryset(self.content_type, self.querycondition_set.all())
+            .filter(**{end_time: self.last_updated})
+            .exists()
+        )
+
+    def is_stale(self, now=None):
+        """
+        Returns True if the conditions have changed or if the view is older
+        than the staleness budget and the results could have changed.
+        """
+        if now is None:
+            now = timezone.now()
+        if self.is_changed:
+            return True
+        if self.last_updated is not None:
+            if now - self.last_updated < timedelta(minutes=self.staleness_budget):
+                return False
+        return self.is_affected()
+
+    @classmethod
+    def refresh_stale_views(cls, logger=None):
+        """
+        Refresh the views of every stale query.
+
+        A failure is logged and does not prevent the other views from being
+        refreshed.
+
+        :return: the refreshed queries and the (query, exception) failures
+        """
+        if logger is None:
+            logger = logging.getLogger("lava_results_app")
+
+        now = timezone.now()
+        # Skip the queries refreshed after the last job ended without going
+        # through their conditions.
+        last_end_time = TestJob.objects.aggregate(Max("end_time"))["end_time__max"]
+        queries = Query.objects.filter(is_live=False, is_archived=False)
+        if last_end_time is not None:
+            queries = queries.filter(
+                Q(last_updated__isnull=True)
+                | Q(last_updated__lt=last_end_time)
+                | Q(is_changed=True)
+            )
+        else:
+            queries = queries.filter(Q(last_updated__isnull=True) | Q(is_changed=True))
+
+        refreshed = []
+        failures = []
+        for query in queries.select_related("owner", "content_type"):
+            try:
+                if not query.is_stale(now):
+                    continue
+                logger.debug("Refreshing %s", query.owner_name)
+                query.refresh_view()
+                refreshed.append(query)
+            except QueryUpdatedError:
+                logger.debug("%s is already refreshing", query.owner_name)
+            except Exception as exc:
+                logger.error("Unable to refresh %s: %s", query.owner_name, exc)
+                failures.append((query, exc))
+        return (refreshed, failures)
+
     @classmethod
     def parse_conditions(cls, content_type, conditions):
         # Parse conditions from text representation.
@@ -1467,6 +1587,8 @@ class ChartQuery(models.Model):
 
     ORDER_BY_MAP = {TestJob: "end_time", TestCase: "logged", TestSuite: "job__end_time"}
 
+    CACHE_TIMEOUT = 24 * 60 * 60
+
     DATE_FORMAT = "%d/%m/%Y %H:%M"
 
     def get_data(self, user, content_type=None, conditions=None):
@@ -1483,28 +1605,26 @@ class ChartQuery(models.Model):
 
         # TODO: order by attribute if attribute is used for x-axis.
         if hasattr(self, "query"):
-            results = self.query.get_results(user).order_by(
-                self.ORDER_BY_MAP[self.query.content_type.model_class()]
-            )
+            model = self.query.content_type.model_class()
+            results = self.query.get_results(user).order_by(self.ORDER_BY_MAP[model])
         # TODO: order by attribute if attribute is used for x-axis.
         else:
+            model = content_type.model_class()
             results = Query.get_queryset(
-                content_type,
-                conditions,
-                order_by=[self.ORDER_BY_MAP[content_type.model_class()]],
+                content_type, conditions, order_by=[self.ORDER_BY_MAP[model]]
             ).visible_by_user(user)
 
-        if self.chart_type == "pass/fail":
-            chart_data["data"] = self.get_chart_passfail_data(user, results)
-
-        elif self.chart_type == "measurement":
-            # TODO: In case of job or suite, do avg measurement, and later add
-            # option to do min/max/other.
-            chart_data["data"] = self.get_chart_measurement_data(user, results)
-
-        elif self.chart_type == "attributes":
-            chart_data["data"] = self.get_chart_attributes_data(user, results)
-
+        # Only the primary keys are fetched through the (materialized) query
+        # results, the series are computed with aggregates over the tables.
+        pks = []
+        seen = set()
+        for pk in results.values_list("pk", flat=True):
+            if pk not in seen:
+                seen.add(pk)
+                pks.append(pk)
+
+        series = self.get_chart_series(model, pks)
+        chart_data["data"] = [item for pk in pks for item in series[pk]]
         return chart_data
 
     def get_basic_chart_data(self):
@@ -1558,97 +1678,303 @@ class ChartQuery(models.Model):
 
         return data
 
-    def get_chart_passfail_data(self, user, query_results):
+    def get_cache_key(self, model):
+        # The key is depending on every option used to compute the series.
+        options = "%s|%s|%s|%s" % (
+            self.chart_type,
+            model._meta.model_name,
+            self.xaxis_attribute,
+            self.attributes,
+        )
+        digest = hashlib.sha256(options.encode("utf-8")).hexdigest()
+        return "lava_results_app.chartquery.%d.%s" % (self.id, digest)
+
+    def get_chart_series(self, model, pks):
+        """
+        Returns the chart items of each object.
+
+        The items of objects from finished jobs are cached: results are only
+        added to the suites while the job is running.
+        """
+        cached = {}
+        keys = {}
+        if self.id:
+            prefix = self.get_cache_key(model)
+            keys = {pk: "%s.%d" % (prefix, pk) for pk in pks}
+            cached = cache.get_many(list(keys.values()))
+
+        series = {pk: cached[keys[pk]] for pk in pks if keys.get(pk) in cached}
+        missing = [pk for pk in pks if pk not in series]
+        if not missing:
+            return series
+
+        objects = self.get_chart_objects(model, missing)
+        if self.chart_type == "pass/fail":
+            computed = self.get_chart_passfail_data(model, objects)
+        elif self.chart_type == "measurement":
+            # TODO: In case of job or suite, do avg measurement, and later add
+            # option to do min/max/other.
+            computed = self.get_chart_measurement_data(model, objects)
+        elif self.chart_type == "attributes":
+            computed = self.get_chart_attributes_data(model, objects)
+        else:
+            computed = {}
+
+        to_cache = {}
+        for pk in missing:
+            series[pk] = computed.get(pk, [])
+            if keys and pk in objects and objects[pk]["finished"]:
+                to_cache[keys[pk]] = series[pk]
+        if to_cache:
+            cache.set_many(to_cache, self.CACHE_TIMEOUT)
+        return series
+
+    def get_chart_objects(self, model, pks):
+        """
+        Returns the fields used by the charts for each object, with a single
+        query, along with the x-axis attributes.
+        """
+        objects = {}
+        if model == TestJob:
+            for job in TestJob.objects.filter(pk__in=pks).values(
+                "id", "sub_id", "end_time", "state", "health"
+            ):
+                objects[job["id"]] = {
+                    "job": job["id"],
+                    "date": str(job["end_time"]),
+                    "link": reverse(
+                        "lava.scheduler.job.detail",
+                        args=[job["sub_id"] or job["id"]],
+                    ),
+                    "finished": job["state"] == TestJob.STATE_FINISHED,
+                    "fail": job["health"] != TestJob.HEALTH_COMPLETE,
+                }
+        elif model == TestSuite:
+            for suite in TestSuite.objects.filter(pk__in=pks).values(
+                "id", "name", "job_id", "job__end_time", "job__state"
+            ):
+                objects[suite["id"]] = {
+                    "job": suite["job_id"],
+                    "date": str(suite["job__end_time"]),
+                    "link": reverse(
+                        "lava.results.suite", args=[suite["job_id"], suite["name"]]
+                    ),
+                    "finished": suite["job__state"] == TestJob.STATE_FINISHED,
+                }
+        elif model == TestCase:
+            for case in TestCase.objects.filter(pk__in=pks).values(
+                "id",
+                "name",
+                "logged",
+                "measurement",
+                "metadata",
+                "result",
+                "suite__job_id",
+                "suite__job__state",
+            ):
+                objects[case["id"]] = {
+                    "job": case["suite__job_id"],
+                    "date": str(case["logged"]),
+                    "link": reverse("lava.results.testcase", args=[case["id"]]),
+                    "finished": case["suite__job__state"] == TestJob.STATE_FINISHED,
+                    "name": case["name"],
+                    "measurement": case["measurement"],
+                    "metadata": case["metadata"],
+                    "fail": case["result"] != TestCase.RESULT_PASS,
+                }
+
+        # Set attribute based on xaxis_attribute.
+        xaxis = {}
+        if self.xaxis_attribute:
+            jobs = set(obj["job"] for obj in objects.values())
+            xaxis = dict(
+                TestData.objects.filter(
+                    testjob_id__in=jobs, attributes__name=self.xaxis_attribute
+                ).values_list("testjob_id", "attributes__value")
+            )
+        for obj in objects.values():
+            obj["attribute"] = xaxis.get(obj["job"])
+        return objects
 
-        data = []
-        for item in query_results:
+    def get_chart_passfail_data(self, model, objects):
+        # Pass/fail charts for testcases do not make sense.
+        if model not in [TestJob, TestSuite]:
+            return {}
+
+        # Count the results of every suite in a single query.
+        passfail_results = {}
+        field = "job_id" if model == TestJob else "id"
+        suites = (
+            TestSuite.objects.filter(**{"%s__in" % field: list(objects.keys())})
+            .order_by("id")
+            .values("id", "job_id", "name")
+            .annotate(**_testcase_result_counts("testcase__result"))
+        )
+        for suite in suites:
+            passfail_results.setdefault(suite[field], {})[suite["name"]] = suite
 
-            # Set attribute based on xaxis_attribute.
-            attribute = item.get_xaxis_attribute(self.xaxis_attribute)
+        data = {}
+        for (pk, obj) in objects.items():
             # If xaxis attribute is set and this query item does not have
             # this specific attribute, ignore it.
-            if self.xaxis_attribute and not attribute:
+            if self.xaxis_attribute and not obj["attribute"]:
                 continue
+            attribute = obj["attribute"]
+            if attribute is None:
+                attribute = obj["date"]
 
-            date = str(item.get_end_datetime())
-            attribute = attribute if attribute is not None else date
-
-            passfail_results = item.get_passfail_results()
-            for result in passfail_results:
-
+            data[pk] = []
+            for (result, counts) in passfail_results.get(pk, {}).items():
                 if result:
-                    chart_item = {
-                        "id": result,
-                        "pk": item.id,
-                        "link": item.get_absolute_url(),
-                        "date": date,
-                        "attribute": attribute,
-                        "pass": passfail_results[result]["fail"] == 0,
-                        "passes": passfail_results[result]["pass"],
-                        "failures": passfail_results[result]["fail"],
-                        "skip": passfail_results[result]["skip"],
-                        "unknown": passfail_results[result]["unknown"],
-                        "total": (
-                            passfail_results[result]["pass"]
-                            + passfail_results[result]["fail"]
-                            + passfail_results[result]["unknown"]
-                            + passfail_results[result]["skip"]
-                        ),
-                    }
-                    data.append(chart_item)
+                    data[pk].append(
+                        {
+                            "id": result,
+                            "pk": pk,
+                            "link": obj["link"],
+                            "date": obj["date"],
+                            "attribute": attribute,
+                            "pass": counts["fail"] == 0,
+                            "passes": counts["pass"],
+                            "failures": counts["fail"],
+                            "skip": counts["skip"],
+                            "unknown": counts["unknown"],
+                            "total": (
+                                counts["pass"]
+                                + counts["fail"]
+                                + counts["unknown"]
+                                + counts["skip"]
+                            ),
+                        }
+                    )
 
         return data
 
-    def get_chart_measurement_data(self, user, query_results):
-
-        data = []
-        for item in query_results:
+    def get_chart_measurement_data(self, model, objects):
+
+        # Get the measurements of every object in a single query.
+        measurement_results = {}
+        if model == TestJob:
+            # Average of the measurements of each suite.
+            # TODO: add min, max
+            suites = (
+                TestSuite.objects.filter(job_id__in=list(objects.keys()))
+                .order_by("id")
+                .values("id", "job_id", "name")
+                .annotate(
+                    measurement=models.Avg("testcase__measurement"),
+                    fail=_testcase_result_counts("testcase__result")["fail"],
+                )
+            )
+            for suite in suites:
+                measurement_results.setdefault(suite["job_id"], {})[
+                    suite["name"]
+                ] = suite
+        elif model == TestSuite:
+            cases = (
+                TestCase.objects.filter(suite_id__in=list(objects.keys()))
+                .order_by("id")
+                .values("suite_id", "name", "measurement", "result")
+            )
+            for case in cases:
+                measurement_results.setdefault(case["suite_id"], {})[case["name"]] = {
+                    "measurement": case["measurement"],
+                    "fail": case["result"] != TestCase.RESULT_PASS,
+                }
+        elif model == TestCase:
+            for (pk, obj) in objects.items():
+                measurement_results[pk] = {obj["name"]: obj}
 
-            # Set attribute based on xaxis_attribute.
-            attribute = item.get_xaxis_attribute(self.xaxis_attribute)
+        data = {}
+        for (pk, obj) in objects.items():
             # If xaxis attribute is set and this query item does not have
             # this specific attribute, ignore it.
-            if self.xaxis_attribute and not attribute:
+            if self.xaxis_attribute and not obj["attribute"]:
                 continue
+            attribute = obj["attribute"]
+            if attribute is None:
+                attribute = obj["date"]
 
-            date = str(item.get_end_datetime())
-            attribute = attribute if attribute is not None else date
-
-            measurement_results = item.get_measurement_results()
-            for result in measurement_results:
-
+            data[pk] = []
+            for (result, values) in measurement_results.get(pk, {}).items():
                 if result:
-                    chart_item = {
-                        "id": result,
-                        "pk": item.id,
-                        "link": item.get_absolute_url(),
-                        "date": date,
-                        "attribute": attribute,
-                        "pass": measurement_results[result]["fail"] == 0,
-                        "measurement": measurement_results[result]["measurement"],
-                    }
-                data.append(chart_item)
+                    data[pk].append(
+                        {
+                            "id": result,
+                            "pk": pk,
+                            "link": obj["link"],
+                            "date": obj["date"],
+                            "attribute": attribute,
+                            "pass": values["fail"] == 0,
+                            "measurement": values["measurement"],
+                        }
+                    )
 
         return data
 
-    def get_chart_attributes_data(self, user, query_results):
-
-        data = []
-        for item in query_results:
+    def get_chart_attributes_data(self, model, objects):
+
+        attributes = [x.strip() for x in (self.attributes or "").split(",")]
+        attributes = [x for x in attributes if x]
+        if not attributes:
+            return {}
+
+        # Get the attribute values of every object in a single query.
+        attribute_results = {}
+        if model == TestJob:
+            values = TestData.objects.filter(
+                testjob_id__in=list(objects.keys()), attributes__name__in=attributes
+            ).values_list("testjob_id", "attributes__name", "attributes__value")
+            for (pk, name, value) in values:
+                attribute_results.setdefault(pk, {})[name] = {
+                    "fail": objects[pk]["fail"],
+                    "value": value,
+                }
+        elif model == TestSuite:
+            # Use only the metadata from the first testcase atm.
+            filters = Q()
+            for attribute in attributes:
+                filters |= Q(metadata__contains=attribute)
+            cases = (
+                TestCase.objects.filter(suite_id__in=list(objects.keys()))
+                .filter(filters)
+                .order_by("id")
+                .values_list("suite_id", "metadata", "result")
+            )
+            for (pk, metadata, result) in cases:
+                results = attribute_results.setdefault(pk, {})
+                for (key, value) in _load_metadata(metadata).items():
+                    if key in attributes and _float(value) is not None:
+                        results.setdefault(
+                            key,
+                            {"fail": result != TestCase.RESULT_PASS, "value": value},
+                        )
+        elif model == TestCase:
+            for (pk, obj) in objects.items():
+                for (key, value) in _load_metadata(obj["metadata"]).items():
+                    if key in attributes:
+                        attribute_results.setdefault(pk, {})[key] = {
+                            "fail": obj["fail"],
+                            "value": value,
+                        }
 
-            attribute_results = item.get_attribute_results(self.attributes)
-            for result in attribute_results:
-                if result:
-                    chart_item = {
-                        "id": result,
-                        "pk": item.id,
-                        "attribute": str(item.get_end_datetime()),
-                        "link": item.get_absolute_url(),
-                        "date": str(item.get_end_datetime()),
-                        "pass": attribute_results[result]["fail"] == 0,
-                        "attr_value": attribute_results[result]["value"],
-                    }
-                data.append(chart_item)
+        data = {}
+        for (pk, obj) in objects.items():
+            data[pk] = []
+            for (result, values) in attribute_results.get(pk, {}).items():
+                # Ignore non-float metadata.
+                value = _float(values["value"])
+                if result and value is not None:
+                    data[pk].append(
+                        {
+                            "id": result,
+                            "pk": pk,
+                            "attribute": obj["date"],
+                            "link": obj["link"],
+                            "date": obj["date"],
+                            "pass": values["fail"] == 0,
+                            "attr_value": value,
+                        }
+                    )
 
         return data
 
@@ -337,7 +337,6 @@ class DeviceAdmin(admin.ModelAdmin):
         "worker_host",
         "is_synced",
     )
-    raw_id_fields = ["last_health_report_job"]
 
     def get_queryset(self, request):
         return (
@@ -394,6 +393,7 @@ class DeviceAdmin(admin.ModelAdmin):
                 "fields": (
                     ("state", "health"),
                     ("last_health_report_job", "current_job"),
+                    ("last_health_report_time", "jobs_since_health_report"),
                 )
             },
         ),
@@ -410,7 +410,14 @@ class DeviceAdmin(admin.ModelAdmin):
             },
         ),
     )
-    readonly_fields = ("device_dictionary_jinja", "state", "current_job")
+    readonly_fields = (
+        "device_dictionary_jinja",
+        "state",
+        "current_job",
+        "last_health_report_job",
+        "last_health_report_time",
+        "jobs_since_health_report",
+    )
     list_display = (
         "hostname",
         "device_type",
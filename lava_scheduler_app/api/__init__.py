@@ -45,6 +45,7 @@ from lava_scheduler_app.dbutils import (
     testjob_submission,
     active_device_types,
 )
+from lava_scheduler_app.fleet import visible_fleet
 from lava_scheduler_app.schema import (
     validate_submission,
     validate_device,
@@ -90,6 +91,23 @@ def build_device_status_display(state, health):
         return "running"
 
 
+def submission_fault(exc):
+    """
+    Return the XML-RPC fault explaining why testjob_submission rejected a job.
+    """
+    if isinstance(exc, SubmissionException):
+        return xmlrpc.client.Fault(400, "Problem with submitted job data: %s" % exc)
+    if isinstance(exc, ValueError):
+        return xmlrpc.client.Fault(400, "Decoding job submission failed: %s." % exc)
+    if isinstance(exc, yaml.YAMLError):
+        return xmlrpc.client.Fault(400, "Invalid job definition: %s." % exc)
+    if isinstance(exc, (Device.DoesNotExist, DeviceType.DoesNotExist)):
+        return xmlrpc.client.Fault(404, "Specified device or device type not found.")
+    if isinstance(exc, DevicesUnavailableException):
+        return xmlrpc.client.Fault(400, "Device unavailable: %s" % str(exc))
+    return xmlrpc.client.Fault(400, "Job submission failed: %s." % exc)
+
+
 class SchedulerAPI(ExposedV2API):
     def submit_job(self, job_data):
         """
@@ -117,16 +135,15 @@ class SchedulerAPI(ExposedV2API):
         self._authenticate()
         try:
             job = testjob_submission(job_data, self.user)
-        except SubmissionException as exc:
-            raise xmlrpc.client.Fault(400, "Problem with submitted job data: %s" % exc)
-        except ValueError as exc:
-            raise xmlrpc.client.Fault(400, "Decoding job submission failed: %s." % exc)
-        except yaml.YAMLError as exc:
-            raise xmlrpc.client.Fault(400, "Invalid job definition: %s." % exc)
-        except (Device.DoesNotExist, DeviceType.DoesNotExist):
-            raise xmlrpc.client.Fault(404, "Specified device or device type not found.")
-        except DevicesUnavailableException as exc:
-            raise xmlrpc.client.Fault(400, "Device unavailable: %s" % str(exc))
+        except (
+            SubmissionException,
+            ValueError,
+            yaml.YAMLError,
+            Device.DoesNotExist,
+            DeviceType.DoesNotExist,
+            DevicesUnavailableException,
+        ) as exc:
+            raise submission_fault(exc)
         if isinstance(job, list):
             return [j.sub_id for j in job]
         else:
@@ -310,19 +327,16 @@ class SchedulerAPI(ExposedV2API):
         [['panda01', 'panda', 'running', 'good', 164, False], ['qemu01', 'qemu', 'idle', 'unknwon', None, True]]
         """
 
-        devices_list = Device.objects.visible_by_user(self.user).exclude(
-            health=Device.HEALTH_RETIRED
-        )
-
         return [
             [
-                dev.hostname,
-                dev.device_type.name,
-                build_device_status_display(dev.state, dev.health),
-                dev.current_job().pk if dev.current_job() else None,
+                dev["hostname"],
+                dev["device_type"],
+                build_device_status_display(dev["state"], dev["health"]),
+                dev["current_job"],
                 True,
             ]
-            for dev in devices_list
+            for dev in visible_fleet(self.user)
+            if dev["health"] != Device.HEALTH_RETIRED
         ]
 
     def all_device_types(self):
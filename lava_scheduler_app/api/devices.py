@@ -22,12 +22,12 @@ import xmlrpc.client
 
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError, transaction
-from django.db.models import Q, Prefetch
 
 from lava_common.compat import yaml_safe_load
 from linaro_django_xmlrpc.models import ExposedV2API
 from lava_scheduler_app.api import check_perm
-from lava_scheduler_app.models import Device, DeviceType, Tag, TestJob, Worker
+from lava_scheduler_app.fleet import visible_fleet
+from lava_scheduler_app.models import Device, DeviceType, Tag, Worker
 
 
 class SchedulerDevicesAPI(ExposedV2API):
@@ -227,36 +227,20 @@ class SchedulerDevicesAPI(ExposedV2API):
         This function returns an XML-RPC array in which each item is a
         dictionary with device information
         """
-        devices = (
-            Device.objects.all()
-            .visible_by_user(self.user)
-            .select_related("device_type")
-            .prefetch_related(
-                Prefetch(
-                    "testjobs",
-                    queryset=TestJob.objects.filter(~Q(state=TestJob.STATE_FINISHED)),
-                    to_attr="running_jobs",
-                )
-            )
-        )
-        if not show_all:
-            devices = devices.exclude(health=Device.HEALTH_RETIRED)
-        devices = devices.order_by("hostname")
-
-        ret = []
-        for device in devices:
-            current_job = device.current_job()
-            device_dict = {
-                "hostname": device.hostname,
-                "type": device.device_type.name,
-                "health": device.get_health_display(),
-                "state": device.get_state_display(),
-                "current_job": current_job.pk if current_job else None,
+        health = dict(Device.HEALTH_CHOICES)
+        state = dict(Device.STATE_CHOICES)
+        return [
+            {
+                "hostname": device["hostname"],
+                "type": device["device_type"],
+                "health": health[device["health"]],
+                "state": state[device["state"]],
+                "current_job": device["current_job"],
                 "pipeline": True,
             }
-            ret.append(device_dict)
-
-        return ret
+            for device in visible_fleet(self.user)
+            if show_all or device["health"] != Device.HEALTH_RETIRED
+        ]
 
     def show(self, hostname):
         """
@@ -29,7 +29,8 @@ from linaro_django_xmlrpc.models import ExposedV2API
 
 from lava_common.compat import yaml_safe_load
 import lava_common.schemas as schemas
-from lava_scheduler_app.api import SchedulerAPI
+from lava_scheduler_app.api import SchedulerAPI, submission_fault
+from lava_scheduler_app.dbutils import testjob_submission_many
 from lava_scheduler_app.logutils import logs_instance
 from lava_scheduler_app.models import TestJob
 from lava_results_app.models import TestCase
@@ -472,6 +473,45 @@ class SchedulerJobsAPI(ExposedV2API):
         cls = SchedulerAPI(self._context)
         return cls.submit_job(definition)
 
+    def submit_many(self, definitions):
+        """
+        Name
+        ----
+        `scheduler.jobs.submit_many` (`definitions`)
+
+        Description
+        -----------
+        Submit a list of jobs in one call. The device types, devices, tags
+        and permissions are looked up once for all the jobs. The accepted jobs
+        are created in one transaction, even if some definitions are rejected.
+
+        Arguments
+        ---------
+        `definitions`: array of strings
+            Job YAML strings.
+
+        Return value
+        ------------
+        This function returns an array with one dictionary per definition,
+        in the same order. The dictionary has a "job_ids" key with the list of
+        created job IDs when the job was submitted, or an "error" key with
+        the reason why the definition was rejected. The user should be
+        authenticated with an username and token.
+        """
+        self._authenticate()
+        if not isinstance(definitions, list):
+            raise xmlrpc.client.Fault(400, "'definitions' should be an array")
+
+        results = []
+        for job in testjob_submission_many(definitions, self.user):
+            if isinstance(job, Exception):
+                results.append({"error": submission_fault(job).faultString})
+            elif isinstance(job, list):
+                results.append({"job_ids": [j.sub_id for j in job]})
+            else:
+                results.append({"job_ids": [job.id]})
+        return results
+
     def validate(self, definition, strict=False):
         """
         Name
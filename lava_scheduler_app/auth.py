@@ -19,15 +19,156 @@
 
 
 from itertools import chain
+import uuid
 
+from django.conf import settings
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+
+
+PERMISSIONS_CACHE_PREFIX = "lava_scheduler_app.permissions"
+
+
+def group_permission_models():
+    """
+    Returns the restricted models along with their group permission models.
+    """
+    from lava_scheduler_app.models import (
+        Device,
+        DeviceType,
+        GroupDevicePermission,
+        GroupDeviceTypePermission,
+        GroupWorkerPermission,
+        Worker,
+    )
+
+    return {
+        "devicetype": (DeviceType, GroupDeviceTypePermission),
+        "device": (Device, GroupDevicePermission),
+        "worker": (Worker, GroupWorkerPermission),
+    }
+
+
+def permissions_cache_enabled():
+    return bool(settings.PERMISSIONS_CACHE_TIMEOUT)
+
+
+def permissions_cache_version():
+    from lava_scheduler_app.models import PermissionsVersion
+
+    return (
+        PermissionsVersion.objects.filter(pk=1)
+        .values_list("version", flat=True)
+        .first()
+    )
+
+
+def invalidate_permissions_cache():
+    """
+    Drop every cached permission.
+
+    The version is stored in the database, so the change is seen by every
+    process once the current transaction is committed. A new random version
+    is used so that a rolled back change can never be reused.
+    """
+    from lava_scheduler_app.models import PermissionsVersion
+
+    if not permissions_cache_enabled():
+        return
+    PermissionsVersion.objects.filter(pk=1).update(version=uuid.uuid4().hex)
+
+
+def cached_permissions(name, func):
+    if not permissions_cache_enabled():
+        return func()
+    version = permissions_cache_version()
+    if version is None:
+        return func()
+    key = "%s.%s.%s" % (PERMISSIONS_CACHE_PREFIX, version, name)
+    value = cache.get(key)
+    if value is None:
+        value = func()
+        cache.set(key, value, settings.PERMISSIONS_CACHE_TIMEOUT)
+    return value
+
+
+def load_restricted_objects():
+    restricted = {}
+    for (name, (_, model)) in group_permission_models().items():
+        objects = restricted[name] = {}
+        for (pk, codename) in model.objects.values_list(
+            "%s_id" % name, "permission__codename"
+        ).distinct():
+            objects.setdefault(codename, set()).add(pk)
+    return restricted
+
+
+def restricted_objects(model, perm):
+    """
+    Returns the primary keys of the objects restricted by the given permission.
+
+    :param model: DeviceType, Device or Worker
+    :param perm: permission, must contain app_label
+    """
+    restricted = cached_permissions("restricted", load_restricted_objects)
+    return restricted[model._meta.model_name].get(perm.split(".", 1)[-1], set())
 
 
 class PermissionAuth:
     def __init__(self, user):
         self.user = user
 
+    def load_user_perms(self):
+        perms = {}
+        for (name, (restricted_model, model)) in group_permission_models().items():
+            content_type = ContentType.objects.get_for_model(restricted_model)
+            priority = [
+                p.split(".", 1)[-1] for p in restricted_model.PERMISSIONS_PRIORITY
+            ]
+            objects = perms[name] = {}
+            for (pk, codename) in model.objects.filter(
+                group__user=self.user, permission__content_type=content_type
+            ).values_list("%s_id" % name, "permission__codename"):
+                codenames = objects.setdefault(pk, set())
+                codenames.add(codename)
+                # Add lower priority permissions the resulting set.
+                if codename in priority:
+                    codenames.update(priority[priority.index(codename) + 1 :])
+        perms["groups"] = set(self.user.groups.values_list("pk", flat=True))
+        return perms
+
+    def get_user_perms(self):
+        """
+        Returns the group permissions of the user over every device type,
+        device and worker, along with the user groups.
+
+        The result is cached until a group permission or a group membership
+        is changed.
+        """
+        if not self.user.is_authenticated:
+            return {"devicetype": {}, "device": {}, "worker": {}, "groups": set()}
+        return cached_permissions("user.%d" % self.user.pk, self.load_user_perms)
+
+    def get_group_ids(self):
+        if not permissions_cache_enabled():
+            return set(self.user.groups.values_list("pk", flat=True))
+        return self.get_user_perms()["groups"]
+
+    def granted_objects(self, model, perm):
+        """
+        Returns the primary keys of the objects for which the user is given
+        the permission, or a higher priority one, through their groups.
+
+        :param model: DeviceType, Device or Worker
+        :param perm: permission, must contain app_label
+        """
+        # Raise a ValueError for unknown permissions
+        model.PERMISSIONS_PRIORITY.index(perm)
+        codename = perm.split(".", 1)[-1]
+        objects = self.get_user_perms()[model._meta.model_name]
+        return {pk for (pk, codenames) in objects.items() if codename in codenames}
+
     def has_perm(self, perm, obj):
         """
         Checks if user has given permission for object.
@@ -53,6 +194,10 @@ class PermissionAuth:
         return perm in self.get_perms(obj)
 
     def get_group_perms(self, obj):
+        if permissions_cache_enabled():
+            objects = self.get_user_perms()[obj._meta.model_name]
+            return set(objects.get(obj.pk, set()))
+
         content_type = ContentType.objects.get_for_model(obj)
 
         perms_queryset = Permission.objects.filter(
@@ -30,6 +30,7 @@ import yaml
 import jinja2
 import logging
 
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.db.models import Q, Case, When, IntegerField, Sum
 from django.contrib.auth.models import User
@@ -39,9 +40,11 @@ from django.contrib.sites.models import Site
 
 from lava_common.compat import yaml_load, yaml_safe_load
 from lava_common.decorators import nottest
+from lava_common.schemas import validate_many
 import lava_scheduler_app.environment as environment
 from lava_scheduler_app.models import (
     Device,
+    DevicesUnavailableException,
     DeviceType,
     NotificationRecipient,
     TestJob,
@@ -120,6 +123,65 @@ def testjob_submission(job_definition, user, original_job=None):
     return job
 
 
+@nottest
+def testjob_submission_many(job_definitions, user):
+    """
+    Bulk submission frontend for YAML
+    The definitions are validated in one pass, against the same compiled
+    job schemas, then the accepted jobs are saved in one transaction.
+    :param job_definitions: list of strings of the job submissions
+    :param user: user attempting the submission
+    :return: for each definition, a job, a list of jobs or the exception
+        explaining why the definition was rejected
+    """
+    results = [None] * len(job_definitions)
+    documents = {}
+    for index, job_definition in enumerate(job_definitions):
+        try:
+            documents[index] = validate_job(job_definition)
+        except (SubmissionException, ValueError, KeyError) as exc:
+            results[index] = exc
+
+    valid = []
+    errors = validate_many(
+        list(documents.values()),
+        strict=False,
+        extra_context_variables=settings.EXTRA_CONTEXT_VARIABLES,
+    )
+    for index, errs in zip(documents.keys(), errors):
+        if errs:
+            results[index] = SubmissionException(
+                "; ".join(
+                    "%s @ %s" % (e["msg"], ".".join(e["path"]))
+                    if e["path"]
+                    else e["msg"]
+                    for e in errs
+                )
+            )
+        else:
+            valid.append(index)
+
+    jobs = TestJob.from_yaml_and_user_many(
+        [job_definitions[index] for index in valid], user
+    )
+    for index, job in zip(valid, jobs):
+        results[index] = job
+    return results
+
+
+def submission_error_message(exc):
+    """
+    Return the message explaining why testjob_submission rejected a job.
+    """
+    if isinstance(exc, SubmissionException):
+        return "Problem with submitted job data: %s" % exc
+    if isinstance(exc, (Device.DoesNotExist, DeviceType.DoesNotExist)):
+        return "Specified device or device type not found."
+    if isinstance(exc, DevicesUnavailableException):
+        return "Devices unavailable: %s" % exc
+    return "Job submission failed: %s." % exc
+
+
 def parse_job_description(job):
     filename = os.path.join(job.output_dir, "description.yaml")
     logger = logging.getLogger("lava-master")
@@ -201,36 +263,13 @@ def active_device_types():
     all device-types where ALL devices are in health RETIRED
     without excluding device-types where only SOME devices are retired.
 
-    oneliner:
-{device.device_type for device in Device.objects.filter(~Q(health=Device.HEALTH_RETIRED))}.union( \
-{dt for dt in {device.device_type for device in Device.objects.filter(health=Device.HEALTH_RETIRED)} \
-if list(Device.objects.filter(Q(device_type=dt), ~Q(health=Device.HEALTH_RETIRED)))})
-
     Returns a RestrictedQuerySet of DeviceType objects.
     """
-    not_retired_devices = Device.objects.filter(
-        Q(device_type__display=True), ~Q(health=Device.HEALTH_RETIRED)
-    ).select_related("device_type")
-    retired_devices = Device.objects.filter(
-        Q(device_type__display=True), health=Device.HEALTH_RETIRED
-    ).select_related("device_type")
-    not_all_retired = (
-        set()
-    )  # set of device_type.names where some devices of that device_type are retired but *not* all.
-    for device in retired_devices:
-        # identify device_types which can be added back because not all devices of that type are retired.
-        if list(
-            Device.objects.filter(
-                Q(device_type=device.device_type), ~Q(health=Device.HEALTH_RETIRED)
-            )
-        ):
-            not_all_retired.add(device.device_type.name)
-    # join the two sets as a union.
-    candidates = {device.device_type.name for device in not_retired_devices}.union(
-        not_all_retired
+    return DeviceType.objects.filter(
+        name__in=Device.objects.filter(
+            Q(device_type__display=True), ~Q(health=Device.HEALTH_RETIRED)
+        ).values("device_type")
     )
-    device_types = DeviceType.objects.filter(name__in=candidates)
-    return device_types
 
 
 def load_devicetype_template(device_type_name, raw=False):
@@ -297,6 +336,7 @@ def validate_job(data):
     # validate against the submission schema.
     validate_submission(yaml_data)  # raises SubmissionException if invalid.
     validate_yaml(yaml_data)  # raises SubmissionException if invalid.
+    return yaml_data
 
 
 def validate_yaml(yaml_data):
@@ -17,29 +17,96 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
 import jinja2
+import logging
+import os
+import tempfile
 import threading
 
+from django.conf import settings
+
 from lava_server.files import File
 
 
+# Thread local storage for the jinja2 environments
+thread_locals = threading.local()
+
+
+class BytecodeCache(jinja2.FileSystemBytecodeCache):
+    """
+    Compiled templates shared by every process. The cached bytecode is only
+    used when the checksum of the template source matches. Being unable to
+    read or to write the cache is not an error: the template is then
+    compiled from source.
+    """
+
+    def load_bytecode(self, bucket):
+        try:
+            super().load_bytecode(bucket)
+        except Exception as exc:
+            # Unreadable or truncated cache file
+            logger = logging.getLogger("lava_scheduler_app")
+            logger.warning("Unable to load the cached bytecode: %s", str(exc))
+            bucket.reset()
+
+    def dump_bytecode(self, bucket):
+        # Write to a temporary file and rename it, so other processes never
+        # read a partial file.
+        filename = self._get_cache_filename(bucket)
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                mode="wb",
+                dir=os.path.dirname(filename),
+                prefix=os.path.basename(filename),
+                suffix=".tmp",
+                delete=False,
+            ) as f:
+                tmp = f.name
+                bucket.write_bytecode(f)
+            os.replace(tmp, filename)
+        except Exception as exc:
+            logger = logging.getLogger("lava_scheduler_app")
+            logger.warning("Unable to cache the bytecode: %s", str(exc))
+            if tmp is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp)
+
+
+def bytecode_cache():
+    try:
+        return thread_locals.bytecode_cache
+    except AttributeError:
+        thread_locals.bytecode_cache = None
+        if settings.JINJA2_CACHE_PATH:
+            with contextlib.suppress(OSError):
+                os.makedirs(settings.JINJA2_CACHE_PATH, mode=0o755, exist_ok=True)
+                thread_locals.bytecode_cache = BytecodeCache(settings.JINJA2_CACHE_PATH)
+    return thread_locals.bytecode_cache
+
+
 def devices():
-    thread_locals = threading.local()
     try:
         return thread_locals.devices
     except AttributeError:
         thread_locals.devices = jinja2.Environment(
-            loader=File("device").loader(), autoescape=False, trim_blocks=True
+            loader=File("device").loader(),
+            autoescape=False,
+            trim_blocks=True,
+            bytecode_cache=bytecode_cache(),
         )
     return thread_locals.devices
 
 
 def device_types():
-    thread_locals = threading.local()
     try:
         return thread_locals.device_types
     except AttributeError:
         thread_locals.device_types = jinja2.Environment(
-            loader=File("device-type").loader(), autoescape=False, trim_blocks=True
+            loader=File("device-type").loader(),
+            autoescape=False,
+            trim_blocks=True,
+            bytecode_cache=bytecode_cache(),
         )
     return thread_locals.device_types
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import heapq
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# Maximum number of queued jobs looked at to estimate a start time
+MAX_QUEUED_JOBS = 500
+
+
+def _job_keys(job):
+    """
+    Returns the (kind, key) of the JobDuration rows matching the job, the
+    most specific first.
+    """
+    from lava_scheduler_app.models import JobDuration
+
+    keys = []
+    if job.description:
+        keys.append((JobDuration.KIND_DESCRIPTION, job.description))
+    keys.append((JobDuration.KIND_SUBMITTER, str(job.submitter_id)))
+    keys.append((JobDuration.KIND_DEVICE_TYPE, ""))
+    return keys
+
+
+def record_job_duration(job):
+    """
+    Update the expected durations with the duration of the given finished
+    job. The durations are moving averages over the last JOB_DURATION_WINDOW
+    jobs, so no history is ever read back.
+    """
+    from lava_scheduler_app.models import JobDuration
+
+    if job.requested_device_type_id is None:
+        return
+    duration = (job.end_time - job.start_time).total_seconds()
+    with transaction.atomic():
+        for (kind, key) in _job_keys(job):
+            (row, _) = JobDuration.objects.select_for_update().get_or_create(
+                device_type_id=job.requested_device_type_id, kind=kind, key=key
+            )
+            row.count += 1
+            row.duration += (duration - row.duration) / min(
+                row.count, settings.JOB_DURATION_WINDOW
+            )
+            row.save(update_fields=["count", "duration"])
+
+
+def predict_durations(jobs):
+    """
+    Returns the expected duration of each job, in seconds, as a dictionary
+    indexed by the job id. The value is None when nothing is known yet.
+    """
+    from lava_scheduler_app.models import JobDuration
+
+    if not jobs:
+        return {}
+    # Only two IN clauses, whatever the number of jobs: the rows are matched
+    # to the jobs below.
+    rows = JobDuration.objects.filter(
+        device_type_id__in={job.requested_device_type_id for job in jobs},
+        key__in={key for job in jobs for (_, key) in _job_keys(job)},
+    ).values_list("device_type_id", "kind", "key", "duration")
+    durations = {(dt, kind, key): duration for (dt, kind, key, duration) in rows}
+    return {
+        job.id: next(
+            (
+                durations[(job.requested_device_type_id, kind, key)]
+                for (kind, key) in _job_keys(job)
+                if (job.requested_device_type_id, kind, key) in durations
+            ),
+            None,
+        )
+        for job in jobs
+    }
+
+
+def job_estimate(job):
+    """
+    Returns the expected duration and start time of the given job.
+
+    The start time is only estimated for submitted jobs: the jobs in front of
+    it in the queue are given, in order, to the device that is expected to be
+    free first. The job tags and the device permissions are not taken into
+    account. No start time is estimated with more than MAX_QUEUED_JOBS jobs in
+    front of it.
+    """
+    from lava_scheduler_app.models import Device, TestJob
+
+    estimate = {"duration": None, "start_time": None}
+    if job.requested_device_type_id is None:
+        return estimate
+    if job.state != TestJob.STATE_SUBMITTED:
+        duration = predict_durations([job])[job.id]
+        if duration is not None:
+            estimate["duration"] = datetime.timedelta(seconds=round(duration))
+        estimate["start_time"] = job.start_time
+        return estimate
+
+    devices = Device.objects.filter(
+        device_type_id=job.requested_device_type_id,
+        health__in=[Device.HEALTH_GOOD, Device.HEALTH_UNKNOWN],
+    )
+    running = TestJob.objects.filter(
+        actual_device__in=devices,
+        state__in=[
+            TestJob.STATE_SCHEDULING,
+            TestJob.STATE_SCHEDULED,
+            TestJob.STATE_RUNNING,
+            TestJob.STATE_CANCELING,
+        ],
+    ).only(
+        "id",
+        "state",
+        "health",
+        "description",
+        "submitter",
+        "requested_device_type",
+        "actual_device",
+        "start_time",
+    )
+    # Same order as the scheduler
+    queued = (
+        TestJob.objects.filter(
+            state=TestJob.STATE_SUBMITTED,
+            requested_device_type_id=job.requested_device_type_id,
+        )
+        .filter(
+            Q(priority__gt=job.priority)
+            | Q(priority=job.priority, submit_time__lt=job.submit_time)
+            | Q(priority=job.priority, submit_time=job.submit_time, id__lt=job.id)
+        )
+        .order_by("-priority", "submit_time", "sub_id", "id")
+        .only(
+            "id",
+            "state",
+            "health",
+            "description",
+            "submitter",
+            "requested_device_type",
+        )
+    )
+
+    queued = list(queued[: MAX_QUEUED_JOBS + 1])
+    # Too far in the queue: only the duration is estimated
+    too_far = len(queued) > MAX_QUEUED_JOBS
+    if too_far:
+        running = queued = []
+    running = list(running)
+    durations = predict_durations(running + queued + [job])
+    if durations[job.id] is not None:
+        estimate["duration"] = datetime.timedelta(seconds=round(durations[job.id]))
+    if too_far or None in durations.values():
+        return estimate
+
+    # When is each device expected to be free
+    now = timezone.now()
+    busy = {j.actual_device_id: j for j in running}
+    free = []
+    for hostname in devices.values_list("hostname", flat=True):
+        free_at = now
+        if hostname in busy:
+            current = busy[hostname]
+            start_time = current.start_time or now
+            free_at = max(
+                now, start_time + datetime.timedelta(seconds=durations[current.id])
+            )
+        free.append(free_at)
+    if not free:
+        return estimate
+
+    heapq.heapify(free)
+    for queued_job in queued:
+        free_at = heapq.heappop(free)
+        heapq.heappush(
+            free, free_at + datetime.timedelta(seconds=durations[queued_job.id])
+        )
+    estimate["start_time"] = heapq.heappop(free)
+    return estimate
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+
+FLEET_CACHE_KEY = "lava_scheduler_app.fleet"
+
+
+def load_fleet():
+    """
+    Returns the state of every device, ordered by hostname.
+    """
+    from lava_scheduler_app.models import Device, TestJob
+
+    jobs = dict(
+        TestJob.objects.filter(actual_device__isnull=False)
+        .filter(~Q(state=TestJob.STATE_FINISHED))
+        .values_list("actual_device_id", "id")
+    )
+    return [
+        {
+            "hostname": device["hostname"],
+            "device_type": device["device_type__name"],
+            "state": device["state"],
+            "health": device["health"],
+            "current_job": jobs.get(device["hostname"]),
+            "worker": device["worker_host__hostname"],
+            "worker_state": device["worker_host__state"],
+            "worker_health": device["worker_host__health"],
+        }
+        for device in Device.objects.order_by("hostname").values(
+            "hostname",
+            "device_type__name",
+            "state",
+            "health",
+            "worker_host__hostname",
+            "worker_host__state",
+            "worker_host__health",
+        )
+    ]
+
+
+def get_fleet():
+    """
+    Returns the state of every device, as cached for at most
+    FLEET_CACHE_TIMEOUT seconds.
+    """
+    fleet = cache.get(FLEET_CACHE_KEY)
+    if fleet is None:
+        fleet = load_fleet()
+        cache.set(FLEET_CACHE_KEY, fleet, settings.FLEET_CACHE_TIMEOUT)
+    return fleet
+
+
+def visible_fleet(user):
+    """
+    Returns the state of the devices visible by the user.
+    """
+    from lava_scheduler_app.models import Device
+
+    fleet = get_fleet()
+    if user is not None and user.is_superuser:
+        return fleet
+    visible = set(
+        Device.objects.visible_by_user(user).values_list("hostname", flat=True)
+    )
+    return [device for device in fleet if device["hostname"] in visible]
+
+
+def invalidate_fleet_cache():
+    """
+    Drop the cached fleet, now and when the current transaction is committed.
+    """
+
+    def invalidate():
+        cache.delete(FLEET_CACHE_KEY)
+
+    invalidate()
+    transaction.on_commit(invalidate)
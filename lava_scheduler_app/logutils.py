@@ -45,6 +45,13 @@ class Logs:
     def read(self, job, start=0, end=None):
         raise NotImplementedError("Should implement this method")
 
+    def read_many(self, job, ranges):
+        """
+        Return the log slices for each (start, end) of ranges.
+        ranges should be sorted by start line.
+        """
+        return [self.read(job, start, end) for (start, end) in ranges]
+
     def size(self, job, start=0, end=None):
         raise NotImplementedError("Should implement this method")
 
@@ -119,6 +126,39 @@ class LogsFilesystem(Logs):
                     return ""
                 return f_log.read(end_offset - start_offset).decode("utf-8")
 
+    def read_many(self, job, ranges):
+        directory = pathlib.Path(job.output_dir)
+        ranges = list(ranges)
+        if not ranges:
+            return []
+
+        # Create the index
+        if not (directory / self.index_filename).exists():
+            self._build_index(job)
+        # Open the index and the logs only once: as the ranges are sorted, the
+        # compressed logs are not decompressed from the start for every range.
+        data = []
+        with open(str(directory / self.index_filename), "rb") as f_idx:
+            with self.open(job) as f_log:
+                for (start, end) in ranges:
+                    start_offset = self._get_line_offset(f_idx, start)
+                    if start_offset is None:
+                        data.append("")
+                        continue
+                    f_log.seek(start_offset)
+                    end_offset = None
+                    if end is not None:
+                        end_offset = self._get_line_offset(f_idx, end)
+                    if end_offset is None:
+                        data.append(f_log.read().decode("utf-8"))
+                    elif end_offset <= start_offset:
+                        data.append("")
+                    else:
+                        data.append(
+                            f_log.read(end_offset - start_offset).decode("utf-8")
+                        )
+        return data
+
     def size(self, job):
         directory = pathlib.Path(job.output_dir)
         with contextlib.suppress(FileNotFoundError):
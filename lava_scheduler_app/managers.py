@@ -23,6 +23,12 @@ from django.db import models
 from django.db.models import Q, Count
 
 from lava_common.exceptions import ObjectNotPersisted, PermissionNameError
+from lava_scheduler_app.auth import (
+    PermissionAuth,
+    invalidate_permissions_cache,
+    permissions_cache_enabled,
+    restricted_objects,
+)
 
 
 class GroupObjectPermissionManager(models.Manager):
@@ -84,6 +90,8 @@ class GroupObjectPermissionManager(models.Manager):
             kwargs["group"] = group
             to_add.append(self.model(**kwargs))
 
+        # bulk_create does not send the post_save signals.
+        invalidate_permissions_cache()
         return self.model.objects.bulk_create(to_add)
 
     def remove_perm(self, perm, group, obj):
@@ -103,6 +111,7 @@ class GroupObjectPermissionManager(models.Manager):
             "permission__content_type": ctype,
             ctype.model: obj,
         }
+        invalidate_permissions_cache()
         return self.filter(**kwargs).delete()
 
 
@@ -168,6 +177,14 @@ class RestrictedWorkerQuerySet(RestrictedObjectQuerySet):
         else:
             # Always false Q object which does not produce a query.
             filters = Q(pk__in=[])
+            if permissions_cache_enabled():
+                # The permissions are read from the cache, so the filters are
+                # only comparing primary keys.
+                if user.is_authenticated:
+                    auth = PermissionAuth(user)
+                    filters |= Q(pk__in=auth.granted_objects(self.model, perm))
+                return self.filter(filters)
+
             # If the user is authenticated add the main permission filter.
             if user.is_authenticated:
                 self = self.filter_by_perm(perm, user)
@@ -186,6 +203,18 @@ class RestrictedDeviceTypeQuerySet(RestrictedObjectQuerySet):
         else:
             # Always false Q object which does not produce a query.
             filters = Q(pk__in=[])
+            if permissions_cache_enabled():
+                # The permissions are read from the cache, so the filters are
+                # only comparing primary keys.
+                if (perm == self.model.VIEW_PERMISSION) or (
+                    perm == self.model.SUBMIT_PERMISSION and user.is_authenticated
+                ):
+                    filters |= ~Q(pk__in=restricted_objects(self.model, perm))
+                if user.is_authenticated:
+                    auth = PermissionAuth(user)
+                    filters |= Q(pk__in=auth.granted_objects(self.model, perm))
+                return self.filter(filters)
+
             # If the requested permission is view or the requested permission
             # is submit and user is authenticated, add unrestricted device
             # types to the filter result.
@@ -212,6 +241,17 @@ class RestrictedDeviceQuerySet(RestrictedObjectQuerySet):
                 user, Device.DEVICE_TYPE_PERMISSION_MAP[perm]
             )
 
+            if permissions_cache_enabled():
+                # The permissions are read from the cache, so the filters are
+                # only comparing primary keys.
+                auth = PermissionAuth(user)
+                filters = ~Q(pk__in=restricted_objects(self.model, perm)) & Q(
+                    device_type__in=accessible_device_types
+                )
+                if user.is_authenticated:
+                    filters |= Q(pk__in=auth.granted_objects(self.model, perm))
+                return self.filter(filters)
+
             # For non-authenticated users, accessible device types will always
             # be empty for non-view permissions, so this will also return no
             # results. Similar for submit permissions.
@@ -271,7 +311,7 @@ class RestrictedTestJobQuerySet(RestrictedObjectQuerySet):
                 # Needed to determine if viewing_groups is subset of all users
                 # groups.
                 nonuser_groups = Group.objects.exclude(
-                    pk__in=[g.id for g in user.groups.all()]
+                    pk__in=PermissionAuth(user).get_group_ids()
                 )
                 filters |= ~Q(num_viewing_groups=0) & ~Q(
                     viewing_groups__in=nonuser_groups
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.12 on 2020-06-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("lava_scheduler_app", "0053_testjob_and_worker_token")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="testjob",
+            name="end_time",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="End time",
+            ),
+        )
+    ]
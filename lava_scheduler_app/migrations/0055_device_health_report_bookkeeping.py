@@ -0,0 +1,50 @@
+# Generated by Django 2.2.12 on 2020-07-02 10:21
+
+from django.db import migrations, models
+
+
+def forwards_func(apps, schema_editor):
+    Device = apps.get_model("lava_scheduler_app", "Device")
+    TestJob = apps.get_model("lava_scheduler_app", "TestJob")
+    devices = Device.objects.filter(last_health_report_job__isnull=False)
+    for device in devices.select_related("last_health_report_job"):
+        submit_time = device.last_health_report_job.submit_time
+        device.last_health_report_time = submit_time
+        device.jobs_since_health_report = TestJob.objects.filter(
+            actual_device=device, health_check=False, start_time__gte=submit_time
+        ).count()
+        device.save(
+            update_fields=["last_health_report_time", "jobs_since_health_report"]
+        )
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("lava_scheduler_app", "0054_testjob_end_time_index")]
+
+    operations = [
+        migrations.AddField(
+            model_name="device",
+            name="jobs_since_health_report",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Jobs since the last health check",
+            ),
+        ),
+        migrations.AddField(
+            model_name="device",
+            name="last_health_report_time",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Last health check submit time",
+            ),
+        ),
+        migrations.RunPython(forwards_func, noop),
+    ]
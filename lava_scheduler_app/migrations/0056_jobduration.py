@@ -0,0 +1,51 @@
+# Generated by Django 2.2.12 on 2020-07-09 14:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("lava_scheduler_app", "0055_device_health_report_bookkeeping")]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobDuration",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.IntegerField(
+                        choices=[
+                            (0, "Device type"),
+                            (1, "Description"),
+                            (2, "Submitter"),
+                        ]
+                    ),
+                ),
+                ("key", models.CharField(blank=True, default="", max_length=200)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "duration",
+                    models.FloatField(default=0, help_text="Duration in seconds"),
+                ),
+                (
+                    "device_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="lava_scheduler_app.DeviceType",
+                    ),
+                ),
+            ],
+            options={"unique_together": {("device_type", "kind", "key")}},
+        )
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.12 on 2020-07-10 09:12
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    PermissionsVersion = apps.get_model("lava_scheduler_app", "PermissionsVersion")
+    PermissionsVersion.objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("lava_scheduler_app", "0056_jobduration")]
+
+    operations = [
+        migrations.CreateModel(
+            name="PermissionsVersion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.CharField(blank=True, default="", max_length=32)),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
@@ -30,7 +30,8 @@ import simplejson
 import yaml
 
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Case, Q, Value, When
+from django.db.models.signals import post_save
 from django.conf import settings
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
@@ -53,6 +54,8 @@ from lava_common.compat import yaml_dump, yaml_safe_load, yaml_safe_dump
 from lava_common.decorators import nottest
 from lava_results_app.utils import export_testcase
 from lava_scheduler_app import utils
+from lava_scheduler_app.auth import permissions_cache_enabled, restricted_objects
+from lava_scheduler_app.estimates import record_job_duration
 from lava_scheduler_app.logutils import logs_instance
 import lava_scheduler_app.environment as environment
 from lava_scheduler_app.managers import (
@@ -220,6 +223,8 @@ class RestrictedObject(models.Model):
         abstract = True
 
     def is_permission_restricted(self, perm):
+        if permissions_cache_enabled():
+            return self.pk in restricted_objects(type(self), perm)
         app_label, codename = perm.split(".", 1)
         perm_count = self.permissions.filter(
             permission__content_type__app_label=app_label, permission__codename=codename
@@ -641,6 +646,19 @@ class Device(RestrictedObject):
         related_name="+",
         on_delete=models.SET_NULL,
     )
+    # Health check bookkeeping, updated when the jobs finish, so the scheduler
+    # does not have to look at the job history
+    last_health_report_time = models.DateTimeField(
+        verbose_name=_("Last health check submit time"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    jobs_since_health_report = models.IntegerField(
+        verbose_name=_("Jobs since the last health check"),
+        default=0,
+        editable=False,
+    )
 
     # TODO: make this mandatory
     worker_host = models.ForeignKey(
@@ -780,6 +798,8 @@ class Device(RestrictedObject):
             prev_health_display = self.get_health_display()
             if job.health_check:
                 self.last_health_report_job = job
+                self.last_health_report_time = job.submit_time
+                self.jobs_since_health_report = 0
                 if self.health == Device.HEALTH_LOOPING:
                     if job.health == TestJob.HEALTH_INCOMPLETE:
                         # Looping is persistent until cancelled by the admin.
@@ -809,13 +829,19 @@ class Device(RestrictedObject):
                         "%s → %s (health-check [%s] %s)"
                         % (prev_health_display, self.get_health_display(), job.id, msg),
                     )
-            elif infrastructure_error:
-                self.health = Device.HEALTH_UNKNOWN
-                self.log_admin_entry(
-                    None,
-                    "%s → %s (Infrastructure error after %s)"
-                    % (prev_health_display, self.get_health_display(), job.display_id),
-                )
+            else:
+                self.jobs_since_health_report += 1
+                if infrastructure_error:
+                    self.health = Device.HEALTH_UNKNOWN
+                    self.log_admin_entry(
+                        None,
+                        "%s → %s (Infrastructure error after %s)"
+                        % (
+                            prev_health_display,
+                            self.get_health_display(),
+                            job.display_id,
+                        ),
+                    )
 
         else:
             raise NotImplementedError("Unknown signal %s" % signal)
@@ -1120,7 +1146,63 @@ def _get_device_type(user, name):
     return device_type
 
 
-def _create_pipeline_job(
+class SubmissionLookups:
+    """
+    Device type, device, tag and group lookups done by the submission checks.
+    The results are kept so that the jobs of a bulk submission share them.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._device_types = {}
+        self._devices = {}
+        self._tags = {}
+        self._tag_devices = {}
+        self._groups = {}
+
+    def device_type(self, name):
+        if name not in self._device_types:
+            self._device_types[name] = _get_device_type(self.user, name)
+        return self._device_types[name]
+
+    def allowed_devices(self, device_type):
+        if device_type.name not in self._devices:
+            devices = Device.objects.filter(
+                Q(device_type=device_type), ~Q(health=Device.HEALTH_RETIRED)
+            )
+            self._devices[device_type.name] = _check_submit_to_devices(
+                devices, self.user
+            )
+        return self._devices[device_type.name]
+
+    def tag_list(self, tags):
+        if not isinstance(tags, list):
+            return _get_tag_list(tags)
+        key = tuple(tags)
+        if key not in self._tags:
+            self._tags[key] = _get_tag_list(tags)
+        return self._tags[key]
+
+    def tag_devices(self, taglist, device_type):
+        key = (device_type.name, tuple(tag.name for tag in taglist))
+        if key not in self._tag_devices:
+            self._tag_devices[key] = _check_tags(taglist, device_type=device_type)
+        return self._tag_devices[key]
+
+    def groups(self, names):
+        key = tuple(names)
+        if key not in self._groups:
+            self._groups[key] = list(Group.objects.filter(name__in=names))
+        return self._groups[key]
+
+    def user_group(self):
+        if self.user.username not in self._groups:
+            group, _ = Group.objects.get_or_create(name=self.user.username)
+            self._groups[self.user.username] = [group]
+        return self._groups[self.user.username]
+
+
+def _build_pipeline_job(
     job_data,
     user,
     taglist,
@@ -1129,7 +1211,11 @@ def _create_pipeline_job(
     target_group=None,
     orig=None,
     health_check=False,
+    lookups=None,
 ):
+    """
+    Return the unsaved job as (job, taglist, viewing_groups) or None.
+    """
 
     if not isinstance(job_data, dict):
         # programming error
@@ -1143,6 +1229,8 @@ def _create_pipeline_job(
 
     if not taglist:
         taglist = []
+    if lookups is None:
+        lookups = SubmissionLookups(user)
 
     # Handle priority
     priority = TestJob.MEDIUM
@@ -1172,28 +1260,31 @@ def _create_pipeline_job(
         if param == "public":
             is_public = True
         else:
-            group, _ = Group.objects.get_or_create(name=user.username)
-            viewing_groups = [group]
+            viewing_groups = lookups.user_group()
     elif isinstance(param, dict):
         if "group" in param:
-            viewing_groups = list(Group.objects.filter(name__in=param["group"]))
+            viewing_groups = lookups.groups(param["group"])
             if not viewing_groups:
                 raise SubmissionException(
                     "No known groups were found in the visibility list."
                 )
 
+    job = TestJob(
+        definition=yaml_safe_dump(job_data),
+        original_definition=orig,
+        submitter=user,
+        requested_device_type=device_type,
+        target_group=target_group,
+        description=job_data["job_name"],
+        health_check=health_check,
+        priority=priority,
+        is_public=is_public,
+    )
+    return (job, taglist, viewing_groups)
+
+
+def _save_pipeline_job(job, taglist, viewing_groups):
     with transaction.atomic():
-        job = TestJob(
-            definition=yaml_safe_dump(job_data),
-            original_definition=orig,
-            submitter=user,
-            requested_device_type=device_type,
-            target_group=target_group,
-            description=job_data["job_name"],
-            health_check=health_check,
-            priority=priority,
-            is_public=is_public,
-        )
         job.save()
 
         # need a valid job (with a primary_key) before tags and groups can be
@@ -1201,9 +1292,202 @@ def _create_pipeline_job(
         job.tags.add(*taglist)
         job.viewing_groups.add(*viewing_groups)
 
+
+def _create_pipeline_job(
+    job_data,
+    user,
+    taglist,
+    device=None,
+    device_type=None,
+    target_group=None,
+    orig=None,
+    health_check=False,
+):
+    built = _build_pipeline_job(
+        job_data,
+        user,
+        taglist,
+        device=device,
+        device_type=device_type,
+        target_group=target_group,
+        orig=orig,
+        health_check=health_check,
+    )
+    if built is None:
+        return None
+    (job, taglist, viewing_groups) = built
+    _save_pipeline_job(job, taglist, viewing_groups)
     return job
 
 
+def _bulk_create_pipeline_jobs(jobs):
+    """
+    Save the jobs, as built by TestJob.build_from_yaml_and_user, with a few
+    bulk inserts in one transaction.
+    The multinode jobs of a group should follow each other, starting with
+    the parent.
+    """
+    if not jobs:
+        return
+    with transaction.atomic():
+        TestJob.objects.bulk_create([job for (job, _, _, _) in jobs])
+
+        TestJob.tags.through.objects.bulk_create(
+            [
+                TestJob.tags.through(testjob_id=job.id, tag_id=tag.pk)
+                for (job, taglist, _, _) in jobs
+                for tag in set(taglist)
+            ]
+        )
+        TestJob.viewing_groups.through.objects.bulk_create(
+            [
+                TestJob.viewing_groups.through(testjob_id=job.id, group_id=group.id)
+                for (job, _, groups, _) in jobs
+                for group in set(groups)
+            ]
+        )
+
+        # The sub_id of multinode jobs is based on the id of the group parent
+        parents = {}
+        sub_ids = []
+        for (job, _, _, sub_id) in jobs:
+            if sub_id is None:
+                continue
+            parent = parents.setdefault(job.target_group, job.id)
+            job.sub_id = "%d.%d" % (parent, sub_id)
+            sub_ids.append(When(id=job.id, then=Value(job.sub_id)))
+        if sub_ids:
+            TestJob.objects.filter(
+                id__in=[job.id for (job, _, _, sub_id) in jobs if sub_id is not None]
+            ).update(sub_id=Case(*sub_ids, output_field=models.CharField()))
+
+        # bulk_create does not send the post_save signal
+        for (job, _, _, _) in jobs:
+            post_save.send(
+                sender=TestJob,
+                instance=job,
+                created=True,
+                update_fields=None,
+                raw=False,
+                using=job._state.db,
+            )
+
+
+def _build_multinode_jobs(job_data, user, yaml_data=None, lookups=None):
+    """
+    Check the multinode protocol and return the unsaved jobs of the group
+    as (job, taglist, viewing_groups, sub_id), or an empty list when
+    job_data is not a multinode job.
+    The sub_id is the index of the job in the group.
+    """
+    if isinstance(job_data, dict) and "protocols" not in job_data:
+        return []
+    if "lava-multinode" not in job_data["protocols"]:
+        return []
+
+    if not yaml_data:
+        yaml_data = yaml_safe_dump(job_data)
+    if lookups is None:
+        lookups = SubmissionLookups(user)
+    role_dictionary = {}  # map of the multinode group
+    # create target_group uuid, just a label for the coordinator.
+    target_group = str(uuid.uuid4())
+
+    # Handle the requirements of the Multinode protocol
+    # FIXME: needs a schema check
+    # FIXME: the vland protocol will affect the device_list
+    if "roles" in job_data["protocols"]["lava-multinode"]:
+        for role in job_data["protocols"]["lava-multinode"]["roles"]:
+            role_dictionary[role] = {"devices": [], "tags": []}
+            params = job_data["protocols"]["lava-multinode"]["roles"][role]
+            if "device_type" in params and "connection" in params:
+                raise SubmissionException(
+                    "lava-multinode protocol cannot support device_type and connection for a single role."
+                )
+            if "device_type" not in params and "connection" in params:
+                # always allow support for dynamic connections which have no devices.
+                if "host_role" not in params:
+                    raise SubmissionException(
+                        "connection specified without a host_role"
+                    )
+                continue
+            device_type = lookups.device_type(params["device_type"])
+            role_dictionary[role]["device_type"] = device_type
+
+            allowed_devices = lookups.allowed_devices(device_type)
+
+            if len(allowed_devices) < params["count"]:
+                raise DevicesUnavailableException(
+                    "Not enough devices of type %s are currently "
+                    "available to user %s" % (device_type, user)
+                )
+            role_dictionary[role]["tags"] = lookups.tag_list(params.get("tags", []))
+            if role_dictionary[role]["tags"]:
+                supported = lookups.tag_devices(
+                    role_dictionary[role]["tags"], device_type
+                )
+                _check_tags_support(supported, allowed_devices, params["count"])
+
+            # FIXME: other protocols could need to remove devices from 'supported' here
+
+            # the device_roles cannot be set here - only once the final group has been reserved
+
+    jobs = []
+
+    # so far, just checked availability, now create the data.
+    # Tags and device_type are tied to the role. The actual device is
+    # a combination of the device_type and the count. Devices from the
+    # supported list are allocated to jobs for the specified role.
+
+    # split the YAML - needs the full device group information
+    # returns a dict indexed by role, containing a list of jobs
+    job_dictionary = utils.split_multinode_yaml(job_data, target_group)
+
+    if not job_dictionary:
+        raise SubmissionException("Unable to split multinode job submission.")
+
+    for role, role_dict in role_dictionary.items():
+        for node_data in job_dictionary[role]:
+            built = _build_pipeline_job(
+                node_data,
+                user,
+                target_group=target_group,
+                taglist=role_dict["tags"],
+                device_type=role_dict.get("device_type"),
+                orig=None,  # store the dump of the split yaml as the job definition
+                lookups=lookups,
+            )
+            if not built:
+                raise SubmissionException("Unable to create job for %s" % node_data)
+            (job, taglist, viewing_groups) = built
+            # store complete submission, inc. comments
+            job.multinode_definition = yaml_data
+            jobs.append(
+                (
+                    job,
+                    taglist,
+                    viewing_groups,
+                    node_data["protocols"]["lava-multinode"]["sub_id"],
+                )
+            )
+    return jobs
+
+
+def _save_multinode_jobs(jobs):
+    """
+    Save the jobs of a multinode group, as built by _build_multinode_jobs.
+    """
+    # track the zero id job as the parent of the group in the sub_id text field
+    parent = None
+    for (job, taglist, viewing_groups, sub_id) in jobs:
+        _save_pipeline_job(job, taglist, viewing_groups)
+        if not parent:
+            parent = job.id
+        job.sub_id = "%d.%d" % (parent, sub_id)
+        job.save()
+    return [job for (job, _, _, _) in jobs]
+
+
 def _pipeline_protocols(job_data, user, yaml_data=None):
     """
     Handle supported pipeline protocols
@@ -1236,101 +1520,7 @@ def _pipeline_protocols(job_data, user, yaml_data=None):
     exceptions:
         DevicesUnavailableException if all criteria cannot be met.
     """
-    device_list = []
-    if isinstance(job_data, dict) and "protocols" not in job_data:
-        return device_list
-
-    if not yaml_data:
-        yaml_data = yaml_safe_dump(job_data)
-    role_dictionary = {}  # map of the multinode group
-    if "lava-multinode" in job_data["protocols"]:
-        # create target_group uuid, just a label for the coordinator.
-        target_group = str(uuid.uuid4())
-
-        # Handle the requirements of the Multinode protocol
-        # FIXME: needs a schema check
-        # FIXME: the vland protocol will affect the device_list
-        if "roles" in job_data["protocols"]["lava-multinode"]:
-            for role in job_data["protocols"]["lava-multinode"]["roles"]:
-                role_dictionary[role] = {"devices": [], "tags": []}
-                params = job_data["protocols"]["lava-multinode"]["roles"][role]
-                if "device_type" in params and "connection" in params:
-                    raise SubmissionException(
-                        "lava-multinode protocol cannot support device_type and connection for a single role."
-                    )
-                if "device_type" not in params and "connection" in params:
-                    # always allow support for dynamic connections which have no devices.
-                    if "host_role" not in params:
-                        raise SubmissionException(
-                            "connection specified without a host_role"
-                        )
-                    continue
-                device_type = _get_device_type(user, params["device_type"])
-                role_dictionary[role]["device_type"] = device_type
-
-                device_list = Device.objects.filter(
-                    Q(device_type=device_type), ~Q(health=Device.HEALTH_RETIRED)
-                )
-                allowed_devices = _check_submit_to_devices(device_list, user)
-
-                if len(allowed_devices) < params["count"]:
-                    raise DevicesUnavailableException(
-                        "Not enough devices of type %s are currently "
-                        "available to user %s" % (device_type, user)
-                    )
-                role_dictionary[role]["tags"] = _get_tag_list(params.get("tags", []))
-                if role_dictionary[role]["tags"]:
-                    supported = _check_tags(
-                        role_dictionary[role]["tags"], device_type=device_type
-                    )
-                    _check_tags_support(supported, allowed_devices, params["count"])
-
-                # FIXME: other protocols could need to remove devices from 'supported' here
-
-                # the device_roles cannot be set here - only once the final group has been reserved
-
-        job_object_list = []
-
-        # so far, just checked availability, now create the data.
-        # Tags and device_type are tied to the role. The actual device is
-        # a combination of the device_type and the count. Devices from the
-        # supported list are allocated to jobs for the specified role.
-
-        # split the YAML - needs the full device group information
-        # returns a dict indexed by role, containing a list of jobs
-        job_dictionary = utils.split_multinode_yaml(job_data, target_group)
-
-        if not job_dictionary:
-            raise SubmissionException("Unable to split multinode job submission.")
-
-        # structural changes done, now create the testjob.
-        # track the zero id job as the parent of the group in the sub_id text field
-        parent = None
-        for role, role_dict in role_dictionary.items():
-            for node_data in job_dictionary[role]:
-                job = _create_pipeline_job(
-                    node_data,
-                    user,
-                    target_group=target_group,
-                    taglist=role_dict["tags"],
-                    device_type=role_dict.get("device_type"),
-                    orig=None,  # store the dump of the split yaml as the job definition
-                )
-                if not job:
-                    raise SubmissionException("Unable to create job for %s" % node_data)
-                if not parent:
-                    parent = job.id
-                job.sub_id = "%d.%d" % (
-                    parent,
-                    node_data["protocols"]["lava-multinode"]["sub_id"],
-                )
-                job.multinode_definition = (
-                    yaml_data  # store complete submission, inc. comments
-                )
-                job.save()
-                job_object_list.append(job)
-
-        return job_object_list
+    return _save_multinode_jobs(_build_multinode_jobs(job_data, user, yaml_data))
 
 
 @nottest
@@ -1456,6 +1646,7 @@ class TestJob(models.Model):
         null=True,
         blank=True,
         editable=False,
+        db_index=True,
     )
 
     @property
@@ -1610,6 +1801,7 @@ class TestJob(models.Model):
         if self.state == TestJob.STATE_CANCELING:
             self.health = TestJob.HEALTH_CANCELED
         self.state = TestJob.STATE_FINISHED
+        started = self.start_time is not None
 
         # If the job is really quick to finish (a failure in validate), and
         # lava-master is slow to response then lava-logs will notice the end of
@@ -1629,6 +1821,9 @@ class TestJob(models.Model):
                 "go_state_finished", self, infrastructure_error
             )
             self.actual_device.save()
+            # Learn from the jobs that did run until the end
+            if started and self.health != TestJob.HEALTH_CANCELED:
+                record_job_duration(self)
 
         # For multinode, cancel all sub jobs if the current job is essential
         # and it was a failure.
@@ -1784,30 +1979,46 @@ class TestJob(models.Model):
         :return: a single TestJob object or a list
         (explicitly, a list, not a QuerySet) of evaluated TestJob objects
         """
+        jobs = cls.build_from_yaml_and_user(yaml_data, user, original_job=original_job)
+        (job, taglist, viewing_groups, sub_id) = jobs[0]
+        if sub_id is not None:
+            # explicitly a list, not a QuerySet.
+            return _save_multinode_jobs(jobs)
+        _save_pipeline_job(job, taglist, viewing_groups)
+        return job
+
+    @classmethod
+    def build_from_yaml_and_user(cls, yaml_data, user, lookups=None, original_job=None):
+        """
+        Runs the submission checks on incoming jobs, like from_yaml_and_user,
+        without saving the jobs.
+
+        :return: the list of (job, taglist, viewing_groups, sub_id) where
+        sub_id is the index of the job in a multinode group or None.
+        """
         job_data = yaml_safe_load(yaml_data)
 
         # visibility checks
         if "visibility" not in job_data:
             raise SubmissionException("Job visibility must be specified.")
 
+        if lookups is None:
+            lookups = SubmissionLookups(user)
+
         # pipeline protocol handling, e.g. lava-multinode
-        job_list = _pipeline_protocols(job_data, user, yaml_data)
-        if job_list:
-            # explicitly a list, not a QuerySet.
-            return job_list
+        jobs = _build_multinode_jobs(job_data, user, yaml_data, lookups)
+        if jobs:
+            return jobs
         # singlenode only
-        device_type = _get_device_type(user, job_data["device_type"])
-        devices = Device.objects.filter(
-            Q(device_type=device_type), ~Q(health=Device.HEALTH_RETIRED)
-        )
-        allow = _check_submit_to_devices(devices, user)
+        device_type = lookups.device_type(job_data["device_type"])
+        allow = lookups.allowed_devices(device_type)
         if not allow:
             raise DevicesUnavailableException(
                 "No devices of type %s are available." % device_type
             )
-        taglist = _get_tag_list(job_data.get("tags", []))
+        taglist = lookups.tag_list(job_data.get("tags", []))
         if taglist:
-            supported = _check_tags(taglist, device_type=device_type)
+            supported = lookups.tag_devices(taglist, device_type)
             _check_tags_support(supported, allow)
         if original_job:
             # Add old job absolute url to metadata
@@ -1818,14 +2029,53 @@ class TestJob(models.Model):
 
             job_data.setdefault("metadata", {}).setdefault("job.original", job_url)
 
-        return _create_pipeline_job(
+        (job, taglist, viewing_groups) = _build_pipeline_job(
             job_data,
             user,
             taglist,
             device=None,
             device_type=device_type,
             orig=yaml_data,
+            lookups=lookups,
         )
+        return [(job, taglist, viewing_groups, None)]
+
+    @classmethod
+    def from_yaml_and_user_many(cls, definitions, user):
+        """
+        Runs the submission checks on a list of incoming jobs, sharing the
+        device type, device, tag and group lookups. The accepted jobs are
+        saved with a few bulk inserts in one transaction.
+
+        :return: for each definition, a single TestJob object, a list of
+        TestJob objects for multinode jobs or the exception raised by the
+        submission checks.
+        """
+        lookups = SubmissionLookups(user)
+        results = []
+        accepted = []
+        for yaml_data in definitions:
+            try:
+                jobs = cls.build_from_yaml_and_user(yaml_data, user, lookups=lookups)
+            except (
+                SubmissionException,
+                DevicesUnavailableException,
+                Device.DoesNotExist,
+                DeviceType.DoesNotExist,
+                ValueError,
+                KeyError,
+                yaml.YAMLError,
+            ) as exc:
+                results.append(exc)
+                continue
+            accepted.extend(jobs)
+            if jobs[0][3] is None:
+                results.append(jobs[0][0])
+            else:
+                results.append([job for (job, _, _, _) in jobs])
+
+        _bulk_create_pipeline_jobs(accepted)
+        return results
 
     def can_view(self, user):
         if user == self.submitter or user.is_superuser:
@@ -2444,6 +2694,52 @@ class TestJobUser(models.Model):
         return ""
 
 
+class JobDuration(models.Model):
+    """
+    Expected duration of the jobs of a device type, learned from the
+    finished jobs. See lava_scheduler_app.estimates.
+    """
+
+    class Meta:
+        unique_together = ("device_type", "kind", "key")
+
+    KIND_DEVICE_TYPE, KIND_DESCRIPTION, KIND_SUBMITTER = range(3)
+    KIND_CHOICES = (
+        (KIND_DEVICE_TYPE, "Device type"),
+        (KIND_DESCRIPTION, "Description"),
+        (KIND_SUBMITTER, "Submitter"),
+    )
+
+    device_type = models.ForeignKey(
+        DeviceType, related_name="+", on_delete=models.CASCADE
+    )
+    kind = models.IntegerField(choices=KIND_CHOICES)
+    key = models.CharField(max_length=200, blank=True, default="")
+
+    count = models.IntegerField(default=0)
+    duration = models.FloatField(default=0, help_text="Duration in seconds")
+
+    def __str__(self):
+        return "%s [%s: %s] %ds" % (
+            self.device_type_id,
+            self.get_kind_display(),
+            self.key,
+            self.duration,
+        )
+
+
+class PermissionsVersion(models.Model):
+    """
+    Version of the group permissions, changed whenever a group permission or
+    a group membership changes. See lava_scheduler_app.auth.
+    """
+
+    version = models.CharField(max_length=32, blank=True, default="")
+
+    def __str__(self):
+        return self.version
+
+
 class GroupDeviceTypePermission(GroupObjectPermission):
     class Meta:
         unique_together = ("group", "permission", "devicetype")
@@ -20,6 +20,7 @@
 from dataclasses import dataclass
 import datetime
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import transaction
 from django.db.models import Case, When, IntegerField, Sum
@@ -27,6 +28,7 @@ from django.utils import timezone
 
 from lava_common.compat import yaml_safe_load, yaml_safe_dump
 from lava_scheduler_app.dbutils import match_vlan_interface
+from lava_scheduler_app.estimates import predict_durations
 from lava_scheduler_app.models import (
     DeviceType,
     Device,
@@ -120,14 +122,16 @@ def schedule_health_checks_for_device_type(logger, dt):
     print_header = True
     available_devices = []
     for device in devices:
-        if workers_limit[device.worker_host.hostname].overused():
+        # The worker hostname is the primary key: no need to load the worker
+        worker_limit = workers_limit[device.worker_host_id]
+        if worker_limit.overused():
             logger.debug(
                 "SKIP healthcheck for %s due to %s having %d jobs (greater than %d)"
                 % (
                     device.hostname,
-                    device.worker_host,
-                    workers_limit[device.worker_host.hostname].busy,
-                    workers_limit[device.worker_host.hostname].limit,
+                    device.worker_host_id,
+                    worker_limit.busy,
+                    worker_limit.limit,
                 )
             )
             continue
@@ -139,23 +143,25 @@ def schedule_health_checks_for_device_type(logger, dt):
 
         # Do we have to schedule an health check?
         scheduling = False
+        # The health check bookkeeping is kept on the device by
+        # Device.testjob_signal so no query is needed.
         if device.health in [Device.HEALTH_UNKNOWN, Device.HEALTH_LOOPING]:
             scheduling = True
-        elif device.last_health_report_job is None:
+        elif (
+            device.last_health_report_job_id is None
+            or device.last_health_report_time is None
+        ):
             scheduling = True
         else:
-            submit_time = device.last_health_report_job.submit_time
             if dt.health_denominator == DeviceType.HEALTH_PER_JOB:
-                count = device.testjobs.filter(
-                    health_check=False, start_time__gte=submit_time
-                ).count()
+                count = device.jobs_since_health_report
 
                 scheduling = count >= dt.health_frequency
             else:
                 frequency = datetime.timedelta(hours=dt.health_frequency)
                 now = timezone.now()
 
-                scheduling = submit_time + frequency < now
+                scheduling = device.last_health_report_time + frequency < now
 
         if not scheduling:
             available_devices.append(device.hostname)
@@ -247,6 +253,17 @@ def schedule_jobs_for_device_type(logger, dt, available_devices):
 
     workers_limit = worker_summary()
 
+    # The expected durations of the queued jobs are computed once for every
+    # device of the device type.
+    durations = None
+    if settings.SCHEDULER_DURATION_ORDERING:
+        queued = TestJob.objects.filter(
+            state=TestJob.STATE_SUBMITTED,
+            actual_device__isnull=True,
+            requested_device_type=dt,
+        ).only("id", "description", "submitter", "requested_device_type")
+        durations = predict_durations(list(queued))
+
     print_header = True
     for device in devices:
         # Check that the device had been marked available by
@@ -284,17 +301,48 @@ def schedule_jobs_for_device_type(logger, dt, available_devices):
             )
             continue
 
-        if schedule_jobs_for_device(logger, device, print_header) is not None:
+        if (
+            schedule_jobs_for_device(logger, device, print_header, durations)
+            is not None
+        ):
             print_header = False
             workers_limit[device.worker_host.hostname].busy += 1
 
 
-def schedule_jobs_for_device(logger, device, print_header):
+def fit_before_health_check(device, jobs, durations):
+    """
+    Move, within each priority, the jobs that are expected to finish before
+    the next time based health check of the device in front of the others.
+    durations are the expected durations of the jobs, see predict_durations.
+    """
+    dt = device.device_type
+    if dt.disable_health_check or dt.health_denominator != DeviceType.HEALTH_PER_HOUR:
+        return jobs
+    if device.last_health_report_time is None:
+        return jobs
+
+    deadline = device.last_health_report_time + datetime.timedelta(
+        hours=dt.health_frequency
+    )
+    remaining = (deadline - timezone.now()).total_seconds()
+    jobs = list(jobs)
+
+    def too_long(job):
+        duration = durations.get(job.id)
+        return duration is not None and duration > remaining
+
+    # The sort is stable: the original order is kept otherwise
+    return sorted(jobs, key=lambda job: (-job.priority, too_long(job)))
+
+
+def schedule_jobs_for_device(logger, device, print_header, durations=None):
     jobs = TestJob.objects.filter(state=TestJob.STATE_SUBMITTED)
     jobs = jobs.filter(actual_device__isnull=True)
     jobs = jobs.filter(requested_device_type__pk=device.device_type.pk)
     jobs = jobs.select_related("submitter")
     jobs = jobs.order_by("-priority", "submit_time", "sub_id", "id")
+    if durations is not None:
+        jobs = fit_before_health_check(device, jobs, durations)
 
     device_tags = set(device.tags.all())
     for job in jobs:
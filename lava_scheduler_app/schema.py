@@ -34,7 +34,11 @@ from voluptuous import (
     Schema,
 )
 
-from lava_common.schemas import CONTEXT_VARIABLES
+from lava_common.schemas import (
+    CONTEXT_VARIABLES,
+    VALIDATION_CACHE_SIZE,
+    ValidationCache,
+)
 
 from django.conf import settings
 
@@ -523,12 +527,21 @@ def _validate_vcs_parameters(data_objects):
                     )
 
 
+submission_cache = ValidationCache(VALIDATION_CACHE_SIZE)
+
+
 def validate_submission(data_object):
     """
     Validates a python object as a TestJob submission
+    The results are cached, keyed by the content of the definition.
     :param data: Python object, e.g. from yaml.safe_load()
     :return: True if valid, else raises SubmissionException
     """
+    submission_cache.validate(_validate_submission, SubmissionException, data_object)
+    return True
+
+
+def _validate_submission(data_object):
     try:
         _job_schema(data_object)
     except MultipleInvalid as exc:
@@ -537,7 +550,6 @@ def validate_submission(data_object):
     _validate_secrets(data_object)
     _validate_vcs_parameters(data_object)
     _validate_multinode(data_object)
-    return True
 
 
 def _validate_primary_connection_power_commands(data_object):
@@ -27,12 +27,29 @@ import zmq
 from zmq.utils.strtypes import b
 
 from django.conf import settings
+from django.contrib.auth.models import Group, User
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models.signals import post_init, post_save, pre_delete, pre_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 
 from lava_common.compat import yaml_safe_load
-from lava_scheduler_app.models import Device, TestJob, Worker
+from lava_scheduler_app.auth import invalidate_permissions_cache
+from lava_scheduler_app.fleet import invalidate_fleet_cache
+from lava_scheduler_app.models import (
+    Device,
+    GroupDevicePermission,
+    GroupDeviceTypePermission,
+    GroupWorkerPermission,
+    TestJob,
+    Worker,
+)
 from lava_scheduler_app.notifications import (
     create_notification,
     notification_criteria,
@@ -110,6 +127,9 @@ def device_post_handler(sender, **kwargs):
         # the state change.
         instance._old_health = instance.health
         instance._old_state = instance.state
+        invalidate_fleet_cache()
+        if not settings.EVENT_NOTIFICATION:
+            return
 
         # Create the message
         data = {
@@ -168,6 +188,12 @@ def testjob_post_handler(sender, **kwargs):
     # Called only when a Device is saved into the database
     instance = kwargs["instance"]
 
+    # The current job of the device changed
+    if instance.state != instance._old_state and instance.actual_device_id:
+        invalidate_fleet_cache()
+    if not settings.EVENT_NOTIFICATION:
+        return
+
     # Send a signal if the state or health changed
     if (
         (instance.health != instance._old_health)
@@ -237,6 +263,9 @@ def worker_post_handler(sender, **kwargs):
         # the state change.
         instance._old_health = instance.health
         instance._old_state = instance.state
+        invalidate_fleet_cache()
+        if not settings.EVENT_NOTIFICATION:
+            return
 
         # Create the message
         data = {
@@ -249,6 +278,19 @@ def worker_post_handler(sender, **kwargs):
         send_event(".worker", "lavaserver", data)
 
 
+@log_exception
+def fleet_handler(sender, **kwargs):
+    # Called when a device or a worker is created or deleted
+    if kwargs.get("created", True):
+        invalidate_fleet_cache()
+
+
+@log_exception
+def permissions_handler(sender, **kwargs):
+    # Called when a group permission or a group membership is changed
+    invalidate_permissions_cache()
+
+
 pre_delete.connect(
     testjob_pre_delete_handler,
     sender=TestJob,
@@ -269,35 +311,74 @@ pre_save.connect(
     dispatch_uid="testjob_notifications",
 )
 
-# Only activate these signals when EVENT_NOTIFICATION is in use
-if settings.EVENT_NOTIFICATION:
-    post_init.connect(
-        device_init_handler,
-        sender=Device,
-        weak=False,
-        dispatch_uid="device_init_handler",
-    )
+# Keep the cached group permissions up to date
+for model in [GroupDeviceTypePermission, GroupDevicePermission, GroupWorkerPermission]:
     post_save.connect(
-        device_post_handler,
-        sender=Device,
+        permissions_handler,
+        sender=model,
         weak=False,
-        dispatch_uid="device_post_handler",
+        dispatch_uid="permissions_handler_save_%s" % model._meta.model_name,
     )
-    post_save.connect(
-        testjob_post_handler,
-        sender=TestJob,
+    post_delete.connect(
+        permissions_handler,
+        sender=model,
         weak=False,
-        dispatch_uid="testjob_post_handler",
+        dispatch_uid="permissions_handler_delete_%s" % model._meta.model_name,
     )
-    post_init.connect(
-        worker_init_handler,
-        sender=Worker,
+post_delete.connect(
+    permissions_handler,
+    sender=Group,
+    weak=False,
+    dispatch_uid="permissions_handler_delete_group",
+)
+m2m_changed.connect(
+    permissions_handler,
+    sender=User.groups.through,
+    weak=False,
+    dispatch_uid="permissions_handler_groups",
+)
+
+# These handlers are used for the cached fleet and the events
+post_init.connect(
+    device_init_handler,
+    sender=Device,
+    weak=False,
+    dispatch_uid="device_init_handler",
+)
+post_save.connect(
+    device_post_handler,
+    sender=Device,
+    weak=False,
+    dispatch_uid="device_post_handler",
+)
+post_save.connect(
+    testjob_post_handler,
+    sender=TestJob,
+    weak=False,
+    dispatch_uid="testjob_post_handler",
+)
+post_init.connect(
+    worker_init_handler,
+    sender=Worker,
+    weak=False,
+    dispatch_uid="worker_init_handler",
+)
+post_save.connect(
+    worker_post_handler,
+    sender=Worker,
+    weak=False,
+    dispatch_uid="worker_post_handler",
+)
+for model in [Device, Worker]:
+    post_save.connect(
+        fleet_handler,
+        sender=model,
         weak=False,
-        dispatch_uid="worker_init_handler",
+        dispatch_uid="fleet_handler_save_%s" % model._meta.model_name,
     )
-    post_save.connect(
-        worker_post_handler,
-        sender=Worker,
+    post_delete.connect(
+        fleet_handler,
+        sender=model,
         weak=False,
-        dispatch_uid="worker_post_handler",
+        dispatch_uid="fleet_handler_delete_%s" % model._meta.model_name,
     )
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Q, Sum, When
+from django.utils import timezone
+
+from lava_scheduler_app.fleet import get_fleet
+
+
+STATISTICS_CACHE_PREFIX = "lava_scheduler_app.statistics"
+
+# The health checks summary of the device type page: (label, days)
+HEALTH_SUMMARY_WINDOWS = [("24hours", 1), ("Week", 7), ("Month", 30)]
+
+
+def _count(*args, **kwargs):
+    return Sum(
+        Case(When(*args, then=1, **kwargs), default=0, output_field=IntegerField())
+    )
+
+
+def load_lab_statistics():
+    """
+    Returns the job counters of the scheduler home page.
+    """
+    from lava_scheduler_app.models import Device, TestJob
+
+    finished_hc = Q(state=TestJob.STATE_FINISHED, health_check=True) & ~Q(
+        actual_device__health=Device.HEALTH_RETIRED
+    )
+    # Only used for counts so we're not filtering for view accessibility.
+    jobs = TestJob.objects.filter(actual_device__isnull=False).filter(
+        Q(state=TestJob.STATE_RUNNING) | finished_hc
+    )
+    jobs = jobs.aggregate(
+        running=_count(state=TestJob.STATE_RUNNING),
+        hc_total=Count(Case(When(finished_hc, then="actual_device")), distinct=True),
+        hc_completed=Count(
+            Case(
+                When(
+                    finished_hc & Q(health=TestJob.HEALTH_COMPLETE),
+                    then="actual_device",
+                )
+            ),
+            distinct=True,
+        ),
+    )
+    return {
+        "num_jobs_running": jobs["running"] or 0,
+        "hc_completed": jobs["hc_completed"],
+        "hc_total": jobs["hc_total"],
+    }
+
+
+def load_device_type_statistics(name):
+    """
+    Returns the statistics of the given device type page.
+
+    The health checks are counted by device, for each window of
+    HEALTH_SUMMARY_WINDOWS, so the caller can only keep the visible devices.
+    """
+    from lava_scheduler_app.models import Device, TestJob, Worker
+
+    devices = Device.objects.filter(device_type=name).aggregate(
+        all=Count("hostname"),
+        available=_count(
+            state=Device.STATE_IDLE,
+            health__in=[Device.HEALTH_UNKNOWN, Device.HEALTH_GOOD],
+            worker_host__state=Worker.STATE_ONLINE,
+        ),
+        running=_count(state__in=[Device.STATE_RUNNING, Device.STATE_RESERVED]),
+        retired=_count(health=Device.HEALTH_RETIRED),
+    )
+    queued = TestJob.objects.filter(
+        state=TestJob.STATE_SUBMITTED, requested_device_type=name
+    ).count()
+
+    now = timezone.now()
+    failed = [TestJob.HEALTH_CANCELED, TestJob.HEALTH_INCOMPLETE]
+    counters = {}
+    for (label, days) in HEALTH_SUMMARY_WINDOWS:
+        since = now - datetime.timedelta(days=days)
+        counters["%s_complete" % label] = _count(
+            submit_time__gte=since, health=TestJob.HEALTH_COMPLETE
+        )
+        counters["%s_failed" % label] = _count(
+            submit_time__gte=since, health__in=failed
+        )
+    since = now - datetime.timedelta(days=max(d for (_, d) in HEALTH_SUMMARY_WINDOWS))
+    health_checks = (
+        TestJob.objects.filter(
+            actual_device__device_type=name,
+            health_check=True,
+            submit_time__gte=since,
+        )
+        .values("actual_device")
+        .annotate(**counters)
+        .order_by("actual_device")
+    )
+
+    return {
+        "all_devices_count": devices["all"],
+        "available_devices_count": devices["available"] or 0,
+        "running_devices_count": devices["running"] or 0,
+        "retired_devices_count": devices["retired"] or 0,
+        "queued_jobs_count": queued,
+        "health_checks": {
+            hc["actual_device"]: {
+                label: (hc["%s_complete" % label], hc["%s_failed" % label])
+                for (label, _) in HEALTH_SUMMARY_WINDOWS
+            }
+            for hc in health_checks
+        },
+    }
+
+
+def cached_statistics(name, func, *args):
+    """
+    Returns func(*args), cached under the given name for
+    STATISTICS_CACHE_TIMEOUT seconds.
+    """
+    key = "%s.%s" % (STATISTICS_CACHE_PREFIX, name)
+    value = cache.get(key)
+    if value is None:
+        value = func(*args)
+        cache.set(key, value, settings.STATISTICS_CACHE_TIMEOUT)
+    return value
+
+
+def lab_statistics():
+    """
+    Returns the statistics of the scheduler home page. The device counters
+    are computed from the cached fleet which is invalidated on every change.
+    """
+    from lava_scheduler_app.models import Device, Worker
+
+    fleet = get_fleet()
+    statistics = dict(cached_statistics("lab", load_lab_statistics))
+    statistics["num_online"] = len(
+        [
+            d
+            for d in fleet
+            if d["health"] in [Device.HEALTH_GOOD, Device.HEALTH_UNKNOWN]
+            and d["worker_state"] == Worker.STATE_ONLINE
+        ]
+    )
+    statistics["num_not_retired"] = len(
+        [d for d in fleet if d["health"] != Device.HEALTH_RETIRED]
+    )
+    statistics["num_devices_running"] = len(
+        [
+            d
+            for d in fleet
+            if d["state"] in [Device.STATE_RESERVED, Device.STATE_RUNNING]
+        ]
+    )
+    return statistics
+
+
+def device_type_statistics(name):
+    return cached_statistics("device_type.%s" % name, load_device_type_statistics, name)
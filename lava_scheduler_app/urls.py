@@ -42,6 +42,7 @@ from lava_scheduler_app.views import (
     index,
     internal_v1_jobs,
     internal_v1_jobs_logs,
+    internal_v1_jobs_prefetch,
     internal_v1_workers,
     job_annotate_failure,
     job_cancel,
@@ -291,6 +292,11 @@ urlpatterns = [
         internal_v1_jobs_logs,
         name="lava.scheduler.internal.v1.jobs.logs",
     ),
+    url(
+        r"internal/v1/jobs/(?P<pk>[0-9]+|[0-9]+.[0-9]+)/prefetch/$",
+        internal_v1_jobs_prefetch,
+        name="lava.scheduler.internal.v1.jobs.prefetch",
+    ),
     url(
         r"internal/v1/workers/$",
         internal_v1_workers,
@@ -52,11 +52,15 @@ from django.http import (
     JsonResponse,
 )
 from django.shortcuts import get_object_or_404, redirect, render
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django.utils import timezone
 from django.utils.timesince import timeuntil
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods, require_POST
+from django.views.decorators.http import (
+    require_GET,
+    require_http_methods,
+    require_POST,
+)
 from django_tables2 import RequestConfig
 
 from lava_common.compat import yaml_load, yaml_safe_dump, yaml_safe_load
@@ -85,6 +89,12 @@ from lava_scheduler_app.dbutils import (
     testjob_submission,
     validate_job,
 )
+from lava_scheduler_app.estimates import job_estimate
+from lava_scheduler_app.statistics import (
+    HEALTH_SUMMARY_WINDOWS,
+    device_type_statistics,
+    lab_statistics,
+)
 from lava_scheduler_app.utils import get_user_ip, is_ip_allowed
 from lava_scheduler_app.logutils import logs_instance
 from lava_scheduler_app.signals import send_event
@@ -278,28 +288,6 @@ class DeviceLogView(LavaView):
         )
 
 
-def health_jobs_in_hr():
-    # Only used for count on scheduler home page so we're not filtering
-    # for view accessibility atm.
-    return (
-        TestJob.objects.values("actual_device")
-        .filter(Q(health_check=True) & ~Q(actual_device=None))
-        .exclude(actual_device__health=Device.HEALTH_RETIRED)
-        .filter(state=TestJob.STATE_FINISHED)
-        .distinct()
-    )
-
-
-def _online_total():
-    """ returns a tuple of (num_online, num_not_retired) """
-    total = Device.objects.exclude(health=Device.HEALTH_RETIRED).count()
-    online = Device.objects.filter(
-        health__in=[Device.HEALTH_GOOD, Device.HEALTH_UNKNOWN],
-        worker_host__state=Worker.STATE_ONLINE,
-    ).count()
-    return (online, total)
-
-
 class IndexTableView(JobTableView):
     def get_queryset(self):
         return visible_jobs_with_custom_sort(self.request.user).filter(
@@ -311,7 +299,16 @@ class DeviceTableView(JobTableView):
     def get_queryset(self):
         return (
             Device.objects.select_related("device_type", "worker_host")
-            .prefetch_related("tags")
+            .prefetch_related(
+                "tags",
+                Prefetch(
+                    "testjobs",
+                    queryset=TestJob.objects.filter(
+                        ~Q(state=TestJob.STATE_FINISHED)
+                    ).select_related("submitter"),
+                    to_attr="running_jobs",
+                ),
+            )
             .visible_by_user(self.request.user)
             .order_by("hostname")
             .distinct()
@@ -340,17 +337,9 @@ def index(request):
     )
     RequestConfig(request, paginate={"per_page": ptable.length}).configure(ptable)
 
-    (num_online, num_not_retired) = _online_total()
-    health_check_completed = (
-        health_jobs_in_hr().filter(health=TestJob.HEALTH_COMPLETE).count()
-    )
-    health_check_total = health_jobs_in_hr().count()
-    running_jobs_count = TestJob.objects.filter(
-        state=TestJob.STATE_RUNNING, actual_device__isnull=False
-    ).count()
-    active_devices_count = Device.objects.filter(
-        state__in=[Device.STATE_RESERVED, Device.STATE_RUNNING]
-    ).count()
+    statistics = lab_statistics()
+    num_online = statistics["num_online"]
+    num_not_retired = statistics["num_not_retired"]
 
     return render(
         request,
@@ -359,10 +348,10 @@ def index(request):
             "device_status": "%d/%d" % (num_online, num_not_retired),
             "num_online": num_online,
             "num_not_retired": num_not_retired,
-            "num_jobs_running": running_jobs_count,
-            "num_devices_running": active_devices_count,
-            "hc_completed": health_check_completed,
-            "hc_total": health_check_total,
+            "num_jobs_running": statistics["num_jobs_running"],
+            "num_devices_running": statistics["num_devices_running"],
+            "hc_completed": statistics["hc_completed"],
+            "hc_total": statistics["hc_total"],
             "device_type_table": ptable,
             "bread_crumb_trail": BreadCrumbTrail.leading_to(index),
             "context_help": BreadCrumbTrail.leading_to(index),
@@ -777,53 +766,26 @@ def device_type_detail(request, pk):
         raise PermissionDenied()
 
     # Get some test job statistics
-    now = timezone.now()
+    statistics = device_type_statistics(dt.name)
     devices = list(
         Device.objects.filter(device_type=dt)
         .values_list("pk", flat=True)
         .visible_by_user(request.user)
     )
-    daily_complete = TestJob.objects.filter(
-        actual_device__in=devices,
-        health_check=True,
-        submit_time__gte=(now - datetime.timedelta(days=1)),
-        health=TestJob.HEALTH_COMPLETE,
-    ).count()
-    daily_failed = TestJob.objects.filter(
-        actual_device__in=devices,
-        health_check=True,
-        submit_time__gte=(now - datetime.timedelta(days=1)),
-        health__in=[TestJob.HEALTH_CANCELED, TestJob.HEALTH_INCOMPLETE],
-    ).count()
-    weekly_complete = TestJob.objects.filter(
-        actual_device__in=devices,
-        health_check=True,
-        submit_time__gte=(now - datetime.timedelta(days=7)),
-        health=TestJob.HEALTH_COMPLETE,
-    ).count()
-    weekly_failed = TestJob.objects.filter(
-        actual_device__in=devices,
-        health_check=True,
-        submit_time__gte=(now - datetime.timedelta(days=7)),
-        health__in=[TestJob.HEALTH_CANCELED, TestJob.HEALTH_INCOMPLETE],
-    ).count()
-    monthly_complete = TestJob.objects.filter(
-        actual_device__in=devices,
-        health_check=True,
-        submit_time__gte=(now - datetime.timedelta(days=30)),
-        health=TestJob.HEALTH_COMPLETE,
-    ).count()
-    monthly_failed = TestJob.objects.filter(
-        actual_device__in=devices,
-        health_check=True,
-        submit_time__gte=(now - datetime.timedelta(days=30)),
-        health__in=[TestJob.HEALTH_CANCELED, TestJob.HEALTH_INCOMPLETE],
-    ).count()
-    health_summary_data = [
-        {"Duration": "24hours", "Complete": daily_complete, "Failed": daily_failed},
-        {"Duration": "Week", "Complete": weekly_complete, "Failed": weekly_failed},
-        {"Duration": "Month", "Complete": monthly_complete, "Failed": monthly_failed},
-    ]
+    health_summary_data = []
+    for (label, _) in HEALTH_SUMMARY_WINDOWS:
+        counts = [
+            statistics["health_checks"][d][label]
+            for d in devices
+            if d in statistics["health_checks"]
+        ]
+        health_summary_data.append(
+            {
+                "Duration": label,
+                "Complete": sum(c[0] for c in counts),
+                "Failed": sum(c[1] for c in counts),
+            }
+        )
 
     prefix = "no_dt_"
     no_dt_data = NoDTDeviceView(request, model=Device, table_class=DeviceTable)
@@ -875,15 +837,9 @@ def device_type_detail(request, pk):
     bits_width = dt.bits.width if dt.bits else ""
     aliases = ", ".join([alias.name for alias in dt.aliases.order_by("name")])
 
-    all_devices = dt.device_set.count()
-    available_devices = dt.device_set.filter(
-        state=Device.STATE_IDLE,
-        health__in=[Device.HEALTH_UNKNOWN, Device.HEALTH_GOOD],
-        worker_host__state=Worker.STATE_ONLINE,
-    ).count()
-    running_devices = dt.device_set.filter(
-        state__in=[Device.STATE_RUNNING, Device.STATE_RESERVED]
-    ).count()
+    all_devices = statistics["all_devices_count"]
+    available_devices = statistics["available_devices_count"]
+    running_devices = statistics["running_devices_count"]
     if available_devices:
         if available_devices == all_devices:
             available_devices_label = "success"
@@ -910,15 +866,11 @@ def device_type_detail(request, pk):
             "cores": core_string,
             "aliases": aliases,
             "all_devices_count": all_devices,
-            "retired_devices_count": dt.device_set.filter(
-                health=Device.HEALTH_RETIRED
-            ).count(),
+            "retired_devices_count": statistics["retired_devices_count"],
             "available_devices_count": available_devices,
             "available_devices_label": available_devices_label,
             "running_devices_count": running_devices,
-            "queued_jobs_count": TestJob.objects.filter(
-                state=TestJob.STATE_SUBMITTED, requested_device_type=dt
-            ).count(),
+            "queued_jobs_count": statistics["queued_jobs_count"],
             "search_data": search_data,
             "discrete_data": discrete_data,
             "terms_data": terms_data,
@@ -1174,6 +1126,38 @@ def internal_v1_jobs(request, pk):
         return JsonResponse({})
 
 
+@require_GET
+@csrf_exempt
+def internal_v1_jobs_prefetch(request, pk):
+    """
+    Return what the worker needs to download the artefacts of a job before
+    it starts. Unlike internal_v1_jobs, nothing is rendered or saved.
+    """
+    try:
+        job = TestJob.objects.get(pk=pk)
+    except TestJob.DoesNotExist:
+        return JsonResponse({"error": f"Unknown job '{pk}'"}, status=404)
+
+    # Check authentication
+    token = request.META.get("HTTP_LAVA_TOKEN")
+    if token is None:
+        return JsonResponse({"error": "Missing 'token'"}, status=400)
+    if token != job.token:
+        return JsonResponse({"error": "Invalid 'token'"}, status=400)
+
+    url_format = None
+    device = job.actual_device
+    if device is not None and device.worker_host is not None:
+        data = File("dispatcher", device.worker_host.hostname).read(raising=False)
+        with contextlib.suppress(yaml.YAMLError):
+            dispatcher_cfg = yaml_safe_load(data) or {}
+            url_format = dispatcher_cfg.get("http_url_format_string")
+
+    return JsonResponse(
+        {"definition": job.definition, "http_url_format_string": url_format}
+    )
+
+
 @require_POST
 @csrf_exempt
 def internal_v1_jobs_logs(request, pk):
@@ -1304,10 +1288,14 @@ def internal_v1_workers(request, pk=None):
         start_query = query.filter(state=TestJob.STATE_SCHEDULED)
         cancel_query = query.filter(state=TestJob.STATE_CANCELING)
         running_query = query.filter(state=TestJob.STATE_RUNNING)
+        # Multinode jobs waiting for the rest of their group: the worker can
+        # already download the artefacts.
+        prefetch_query = query.filter(state=TestJob.STATE_SCHEDULING)
 
         starts = list(start_query.values("id", "token"))
         cancels = list(cancel_query.values("id", "token"))
         runnings = list(running_query.values("id", "token"))
+        prefetches = list(prefetch_query.values("id", "token"))
 
         for job in start_query.filter(target_group__isnull=False):
             starts += [{"id": j.id, "token": j.token} for j in job.dynamic_jobs()]
@@ -1316,8 +1304,15 @@ def internal_v1_workers(request, pk=None):
         for job in running_query.filter(target_group__isnull=False):
             runnings += [{"id": j.id, "token": j.token} for j in job.dynamic_jobs()]
 
-        # Return starting, canceling and running jobs
-        return JsonResponse({"cancel": cancels, "running": runnings, "start": starts})
+        # Return starting, canceling, running and prefetching jobs
+        return JsonResponse(
+            {
+                "cancel": cancels,
+                "prefetch": prefetches,
+                "running": runnings,
+                "start": starts,
+            }
+        )
 
     else:
         if pk is not None:
@@ -1582,6 +1577,8 @@ def job_detail(request, pk):
         "size_limit": job.size_limit,
         "validation_errors": validation_errors,
     }
+    if job.state != TestJob.STATE_FINISHED:
+        data["estimate"] = job_estimate(job)
 
     try:
         job_file_size = logs_instance.size(job)
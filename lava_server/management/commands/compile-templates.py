@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+import jinja2
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import lava_scheduler_app.environment as environment
+from lava_server.files import File
+
+
+class Command(BaseCommand):
+    help = "Compile the device and device-type templates into the jinja2 cache"
+
+    def handle(self, *args, **options):
+        if environment.bytecode_cache() is None:
+            raise CommandError(
+                "Unable to use the jinja2 cache '%s'" % settings.JINJA2_CACHE_PATH
+            )
+
+        errors = 0
+        for (kind, env) in [
+            ("device-type", environment.device_types()),
+            ("device", environment.devices()),
+        ]:
+            self.stdout.write("Compiling %ss:" % kind)
+            for name in File(kind).list("*.jinja2"):
+                try:
+                    env.get_template(name)
+                    self.stdout.write("* %s" % name)
+                except jinja2.TemplateError as exc:
+                    errors += 1
+                    self.stdout.write("* %s [FAIL]" % name)
+                    self.stdout.write("  -> %s" % exc)
+        if errors:
+            raise CommandError("%d template(s) failed to compile" % errors)
@@ -198,6 +198,10 @@ DEVICE_TYPES_PATHS = [
 ]
 HEALTH_CHECKS_PATH = "/etc/lava-server/dispatcher-config/health-checks"
 
+# Compiled device and device-type templates, shared by every process.
+# Set to None to disable.
+JINJA2_CACHE_PATH = "/var/cache/lava-server/jinja2"
+
 # LDAP support
 AUTH_LDAP_SERVER_URI = None
 AUTH_LDAP_BIND_DN = None
@@ -216,6 +220,23 @@ ALLOW_ADMIN_DELETE = True
 # Default callback http timeout in seconds
 CALLBACK_TIMEOUT = 5
 
+# Timeout of the cached group permissions in seconds. Set to 0 to query the
+# group permissions for every object instead.
+PERMISSIONS_CACHE_TIMEOUT = 0
+
+# Maximum age of the cached device states in seconds
+FLEET_CACHE_TIMEOUT = 10
+
+# Age of the cached statistics of the dashboards before a refresh, in seconds
+STATISTICS_CACHE_TIMEOUT = 60
+
+# Number of finished jobs the expected job durations are averaged over
+JOB_DURATION_WINDOW = 20
+
+# Start first the jobs expected to finish before the next time based health
+# check of the device
+SCHEDULER_DURATION_ORDERING = False
+
 # Default length value for all tables
 DEFAULT_TABLE_LENGTH = 25
 
@@ -253,7 +274,7 @@ WORKER_AUTO_REGISTER_NETMASK = ["127.0.0.0/8", "::1"]
 # DRF may need this to be true when used in some instances.
 USE_X_FORWARDED_HOST = False
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": "lava_rest_app.pagination.LimitOffsetPagination",
     "DEFAULT_VERSIONING_CLASS": "rest_framework.versioning.URLPathVersioning",
     "ALLOWED_VERSIONS": REST_VERSIONS,
     "DEFAULT_FILTER_BACKENDS": (
@@ -85,6 +85,7 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 # Do not use caching as it interfere with test
 CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+JINJA2_CACHE_PATH = None
 
 with contextlib.suppress(ImportError):
     from lava_server.settings.local_settings import *  # noqa
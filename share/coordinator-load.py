@@ -0,0 +1,262 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses>.
+
+"""
+Load test of the multinode coordinator.
+
+A coordinator and the simulated multinode jobs are running in the same
+process and are talking over the loopback interface. Each job is using the
+MultinodeProtocol class of the dispatcher so the framing and the polling code
+is the one used in production.
+
+For each round, every job of a group:
+* calls lava-sync
+* calls lava-send (the first job of the group) or lava-wait (the others)
+* calls lava-send and lava-wait-all on a common message id
+Every job finally leaves the group like at the end of a multinode job.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+
+from lava.coordinator import CoordinatorThread
+from lava_dispatcher.protocols.multinode import MultinodeProtocol
+
+
+class Client(MultinodeProtocol):
+    """
+    Simulated multinode job, counting the messages sent to the coordinator
+    """
+
+    def __init__(self, port, group, index, size, options):
+        parameters = {
+            "protocols": {
+                "lava-multinode": {
+                    "target_group": group,
+                    "role": "client" if index else "server",
+                    "group_size": size,
+                }
+            }
+        }
+        super().__init__(parameters, "%s-%d" % (group, index))
+        self.index = index
+        self.blocking = not options.poll
+        self.rounds = options.rounds
+        self.debug_setup()
+        self.settings["coordinator_hostname"] = "127.0.0.1"
+        self.settings["port"] = port
+        self.settings["poll_delay"] = options.poll_delay
+        self.base_message["port"] = port
+        self.base_message["poll_delay"] = options.poll_delay
+        self.poll_timeout.duration = options.timeout
+        self.system_timeout.duration = options.timeout
+        self.messages = 0
+        self.latencies = {}
+        self.error = None
+
+    def _send_message(self, message):
+        if not self.blocking:
+            # Behave like the dispatchers that only know about polling
+            request = json.loads(message)
+            request.pop("block", None)
+            message = json.dumps(request)
+        self.messages += 1
+        return super()._send_message(message)
+
+    def _call(self, name, func, *args):
+        start = time.monotonic()
+        response = json.loads(func(*args))
+        self.latencies.setdefault(name, []).append(time.monotonic() - start)
+        if response["response"] in ["nack", "wait"]:
+            raise RuntimeError("%s: %s response" % (name, response["response"]))
+        return response
+
+    def run(self):
+        try:
+            size = self.parameters["protocols"][self.name]["group_size"]
+            group_msg = {"request": "group_data", "group_size": size}
+            self._call("group_data", self._send, group_msg, True)
+            for step in range(self.rounds):
+                self._call("lava_sync", self.request_sync, "sync-%d" % step)
+                if self.index == 0:
+                    self._call(
+                        "lava_send",
+                        self.request_send,
+                        "data-%d" % step,
+                        {"step": str(step)},
+                    )
+                else:
+                    self._call("lava_wait", self.request_wait, "data-%d" % step)
+                self._call(
+                    "lava_send",
+                    self.request_send,
+                    "done-%d" % step,
+                    {"node": self.job_id},
+                )
+                response = self._call(
+                    "lava_wait_all", self.request_wait_all, "done-%d" % step
+                )
+                if len(response["message"]) != size:
+                    raise RuntimeError("lava_wait_all: missing messages")
+            clear_msg = {"request": "clear_group", "group_size": size}
+            self._call("clear_group", self._send, clear_msg, True)
+        except Exception as exc:
+            self.error = exc
+
+
+def percentile(values, percent):
+    index = int(round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def run(options):
+    """
+    Run the load test and return the results as a dictionary
+    """
+    coordinator = CoordinatorThread(options.backlog)
+    coordinator.start()
+    clients = [
+        Client(coordinator.port, "group-%d" % group, index, options.group_size, options)
+        for group in range(options.groups)
+        for index in range(options.group_size)
+    ]
+    threads = [threading.Thread(target=c.run, daemon=True) for c in clients]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.monotonic() - start
+    coordinator.stop()
+
+    latencies = {}
+    for client in clients:
+        for (name, values) in client.latencies.items():
+            latencies.setdefault(name, []).extend(values)
+    calls = sum(len(values) for values in latencies.values())
+    messages = sum(c.messages for c in clients)
+    return {
+        "clients": len(clients),
+        "duration": duration,
+        "calls": calls,
+        "messages": messages,
+        "errors": [str(c.error) for c in clients if c.error is not None],
+        "leftover": sorted(coordinator.coordinator.all_groups.keys()),
+        "latencies": {
+            name: sorted(values) for (name, values) in sorted(latencies.items())
+        },
+    }
+
+
+def report(results, options):
+    print(
+        "%d clients (%d groups of %d), %d rounds, %s"
+        % (
+            results["clients"],
+            options.groups,
+            options.group_size,
+            options.rounds,
+            "polling every %ss" % options.poll_delay if options.poll else "blocking",
+        )
+    )
+    print(
+        "%d calls, %d messages in %.2fs: %.1f calls/s, %.1f messages/s"
+        % (
+            results["calls"],
+            results["messages"],
+            results["duration"],
+            results["calls"] / results["duration"],
+            results["messages"] / results["duration"],
+        )
+    )
+    print()
+    print(
+        "%-14s %7s %9s %9s %9s %9s"
+        % ("request", "count", "p50 (ms)", "p90 (ms)", "p99 (ms)", "max (ms)")
+    )
+    for (name, values) in results["latencies"].items():
+        print(
+            "%-14s %7d %9.1f %9.1f %9.1f %9.1f"
+            % (
+                name,
+                len(values),
+                percentile(values, 50) * 1000,
+                percentile(values, 90) * 1000,
+                percentile(values, 99) * 1000,
+                values[-1] * 1000,
+            )
+        )
+    if results["leftover"]:
+        print()
+        print("groups left in the coordinator: %s" % ", ".join(results["leftover"]))
+    if results["errors"]:
+        print()
+        print("%d clients failed:" % len(results["errors"]))
+        for error in sorted(set(results["errors"])):
+            print("* %s" % error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--groups", type=int, default=1, help="number of multinode groups"
+    )
+    parser.add_argument(
+        "--group-size", type=int, default=100, help="number of jobs in each group"
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=3, help="number of sync/send/wait rounds"
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        default=False,
+        help="poll the coordinator instead of waiting for the responses",
+    )
+    parser.add_argument(
+        "--poll-delay", type=int, default=1, help="delay between polls in seconds"
+    )
+    parser.add_argument(
+        "--timeout", type=int, default=300, help="timeout of each call in seconds"
+    )
+    parser.add_argument(
+        "--backlog", type=int, default=1024, help="listen backlog of the coordinator"
+    )
+    parser.add_argument(
+        "--debug", action="store_true", default=False, help="print the client logs"
+    )
+    options = parser.parse_args()
+
+    if options.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.getLogger("dispatcher").disabled = True
+
+    results = run(options)
+    report(results, options)
+    return 1 if results["errors"] or results["leftover"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -39,6 +39,7 @@ DISPATCHER_CONFIG = Path("/etc/lava-server/dispatcher-config/")
 DISPATCHER_D = Path("/etc/lava-server/dispatcher.d/")
 INSTANCE_CONF = Path("/etc/lava-server/instance.conf")
 INSTANCE_TEMPLATE_CONF = Path("/usr/share/lava-server/instance.conf.template")
+LAVA_CACHE = Path("/var/cache/lava-server/")
 LAVA_LOGS = Path("/var/log/lava-server/")
 LAVA_SYS_HOME = Path("/var/lib/lava-server/home/")
 LAVA_SYS_MOUNTDIR = Path("/var/lib/lava-server/default/")
@@ -133,6 +134,8 @@ def fixup():
         (LAVA_SYS_MOUNTDIR, True),
         (LAVA_SYS_MOUNTDIR / "media", True),
         (LAVA_SYS_MOUNTDIR / "media" / "job-output", True),
+        (LAVA_CACHE, True),
+        (LAVA_CACHE / "jinja2", True),
         # support changes in xml-rpc API for 2017.6
         (DISPATCHER_CONFIG, False),
         (DISPATCHER_D, False),
@@ -0,0 +1,99 @@
+import pytest
+import voluptuous
+
+from lava_common.schemas import (
+    job_schema,
+    validate,
+    validate_many,
+    validation_cache,
+)
+
+
+def job_definition(**kwargs):
+    data = {
+        "device_type": "qemu",
+        "job_name": "schema-cache",
+        "timeouts": {"job": {"minutes": 10}},
+        "visibility": "public",
+        "actions": [
+            {"deploy": {"to": "tmpfs", "images": {"rootfs": {"url": "http://x"}}}},
+            {"boot": {"method": "qemu", "media": "tmpfs", "prompts": ["root@"]}},
+        ],
+    }
+    data.update(kwargs)
+    return data
+
+
+def test_job_schema_cache():
+    job_schema.cache_clear()
+    validation_cache.clear()
+    validate(job_definition())
+    validate(job_definition(), extra_context_variables=["b", "a"])
+    validate(job_definition(job_name="other"), extra_context_variables=["a", "b", "a"])
+    info = job_schema.cache_info()
+    assert info.misses == 2  # nosec - assert is part of the test process.
+    assert info.hits == 1  # nosec - assert is part of the test process.
+
+    # The cached schema still depends on the extra context variables
+    validate(job_definition(context={"a": 1}), extra_context_variables=["a"])
+    with pytest.raises(voluptuous.Invalid):
+        validate(job_definition(context={"a": 1}))
+
+
+def test_validate_many():
+    results = validate_many(
+        [
+            job_definition(),
+            job_definition(visibility="everyone"),
+            job_definition(actions=[{"boot": {"method": "unknown"}}]),
+        ]
+    )
+    assert results[0] == []  # nosec - assert is part of the test process.
+    assert results[1] == [  # nosec - assert is part of the test process.
+        {"path": ["visibility"], "msg": "not a valid value"}
+    ]
+    assert results[2] == [  # nosec - assert is part of the test process.
+        {"path": ["actions", "boot", "unknown"], "msg": "unknown action type"}
+    ]
+
+
+def test_validation_cache():
+    validation_cache.clear()
+    validate(job_definition(metadata={"build": 1}))
+    validate(job_definition(metadata={"build": 2}))
+    assert validation_cache.misses == 1  # nosec - assert is part of the test process.
+    assert validation_cache.hits == 1  # nosec - assert is part of the test process.
+
+    # The same error is raised on every call
+    errors = []
+    for _ in range(2):
+        with pytest.raises(voluptuous.Invalid) as exc:
+            validate(job_definition(visibility="everyone"))
+        errors.append(exc.value)
+    (miss, hit) = errors
+    assert hit is not miss  # nosec - assert is part of the test process.
+    assert str(hit) == str(miss)  # nosec - assert is part of the test process.
+    assert hit.path == ["visibility"]  # nosec - assert is part of the test process.
+    assert validation_cache.hits == 2  # nosec - assert is part of the test process.
+
+    # The key depends on the types and on the validation parameters
+    validate(job_definition(extra=1), strict=False)
+    with pytest.raises(voluptuous.Invalid):
+        validate(job_definition(extra=1))
+    with pytest.raises(voluptuous.Invalid):
+        validate(job_definition(visibility=["everyone"]))
+    with pytest.raises(voluptuous.Invalid):
+        validate(job_definition(context={"a": 1}))
+    validate(job_definition(context={"a": 1}), extra_context_variables=["a"])
+    assert validation_cache.hits == 2  # nosec - assert is part of the test process.
+
+    # The cache is bounded
+    size = validation_cache.size
+    try:
+        validation_cache.size = 2
+        for name in ["a", "b", "c"]:
+            validate(job_definition(job_name=name))
+        results = validation_cache.results
+        assert len(results) == 2  # nosec - assert is part of the test process.
+    finally:
+        validation_cache.size = size
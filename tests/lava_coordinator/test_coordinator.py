@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses>.
+
+import json
+import socket
+import threading
+
+from lava_dispatcher.protocols.multinode import MultinodeProtocol
+
+
+def client(port, job_id, role, group_size, poll_delay=5):
+    parameters = {
+        "protocols": {
+            "lava-multinode": {
+                "target_group": "group",
+                "role": role,
+                "group_size": group_size,
+            }
+        }
+    }
+    protocol = MultinodeProtocol(parameters, job_id)
+    protocol.debug_setup()
+    protocol.settings["port"] = port
+    protocol.settings["coordinator_hostname"] = "127.0.0.1"
+    protocol.settings["poll_delay"] = poll_delay
+    protocol.base_message["port"] = port
+    protocol.base_message["poll_delay"] = poll_delay
+
+    # Record every request sent to the coordinator
+    protocol.requests = []
+    send_message = protocol._send_message
+
+    def _send_message(message):
+        protocol.requests.append(json.loads(message)["request"])
+        return send_message(message)
+
+    protocol._send_message = _send_message
+    return protocol
+
+
+def request(port, data):
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        message = json.dumps(data)
+        sock.sendall(("%08X" % len(message)).encode("utf-8"))
+        sock.sendall(message.encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+        response = b""
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            response += data
+    return json.loads(response[8:].decode("utf-8"))
+
+
+def test_polling_client(coordinator):
+    # Without the "block" key, the coordinator answers immediately
+    data = {
+        "request": "group_data",
+        "group_name": "polling",
+        "group_size": 2,
+        "client_name": "1",
+        "hostname": "localhost",
+        "role": "server",
+    }
+    assert request(coordinator.port, data) == {"response": "wait"}  # nosec - unit test
+    coordinator.stop()
+    assert coordinator.coordinator.parked == {}  # nosec - unit test
+
+
+def test_blocking_client(coordinator):
+    # Parked requests are answered when the group condition is met
+    clients = [
+        client(coordinator.port, str(index), "server" if index else "client", 3)
+        for index in range(3)
+    ]
+    replies = {}
+
+    def run(protocol):
+        protocol.initialise_group()
+        replies[protocol.job_id] = [
+            json.loads(protocol.request_sync("sync-1")),
+            json.loads(protocol.request_sync("sync-1")),
+        ]
+        if protocol.job_id == "0":
+            protocol.request_send("message", {"key": "value"})
+        else:
+            replies[protocol.job_id].append(
+                json.loads(protocol.request_wait("message"))
+            )
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    assert sorted(replies.keys()) == ["0", "1", "2"]  # nosec - unit test
+    # Each request was sent once: the clients never had to poll
+    assert clients[0].requests == [  # nosec - unit test
+        "group_data",
+        "lava_sync",
+        "lava_sync",
+        "lava_send",
+    ]
+    for protocol in clients[1:]:
+        assert protocol.requests == [  # nosec - unit test
+            "group_data",
+            "lava_sync",
+            "lava_sync",
+            "lava_wait",
+        ]
+    for job_id in ["1", "2"]:
+        assert replies[job_id][0]["response"] == "ack"  # nosec - unit test
+        assert replies[job_id][1]["response"] == "ack"  # nosec - unit test
+        assert replies[job_id][2] == {  # nosec - unit test
+            "response": "ack",
+            "message": {"0": {"key": "value"}},
+        }
+    coordinator.stop()
+    assert coordinator.coordinator.parked == {}  # nosec - unit test
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses>.
+
+import argparse
+import importlib.util
+import pathlib
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def coordinator_load():
+    """
+    The load testing script
+    """
+    path = pathlib.Path(__file__).parent / ".." / ".." / "share" / "coordinator-load.py"
+    spec = importlib.util.spec_from_file_location("coordinator_load", str(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_load(coordinator_load):
+    options = argparse.Namespace(
+        groups=2,
+        group_size=10,
+        rounds=2,
+        poll=False,
+        poll_delay=5,
+        timeout=60,
+        backlog=1024,
+    )
+    results = coordinator_load.run(options)
+    assert results["clients"] == 2 * 10  # nosec - unit test
+    assert results["errors"] == []  # nosec - unit test
+    assert results["leftover"] == []  # nosec - unit test
+    # 1 group_data, 2 * (sync, send or wait, send, wait_all) and 1 clear_group
+    assert results["calls"] == 20 * 10  # nosec - unit test
+    # Every request was answered by the coordinator without polling
+    assert results["messages"] == results["calls"]  # nosec - unit test
@@ -1,9 +1,12 @@
 import logging
 import pytest
+import stat
+import tarfile
 
 from lava_common.exceptions import JobError, LAVABug
 from lava_dispatcher.actions.deploy.apply_overlay import AppendOverlays
 from lava_dispatcher.job import Job
+from lava_dispatcher.utils.compression import NewcWriter, compress_file, cpio_listing
 
 
 def test_append_overlays_validate():
@@ -114,6 +117,11 @@ def test_append_overlays_update_cpio(caplog, mocker, tmpdir):
         }
     }
     action.mkdtemp = lambda: str(tmpdir)
+    # Force the extraction of the ramdisk
+    mocker.patch(
+        "lava_dispatcher.actions.deploy.apply_overlay.can_append_cpio",
+        return_value=False,
+    )
     decompress_file = mocker.patch(
         "lava_dispatcher.actions.deploy.apply_overlay.decompress_file"
     )
@@ -145,6 +153,78 @@ def test_append_overlays_update_cpio(caplog, mocker, tmpdir):
     ]
 
 
+def test_append_overlays_append_cpio(caplog, tmpdir):
+    caplog.set_level(logging.DEBUG)
+    params = {
+        "format": "cpio.newc",
+        "overlays": {
+            "modules": {
+                "url": "http://example.com/modules.tar.xz",
+                "compression": "xz",
+                "format": "tar",
+                "path": "/",
+            }
+        },
+    }
+
+    # The original ramdisk, with a symlink to a directory
+    with open(str(tmpdir / "rootfs.cpio"), "wb") as f_out:
+        writer = NewcWriter(f_out)
+        writer.add("usr/lib", stat.S_IFDIR | 0o700)
+        writer.add("lib", stat.S_IFLNK | 0o777, data=b"usr/lib")
+        writer.close()
+    compress_file(str(tmpdir / "rootfs.cpio"), "gz")
+    (tmpdir / "modules" / "lib" / "modules").ensure(dir=True)
+    (tmpdir / "modules" / "lib" / "modules" / "hello.ko").write_text(
+        "hello", encoding="utf-8"
+    )
+    with tarfile.open(str(tmpdir / "modules.tar"), "w") as tar:
+        tar.add(str(tmpdir / "modules" / "lib" / "modules"), "lib/modules")
+
+    action = AppendOverlays("rootfs", params)
+    action.job = Job(1234, {}, None)
+    action.parameters = {
+        "rootfs": {"url": "http://example.com/rootfs.cpio.gz", **params},
+        "namespace": "common",
+    }
+    action.data = {
+        "common": {
+            "download-action": {
+                "rootfs": {
+                    "file": str(tmpdir / "rootfs.cpio.gz"),
+                    "compression": "gz",
+                    "decompressed": False,
+                },
+                "rootfs.modules": {"file": str(tmpdir / "modules.tar")},
+            }
+        }
+    }
+    (tmpdir / "segment").ensure(dir=True)
+    action.mkdtemp = lambda: str(tmpdir / "segment")
+
+    action.update_cpio()
+
+    # The modules are installed through the symlink
+    entries = cpio_listing(str(tmpdir / "rootfs.cpio.gz"), "gz")
+    assert sorted(entries) == [
+        "lib",
+        "usr",
+        "usr/lib",
+        "usr/lib/modules",
+        "usr/lib/modules/hello.ko",
+    ]
+    assert entries["lib"] == (stat.S_IFLNK | 0o777, "usr/lib")
+    assert entries["usr/lib/modules/hello.ko"][0] == stat.S_IFREG | 0o644
+    assert caplog.record_tuples == [
+        ("dispatcher", 20, f"Modifying '{tmpdir}/rootfs.cpio.gz'"),
+        ("dispatcher", 10, f"* listing '{tmpdir}/rootfs.cpio.gz'"),
+        ("dispatcher", 10, "Overlays:"),
+        ("dispatcher", 10, f"- rootfs.modules: '{tmpdir}/modules.tar' to '/'"),
+        ("dispatcher", 10, "* compressing (gz)"),
+        ("dispatcher", 10, f"* appending to '{tmpdir}/rootfs.cpio.gz'"),
+    ]
+
+
 def test_append_overlays_update_guestfs(caplog, mocker, tmpdir):
     caplog.set_level(logging.DEBUG)
     params = {
@@ -224,6 +304,11 @@ def test_append_lava_overlay_update_cpio(caplog, mocker, tmpdir):
         }
     }
     action.mkdtemp = lambda: str(tmpdir)
+    # Force the extraction of the ramdisk
+    mocker.patch(
+        "lava_dispatcher.actions.deploy.apply_overlay.can_append_cpio",
+        return_value=False,
+    )
     decompress_file = mocker.patch(
         "lava_dispatcher.actions.deploy.apply_overlay.decompress_file"
     )
@@ -26,6 +26,7 @@ from urllib.parse import urlparse
 
 from lava_common.constants import HTTP_DOWNLOAD_CHUNK_SIZE
 from lava_common.exceptions import InfrastructureError, JobError
+from lava_common.utils import prefetch_filename
 from lava_dispatcher.actions.deploy.download import (
     CopyToLxcAction,
     DownloaderAction,
@@ -597,6 +598,60 @@ def test_http_download_reader(mocker):
     assert exc.match("Unable to download 'https://example.com/dtb': error")
 
 
+def test_http_download_prefetched(tmpdir, mocker):
+    def dummyhead(url, allow_redirects, headers):
+        assert 0
+
+    def dummyget(url, allow_redirects, stream, headers=None):
+        assert 0
+
+    mocker.patch("requests.head", dummyhead)
+    mocker.patch("requests.get", dummyget)
+
+    (tmpdir / "prefetch").mkdir()
+    (tmpdir / "prefetch" / prefetch_filename("https://example.com/dtb")).write_text(
+        "helloworld", encoding="utf-8"
+    )
+    action = HttpDownloadAction("dtb", str(tmpdir), urlparse("https://example.com/dtb"))
+    action.section = "deploy"
+    action.job = Job(
+        1234, {"dispatcher": {"prefetch_dir": str(tmpdir / "prefetch")}}, None
+    )
+    action.parameters = {
+        "to": "download",
+        "images": {"dtb": {"url": "https://example.com/dtb"}},
+        "namespace": "common",
+    }
+    action.params = action.parameters["images"]["dtb"]
+    action.validate()
+    assert action.errors == []
+    assert action.size == 10
+    assert action.prefetched == str(
+        tmpdir / "prefetch" / prefetch_filename("https://example.com/dtb")
+    )
+    action.run(None, 4212)
+    assert (tmpdir / "dtb" / "dtb").read_text(encoding="utf-8") == "helloworld"
+    assert action.results["size"] == 10
+
+    # Not prefetched
+    action = HttpDownloadAction(
+        "kernel", str(tmpdir), urlparse("https://example.com/kernel")
+    )
+    action.job = Job(
+        1234, {"dispatcher": {"prefetch_dir": str(tmpdir / "prefetch")}}, None
+    )
+    action.section = "deploy"
+    action.parameters = {
+        "to": "download",
+        "images": {"kernel": {"url": "https://example.com/kernel"}},
+        "namespace": "common",
+    }
+    action.params = action.parameters["images"]["kernel"]
+    with pytest.raises(AssertionError):
+        action.validate()
+    assert action.prefetched is None
+
+
 def test_http_download_run(tmpdir):
     def reader():
         yield b"hello"
@@ -710,6 +765,49 @@ def test_http_download_run_compressed(tmpdir):
     }
 
 
+def test_http_download_run_only_requested_checksums(tmpdir):
+    def reader():
+        yield b"hello"
+        yield b"world"
+
+    action = HttpDownloadAction("dtb", str(tmpdir), urlparse("https://example.com/dtb"))
+    action.job = Job(1234, {"dispatcher": {}}, None)
+    action.url = urlparse("https://example.com/dtb")
+    action.parameters = {
+        "to": "download",
+        "images": {
+            "dtb": {
+                "url": "https://example.com/dtb",
+                "md5sum": "fc5e038d38a57032085441e7fe7010b0",
+            }
+        },
+        "namespace": "common",
+    }
+    action.params = action.parameters["images"]["dtb"]
+    action.reader = reader
+    action.fname = str(tmpdir / "dtb/dtb")
+    action.run(None, 4212)
+    assert dict(action.results) == {
+        "success": {"md5": "fc5e038d38a57032085441e7fe7010b0"},
+        "label": "dtb",
+        "size": 10,
+        "md5sum": "fc5e038d38a57032085441e7fe7010b0",
+    }
+
+    # Without any checksum, only sha256 is computed
+    del action.params["md5sum"]
+    action.job = Job(1234, {"dispatcher": {}}, None)
+    action.run(None, 4212)
+    sha256 = action.get_namespace_data(
+        action="download-action", label="dtb", key="sha256"
+    )
+    assert sha256 == "936a185caaa266bb9cbe981e9e05cb78cd732b0b3280eb944412bb6f8f8f07af"
+    assert (
+        action.get_namespace_data(action="download-action", label="dtb", key="md5")
+        is None
+    )
+
+
 def test_predownloaded_job_validation():
     factory = Factory()
     factory.validate_job_strict = True
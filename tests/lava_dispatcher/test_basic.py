@@ -18,7 +18,9 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
+import importlib
 import os
+import pkgutil
 import sys
 import time
 import jinja2
@@ -35,9 +37,13 @@ from lava_common.exceptions import (
 )
 from lava_common.schemas import validate as validate_job
 from lava_common.schemas.device import validate as validate_device
+from lava_common.timeout import Timeout
 from lava_dispatcher.action import Pipeline, Action
 from lava_dispatcher.parser import JobParser
 from lava_dispatcher.device import NewDevice
+from lava_dispatcher.job import Job
+from lava_dispatcher.logical import Boot, Deployment, LavaTest, strategy_candidates
+from lava_dispatcher.utils.profiler import Profiler
 from lava_dispatcher.actions.deploy.image import DeployImages
 from tests.utils import DummyLogger
 
@@ -478,6 +484,44 @@ class TestPipeline(StdoutTestCase):
             test_action.get_namespace_data("common", "unknown", "simple"), 1
         )
 
+    def test_namespace_data_copy_on_write(self):
+        factory = Factory()
+        job = factory.create_kvm_job("sample_jobs/kvm.yaml")
+        test_action = job.pipeline.actions[0]
+        test_action.validate()
+        value = {"key": {"nest": [{"a": 1}]}, "other": {"b": 2}, "simple": "c"}
+        test_action.set_namespace_data("common", "ns", "cow", value)
+        stats = test_action.namespace_stats
+        reads, copies = stats.reads, stats.copies
+
+        data = test_action.get_namespace_data("common", "ns", "cow")
+        self.assertEqual(data, value)
+        self.assertEqual(stats.reads, reads + 1)
+        self.assertEqual(stats.copies, copies + 1)
+        data["key"]["nest"][0]["a"] = 2
+        data["key"]["nest"].append(3)
+        data["simple"] = "d"
+        merged = dict(data)
+        merged["other"]["b"] = 3
+        self.assertEqual(
+            data,
+            {"key": {"nest": [{"a": 2}, 3]}, "other": {"b": 3}, "simple": "d"},
+        )
+        # Only the accessed values were copied
+        self.assertEqual(stats.copies, copies + 5)
+        self.assertEqual(
+            test_action.get_namespace_data("common", "ns", "cow"),
+            {"key": {"nest": [{"a": 1}]}, "other": {"b": 2}, "simple": "c"},
+        )
+        self.assertEqual(
+            yaml_safe_load(yaml_safe_dump(data)),
+            {"key": {"nest": [{"a": 2}, 3]}, "other": {"b": 3}, "simple": "d"},
+        )
+        self.assertEqual(data.popitem(), ("simple", "d"))
+        self.assertEqual(data.popitem(), ("other", {"b": 3}))
+        self.assertEqual(data.popitem(), ("key", {"nest": [{"a": 2}, 3]}))
+        self.assertRaises(KeyError, data.popitem)
+
 
 class TestFakeActions(StdoutTestCase):
     class KeepConnection(Action):
@@ -532,6 +576,30 @@ class TestFakeActions(StdoutTestCase):
         conn = object()
         self.assertIsNot(conn, pipe.run_actions(conn, None))
 
+    def test_profiler(self):
+        job = Job(1234, {}, None)
+        job.timeout = Timeout("job")
+        job.profiler = Profiler()
+        pipe = Pipeline(job=job)
+        pipe.add_action(self.sub0)
+        pipe.add_action(TestFakeActions.KeepConnection())
+        pipe.run_actions(None, time.time() + 60)
+        report = job.profiler.report()
+        self.assertEqual(
+            [(r["level"], r["name"], r["result"]) for r in report["actions"]],
+            [("1", self.sub0.name, "pass"), ("2", "keep-connection", "pass")],
+        )
+        for key in ["wall", "cpu", "cpu_children", "blocked"]:
+            self.assertGreaterEqual(report["actions"][0][key], 0)
+            self.assertEqual(
+                report["total"][key],
+                round(sum(r[key] for r in report["actions"]), 6),
+            )
+        for key in ["max_rss", "max_rss_children"]:
+            self.assertGreaterEqual(report["actions"][0][key], 0)
+        for key in ["namespace_reads", "namespace_copies", "namespace_time"]:
+            self.assertGreaterEqual(report["actions"][0][key], 0)
+
 
 class TestStrategySelector(StdoutTestCase):
     """
@@ -558,3 +626,29 @@ class TestStrategySelector(StdoutTestCase):
         ]
         willing.sort(key=lambda x: x.priority, reverse=True)
         self.assertIsInstance(willing[0], TestStrategySelector.Third)
+
+    def test_registry(self):
+        # Every strategy should be registered, and only registered modules
+        # should define strategies.
+        for base in [Deployment, Boot, LavaTest]:
+            registry = importlib.import_module(base.strategies).STRATEGIES
+            registered = set(m for modules in registry.values() for m in modules)
+            package = importlib.import_module(base.strategies.rpartition(".")[0])
+            for module in pkgutil.iter_modules(package.__path__):
+                importlib.import_module(package.__name__ + "." + module.name)
+            defined = set(c.__module__ for c in base.__subclasses__())
+            self.assertEqual(registered, defined)
+
+    def test_select(self):
+        factory = Factory()
+        job = factory.create_kvm_job("sample_jobs/kvm.yaml")
+        device = job.device
+        parameters = job.parameters["actions"][1]["boot"]
+        self.assertEqual(
+            [c.__name__ for c in strategy_candidates(Boot, [parameters["method"]])],
+            ["BootQEMU"],
+        )
+        self.assertEqual(Boot.select(device, parameters).__name__, "BootQEMU")
+        parameters = dict(parameters, method="unknown")
+        with self.assertRaisesRegex(JobError, "BootQEMU"):
+            Boot.select(device, parameters)
@@ -18,13 +18,23 @@
 # along
 # with this program; if not, see <http://www.gnu.org/licenses>.
 
+import bz2
 import copy
+import gzip
+import lzma
 import os
+import pytest
 import hashlib
-from lava_common.exceptions import InfrastructureError
+import stat
+import tarfile
+from lava_common.exceptions import InfrastructureError, JobError
 from tests.lava_dispatcher.test_basic import Factory, StdoutTestCase
 from lava_dispatcher.utils.compression import decompress_file
 from lava_dispatcher.utils.compression import decompress_command_map
+from lava_dispatcher.utils.compression import StreamDecompressor
+from lava_dispatcher.utils.compression import GzipCache, create_tarball
+from lava_dispatcher.utils.compression import NewcWriter, append_cpio, cpio_listing
+from lava_dispatcher.utils.contextmanager import chdir
 
 
 class TestDecompression(StdoutTestCase):
@@ -109,3 +119,132 @@ class TestDecompression(StdoutTestCase):
         with self.assertRaises(InfrastructureError):
             decompress_file("/tmp/test.xz", "zip")  # nosec - unit test only.
         self.assertEqual(copy_of_command_map, decompress_command_map)
+
+
+class TestStreamDecompression(StdoutTestCase):
+    def test_concatenated_streams(self):
+        for compression, compress in (
+            ("bz2", bz2.compress),
+            ("gz", gzip.compress),
+            ("xz", lzma.compress),
+        ):
+            data = compress(b"hello ") + compress(b"world\n") + b"\x00" * 4
+            decompressor = StreamDecompressor(compression)
+            output = b"".join(
+                decompressor.decompress(data[i : i + 7]) for i in range(0, len(data), 7)
+            )
+            output += decompressor.flush()
+            self.assertEqual(output, b"hello world\n")
+
+    def test_truncated_stream(self):
+        decompressor = StreamDecompressor("xz")
+        decompressor.decompress(lzma.compress(b"hello world\n")[:-8])
+        with self.assertRaises(JobError):
+            decompressor.flush()
+
+    def test_invalid_stream(self):
+        decompressor = StreamDecompressor("gz")
+        with self.assertRaises(JobError):
+            decompressor.decompress(lzma.compress(b"hello world\n"))
+
+
+def test_create_tarball(tmpdir):
+    (tmpdir / "overlay" / "lava-1234" / "bin").ensure(dir=True)
+    (tmpdir / "overlay" / "lava-1234" / "bin" / "lava-test-case").write("#!/bin/sh\n")
+    (tmpdir / "overlay" / "lava-1234" / "big").write_binary(b"0123456789" * 10000)
+    (tmpdir / "overlay" / "lava-1234" / "link").mksymlinkto("big")
+
+    def members(filename):
+        with tarfile.open(filename) as tar:
+            return [
+                (m.name, m.type, tar.extractfile(m).read() if m.isreg() else m.linkname)
+                for m in tar.getmembers()
+            ]
+
+    with chdir(str(tmpdir / "overlay")):
+        with tarfile.open(str(tmpdir / "ref.tar.gz"), "w:gz") as tar:
+            tar.add("./lava-1234")
+        cache = GzipCache(str(tmpdir / "cache"))
+        assert create_tarball(str(tmpdir / "1.tar.gz"), ["./lava-1234"], cache) == {
+            "hits": 0,
+            "misses": 1,
+        }
+        assert create_tarball(str(tmpdir / "2.tar.gz"), ["./lava-1234"], cache) == {
+            "hits": 1,
+            "misses": 0,
+        }
+        assert create_tarball(str(tmpdir / "3.tar.gz"), ["./lava-1234"]) == {
+            "hits": 0,
+            "misses": 0,
+        }
+
+    expected = members(str(tmpdir / "ref.tar.gz"))
+    assert len(expected) == 5
+    for name in ["1.tar.gz", "2.tar.gz", "3.tar.gz"]:
+        assert members(str(tmpdir / name)) == expected
+
+    cache.size = 0
+    cache.prune()
+    assert (tmpdir / "cache").listdir() == []
+
+
+def test_append_cpio(tmpdir):
+    (tmpdir / "root" / "etc").ensure(dir=True)
+    (tmpdir / "root" / "etc" / "hostname").write_text("lava", encoding="utf-8")
+    os.symlink("etc", str(tmpdir / "root" / "conf"))
+    with open(str(tmpdir / "ramdisk.cpio"), "wb") as f_out:
+        writer = NewcWriter(f_out)
+        writer.add_directory(str(tmpdir / "root"))
+        writer.close()
+    entries = cpio_listing(str(tmpdir / "ramdisk.cpio"))
+    assert sorted(entries) == ["conf", "etc", "etc/hostname"]
+    assert entries["conf"] == (stat.S_IFLNK | 0o777, "etc")
+
+    # Files are added through the symlinks of the original archive
+    with open(str(tmpdir / "overlay.cpio"), "wb") as f_out:
+        writer = NewcWriter(f_out, entries)
+        writer.add("conf/hosts", stat.S_IFREG | 0o644, data=b"127.0.0.1")
+        writer.add("lava/bin/test", stat.S_IFREG | 0o755, data=b"#!/bin/sh")
+        writer.close()
+    with open(str(tmpdir / "ramdisk.cpio"), "ab") as f_out:
+        f_out.write(b"\x00" * 3)
+    append_cpio(str(tmpdir / "ramdisk.cpio"), str(tmpdir / "overlay.cpio"))
+    assert os.path.getsize(str(tmpdir / "ramdisk.cpio")) % 4 == 0
+
+    entries = cpio_listing(str(tmpdir / "ramdisk.cpio"))
+    assert sorted(entries) == [
+        "conf",
+        "etc",
+        "etc/hostname",
+        "etc/hosts",
+        "lava",
+        "lava/bin",
+        "lava/bin/test",
+    ]
+    assert entries["lava"] == (stat.S_IFDIR | 0o755, None)
+
+    # Truncated archive
+    with open(str(tmpdir / "ramdisk.cpio"), "rb") as f_in:
+        data = f_in.read()
+    with open(str(tmpdir / "truncated.cpio"), "wb") as f_out:
+        f_out.write(data[:200])
+    with pytest.raises(JobError):
+        cpio_listing(str(tmpdir / "truncated.cpio"))
+
+
+def test_gzip_cache_errors(tmpdir):
+    cache = GzipCache(str(tmpdir / "cache"))
+    (tmpdir / "cache" / "in-progress.tmp").write_binary(b"0" * 100)
+    cache.put("a", b"1" * 10)
+    assert cache.get("a") == b"1" * 10
+
+    # The temporary files of the other jobs are kept
+    cache.size = 0
+    cache.prune()
+    assert [p.basename for p in (tmpdir / "cache").listdir()] == ["in-progress.tmp"]
+
+    # Write errors are ignored
+    (tmpdir / "cache").remove()
+    cache.put("b", b"2" * 10)
+    assert cache.get("b") is None
+    cache.prune()
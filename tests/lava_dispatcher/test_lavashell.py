@@ -20,6 +20,8 @@
 
 import os
 import datetime
+import time
+import pexpect
 from lava_common.compat import yaml_safe_dump, yaml_safe_load
 from lava_common.timeout import Timeout
 from lava_common.exceptions import InfrastructureError, JobError
@@ -33,6 +35,7 @@ from lava_dispatcher.protocols.multinode import MultinodeProtocol
 from lava_dispatcher.protocols.vland import VlandProtocol
 from tests.lava_dispatcher.test_basic import Factory, StdoutTestCase
 from lava_dispatcher.actions.test.shell import TestShellRetry, TestShellAction
+from lava_dispatcher.shell import ShellCommand, ShellSelector, ShellSession
 
 
 class TestDefinitionHandlers(StdoutTestCase):
@@ -182,3 +185,54 @@ class TestShellResults(StdoutTestCase):
         def run(self, connection, max_end_time):
             self.count += 1
             raise JobError("fake error")
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.lines = []
+
+    def target(self, line):
+        self.lines.append(("target", line))
+
+    def feedback(self, line):
+        self.lines.append(("feedback", line))
+
+
+class TestShellSelector(StdoutTestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = Job(1234, {}, None)
+        self.logger = RecordingLogger()
+
+    def session(self, command):
+        shell = ShellCommand(command, Timeout("fake", 30), logger=self.logger)
+        self.addCleanup(shell.close)
+        return ShellSession(self.job, shell)
+
+    def test_expect_with_feedback(self):
+        test = self.session("sh -c 'sleep 1; echo done; sleep 5'")
+        feedback = self.session("sh -c 'echo hello; echo world; sleep 5'")
+        with ShellSelector() as selector:
+            selector.register("other", feedback)
+            start = time.monotonic()
+            index = selector.expect(
+                test.raw_connection, ["done", pexpect.EOF, pexpect.TIMEOUT], 10
+            )
+            self.assertEqual(index, 0)
+            self.assertLess(time.monotonic() - start, 5)
+        # The feedback was logged while waiting for the test connection
+        self.assertEqual(
+            self.logger.lines[:2], [("feedback", "hello"), ("feedback", "world")]
+        )
+        self.assertIn(("target", "done"), self.logger.lines)
+        self.assertNotIn(("target", "hello"), self.logger.lines)
+
+    def test_expect_timeout(self):
+        test = self.session("sh -c 'sleep 5'")
+        feedback = self.session("sh -c 'echo hello'")
+        with ShellSelector() as selector:
+            selector.register("other", feedback)
+            self.assertEqual(
+                selector.expect(test.raw_connection, ["done", pexpect.TIMEOUT], 1), 1
+            )
+        self.assertEqual(self.logger.lines, [("feedback", "hello")])
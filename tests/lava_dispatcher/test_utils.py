@@ -169,6 +169,29 @@ def test_no_history(setup, tmpdir):
     assert not (tmpdir / "git.clone1" / ".git").exists()
 
 
+def test_clone_with_cache(setup, tmpdir):
+    git = vcs.GitHelper("git", cache_dir=str(tmpdir / "cache"))
+    assert git.clone("git.clone1") == "a7af835862da0e0592eeeac901b90e8de2cf5b67"
+    assert len(list((tmpdir / "cache").listdir("*.git"))) == 1
+    assert (
+        git.clone("git.clone2", branch="testing", shallow=True)
+        == "f2589a1b7f0cfc30ad6303433ba4d5db1a542c2d"
+    )
+    assert (
+        git.clone("git.clone3", revision="2f83e6d8189025e356a9563b8d78bdc8e2e9a3ed")
+        == "2f83e6d8189025e356a9563b8d78bdc8e2e9a3ed"
+    )
+    # The clones should point to the original repository
+    assert (
+        subprocess.check_output(  # nosec - unit test support.
+            ["git", "-C", "git.clone1", "remote", "get-url", "origin"]
+        ).strip()
+        == b"git"
+    )
+    with pytest.raises(InfrastructureError):
+        git.clone("foo.bar", revision="badhash")
+
+
 ALLOWED = ["commands", "deploy", "test"]
 
 
@@ -234,6 +234,8 @@ class TestRestApi:
             if response["Content-Type"] == "application/json":
                 return json.loads(text)
             return text
+        if response.streaming:
+            return b"".join(response.streaming_content).decode("utf-8")
         return ""
 
     def test_root(self):
@@ -443,6 +445,18 @@ class TestRestApi:
         )
         assert data["metadata"] == []  # nosec - unit test support
 
+    def test_testjob_estimate(self):
+        data = self.hit(
+            self.userclient,
+            reverse("api-root", args=[self.version])
+            + "jobs/%s/estimate/" % self.public_testjob1.id,
+        )
+        assert data == {  # nosec - unit test support
+            "duration": None,
+            "start_time": None,
+            "queue_wait": None,
+        }
+
     def test_testjob_csv(self):
         data = self.hit(
             self.userclient,
@@ -589,6 +603,40 @@ ok 2 bar
         )
         assert len(data["results"]) == 1  # nosec - unit test support
 
+    def test_testjobs_cursor_pagination(self):
+        data = self.hit(
+            self.adminclient,
+            reverse("api-root", args=[self.version])
+            + "jobs/?cursor=&limit=1&ordering=-submit_time",
+        )
+        assert "count" not in data  # nosec - unit test support
+        assert data["previous"] is None  # nosec - unit test support
+        assert [j["id"] for j in data["results"]] == [  # nosec - unit test support
+            self.public_testjob1.id
+        ]
+
+        data = self.hit(self.adminclient, data["next"])
+        assert [j["id"] for j in data["results"]] == [  # nosec - unit test support
+            self.private_testjob1.id
+        ]
+        assert data["next"] is None  # nosec - unit test support
+
+        # Filters are applied before the pagination
+        data = self.hit(
+            self.adminclient,
+            reverse("api-root", args=[self.version]) + "jobs/?cursor=&health=Complete",
+        )
+        assert [j["id"] for j in data["results"]] == [  # nosec - unit test support
+            self.private_testjob1.id
+        ]
+
+        # Only orderings on indexed and unique fields are allowed
+        response = self.adminclient.get(
+            reverse("api-root", args=[self.version])
+            + "jobs/?cursor=&ordering=start_time"
+        )
+        assert response.status_code == 400  # nosec - unit test support
+
     def test_devices_list(self):
         data = self.hit(
             self.userclient,
@@ -1292,6 +1340,41 @@ ok 2 bar
         assert response.status_code == 201  # nosec - unit test support
         assert TestJob.objects.count() == 3  # nosec - unit test support
 
+    def test_submit_many(self):
+        response = self.adminclient.post(
+            reverse("api-root", args=[self.version]) + "jobs/submit_many/",
+            {"definitions": [EXAMPLE_WORKING_JOB, EXAMPLE_JOB, EXAMPLE_WORKING_JOB]},
+            format="json",
+        )
+        assert response.status_code == 201  # nosec - unit test support
+        content = json.loads(response.content.decode("utf-8"))
+        results = content["results"]
+        assert len(results) == 3  # nosec - unit test support
+        assert results[1]["error"] == (  # nosec - unit test support
+            'Problem with submitted job data: "device_type" or multinode '
+            "should be defined"
+        )
+        assert TestJob.objects.count() == 4  # nosec - unit test support
+        job_ids = results[0]["job_ids"] + results[2]["job_ids"]
+        jobs = TestJob.objects.filter(id__in=job_ids, submitter=self.admin)
+        assert jobs.count() == 2  # nosec - unit test support
+
+    def test_submit_many_bad_request(self):
+        response = self.adminclient.post(
+            reverse("api-root", args=[self.version]) + "jobs/submit_many/",
+            {"definitions": [EXAMPLE_JOB]},
+            format="json",
+        )
+        assert response.status_code == 400  # nosec - unit test support
+        assert TestJob.objects.count() == 2  # nosec - unit test support
+
+        response = self.adminclient.post(
+            reverse("api-root", args=[self.version]) + "jobs/submit_many/",
+            {"definition": EXAMPLE_WORKING_JOB},
+            format="json",
+        )
+        assert response.status_code == 400  # nosec - unit test support
+
     def test_resubmit_unauthorized(self):
         response = self.userclient.post(
             reverse("api-root", args=[self.version])
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import pytest
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.utils import timezone
+
+from lava_common.compat import yaml_dump
+from lava_results_app.models import (
+    Chart,
+    ChartQuery,
+    Query,
+    TestCase,
+    TestData,
+    TestSuite,
+)
+from lava_scheduler_app.models import DeviceType, TestJob
+
+
+def old_chart_series(chart_query, model, pks):
+    """
+    Chart items computed with the per-object helpers, like ChartQuery did
+    before the series were computed with aggregates.
+    """
+    data = {}
+    for item in model.objects.filter(pk__in=pks):
+        data[item.id] = []
+        date = str(item.get_end_datetime())
+        if chart_query.chart_type == "attributes":
+            results = item.get_attribute_results(chart_query.attributes)
+            for (result, values) in results.items():
+                data[item.id].append(
+                    {
+                        "id": result,
+                        "pk": item.id,
+                        "attribute": date,
+                        "link": item.get_absolute_url(),
+                        "date": date,
+                        "pass": values["fail"] == 0,
+                        "attr_value": values["value"],
+                    }
+                )
+            continue
+
+        attribute = item.get_xaxis_attribute(chart_query.xaxis_attribute)
+        if chart_query.xaxis_attribute and not attribute:
+            data[item.id] = []
+            continue
+        attribute = attribute if attribute is not None else date
+
+        if chart_query.chart_type == "pass/fail":
+            for (result, counts) in item.get_passfail_results().items():
+                data[item.id].append(
+                    {
+                        "id": result,
+                        "pk": item.id,
+                        "link": item.get_absolute_url(),
+                        "date": date,
+                        "attribute": attribute,
+                        "pass": counts["fail"] == 0,
+                        "passes": counts["pass"],
+                        "failures": counts["fail"],
+                        "skip": counts["skip"],
+                        "unknown": counts["unknown"],
+                        "total": (
+                            counts["pass"]
+                            + counts["fail"]
+                            + counts["unknown"]
+                            + counts["skip"]
+                        ),
+                    }
+                )
+        elif chart_query.chart_type == "measurement":
+            for (result, values) in item.get_measurement_results().items():
+                data[item.id].append(
+                    {
+                        "id": result,
+                        "pk": item.id,
+                        "link": item.get_absolute_url(),
+                        "date": date,
+                        "attribute": attribute,
+                        "pass": values["fail"] == 0,
+                        "measurement": values["measurement"],
+                    }
+                )
+    return data
+
+
+def sort_series(series):
+    return {pk: sorted(items, key=lambda i: i["id"]) for (pk, items) in series.items()}
+
+
+@pytest.fixture
+def setup(db):
+    user = User.objects.create_user(username="tester", password="tester")  # nosec
+    dt = DeviceType.objects.create(name="qemu")
+    now = timezone.now()
+
+    job_01 = TestJob.objects.create(
+        description="job 01",
+        submitter=user,
+        requested_device_type=dt,
+        state=TestJob.STATE_FINISHED,
+        health=TestJob.HEALTH_COMPLETE,
+        end_time=now - datetime.timedelta(hours=2),
+    )
+    testdata = TestData.objects.create(testjob=job_01)
+    testdata.attributes.create(name="build", value="42")
+    testdata.attributes.create(name="boot_time", value="12.5")
+    testdata.attributes.create(name="kernel", value="linux")
+
+    job_02 = TestJob.objects.create(
+        description="job 02",
+        submitter=user,
+        requested_device_type=dt,
+        state=TestJob.STATE_FINISHED,
+        health=TestJob.HEALTH_INCOMPLETE,
+        end_time=now - datetime.timedelta(hours=1),
+    )
+    job_03 = TestJob.objects.create(
+        description="job 03",
+        submitter=user,
+        requested_device_type=dt,
+        state=TestJob.STATE_RUNNING,
+    )
+
+    for (job, results) in [
+        (job_01, [TestCase.RESULT_PASS, TestCase.RESULT_PASS]),
+        (job_02, [TestCase.RESULT_FAIL, TestCase.RESULT_SKIP]),
+        (job_03, [TestCase.RESULT_UNKNOWN, TestCase.RESULT_PASS]),
+    ]:
+        lava = TestSuite.objects.create(name="lava", job=job)
+        TestCase.objects.create(
+            name="job", suite=lava, result=TestCase.RESULT_PASS, measurement=None
+        )
+        smoke = TestSuite.objects.create(name="smoke", job=job)
+        for (index, result) in enumerate(results):
+            TestCase.objects.create(
+                name="test-%d" % index,
+                suite=smoke,
+                result=result,
+                measurement="%d.5" % (index + job.id),
+                metadata=yaml_dump({"boot_time": "%d.25" % index, "extra": "text"}),
+            )
+    return {"user": user, "jobs": [job_01, job_02, job_03]}
+
+
+@pytest.mark.parametrize("chart_type", ["pass/fail", "measurement", "attributes"])
+@pytest.mark.parametrize("xaxis_attribute", [None, "build"])
+@pytest.mark.parametrize("model", [TestJob, TestSuite, TestCase])
+def test_chart_series(setup, chart_type, xaxis_attribute, model):
+    if chart_type == "pass/fail" and model == TestCase:
+        pytest.skip("pass/fail charts are not supported for test cases")
+
+    chart_query = ChartQuery(
+        chart_type=chart_type,
+        xaxis_attribute=xaxis_attribute,
+        attributes="boot_time, extra, kernel",
+    )
+    pks = list(model.objects.order_by("id").values_list("id", flat=True))
+    series = chart_query.get_chart_series(model, pks)
+    assert list(series.keys()) == pks  # nosec - unit test support
+    assert sort_series(series) == sort_series(  # nosec - unit test support
+        old_chart_series(chart_query, model, pks)
+    )
+    assert any(series.values())  # nosec - unit test support
+    # Objects without the x-axis attribute are skipped
+    if xaxis_attribute and chart_type != "attributes":
+        for pk in pks:
+            obj = model.objects.get(pk=pk)
+            if obj.get_xaxis_attribute(xaxis_attribute) is None:
+                assert series[pk] == []  # nosec - unit test support
+
+
+def test_chart_series_passfail_testcase(setup):
+    chart_query = ChartQuery(chart_type="pass/fail")
+    pks = list(TestCase.objects.values_list("id", flat=True))
+    assert chart_query.get_chart_series(TestCase, pks) == {  # nosec - unit test support
+        pk: [] for pk in pks
+    }
+
+
+def test_chart_series_cache(setup, settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    cache.clear()
+    (job_01, job_02, job_03) = setup["jobs"]
+    query = Query.objects.create(
+        owner=setup["user"],
+        name="jobs",
+        content_type=ContentType.objects.get_for_model(TestJob),
+    )
+    chart = Chart.objects.create(name="chart", owner=setup["user"])
+    chart_query = ChartQuery.objects.create(
+        chart=chart, query=query, chart_type="pass/fail"
+    )
+    pks = [job_01.id, job_03.id]
+    series = chart_query.get_chart_series(TestJob, pks)
+    assert [i["id"] for i in series[job_01.id]] == [  # nosec - unit test support
+        "lava",
+        "smoke",
+    ]
+    assert [i["id"] for i in series[job_03.id]] == [  # nosec - unit test support
+        "lava",
+        "smoke",
+    ]
+
+    # The results of the finished job are cached, not the running one
+    for job in [job_01, job_03]:
+        TestSuite.objects.create(name="new", job=job)
+    series = chart_query.get_chart_series(TestJob, pks)
+    assert [i["id"] for i in series[job_01.id]] == [  # nosec - unit test support
+        "lava",
+        "smoke",
+    ]
+    assert [i["id"] for i in series[job_03.id]] == [  # nosec - unit test support
+        "lava",
+        "smoke",
+        "new",
+    ]
+
+    # Changing the chart options drops the cached entries
+    chart_query.xaxis_attribute = "build"
+    chart_query.save()
+    series = chart_query.get_chart_series(TestJob, pks)
+    assert [i["id"] for i in series[job_01.id]] == [  # nosec - unit test support
+        "lava",
+        "smoke",
+        "new",
+    ]
+    assert series[job_01.id][0]["attribute"] == "42"  # nosec - unit test support
+    assert series[job_03.id] == []  # nosec - unit test support
+
+    chart_query.chart_type = "measurement"
+    chart_query.save()
+    series = chart_query.get_chart_series(TestJob, pks)
+    assert "measurement" in series[job_01.id][0]  # nosec - unit test support
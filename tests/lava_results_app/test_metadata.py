@@ -46,10 +46,23 @@ class TestMetaTypes(TestCaseWithFactory):
             pipeline_job.pipeline.validate_actions, self, "qemu-system-x86_64"
         )
         pipeline = pipeline_job.describe()
+        suite = TestSuite.objects.create(name="lava", job=job)
+        case = TestCase.objects.create(
+            name="deployimages",
+            suite=suite,
+            result=TestCase.RESULT_PASS,
+            metadata=yaml_dump({"level": "1.1"}),
+        )
         map_metadata(yaml_dump(pipeline), job)
         self.assertEqual(
             MetaType.objects.filter(metatype=MetaType.DEPLOY_TYPE).count(), 1
         )
+        self.assertEqual(ActionData.objects.get(action_level="1.1").testcase, case)
+        self.assertEqual(ActionData.objects.filter(testcase__isnull=False).count(), 1)
+        self.assertEqual(
+            job.testdata.attributes.get(name="target.device_type").value,
+            job.requested_device_type.name,
+        )
         self.assertEqual(
             MetaType.objects.filter(metatype=MetaType.BOOT_TYPE).count(), 1
         )
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import pytest
+import xmlrpc.client
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.utils import timezone
+
+from lava_results_app.models import (
+    Query,
+    QueryCondition,
+    QueryUpdatedError,
+    TestCase,
+    TestSuite,
+)
+from lava_scheduler_app.models import TestJob
+from tests.lava_scheduler_app.test_api import TestTransport
+
+
+def make_job(user, suite, end_time):
+    job = TestJob.objects.create(
+        submitter=user,
+        state=TestJob.STATE_FINISHED,
+        health=TestJob.HEALTH_COMPLETE,
+        end_time=end_time,
+    )
+    suite = TestSuite.objects.create(name=suite, job=job)
+    TestCase.objects.create(name="test", suite=suite, result=TestCase.RESULT_PASS)
+    return job
+
+
+def make_query(user, name, model, suite, **kwargs):
+    query = Query.objects.create(
+        owner=user,
+        name=name,
+        content_type=ContentType.objects.get_for_model(model),
+        **kwargs
+    )
+    QueryCondition.objects.create(
+        query=query,
+        table=ContentType.objects.get_for_model(TestSuite),
+        field="name",
+        value=suite,
+    )
+    # Adding a condition marks the query as changed
+    Query.objects.filter(pk=query.pk).update(is_changed=False)
+    query.refresh_from_db()
+    return query
+
+
+@pytest.fixture
+def setup(db, mocker):
+    mocker.patch("lava_results_app.models.Query.has_view", return_value=True)
+    user = User.objects.create_user(
+        username="admin", password="admin", is_superuser=True
+    )  # nosec
+    now = timezone.now()
+    make_job(user, "smoke", now - datetime.timedelta(hours=2))
+    make_job(user, "lava", now - datetime.timedelta(hours=2))
+    last_updated = now - datetime.timedelta(minutes=30)
+    queries = {
+        model: make_query(
+            user,
+            model._meta.model_name,
+            model,
+            "smoke",
+            last_updated=last_updated,
+            staleness_budget=10,
+        )
+        for model in [TestJob, TestSuite, TestCase]
+    }
+    return {"user": user, "now": now, "queries": queries}
+
+
+@pytest.mark.parametrize("model", [TestJob, TestSuite, TestCase])
+def test_query_is_affected(setup, model):
+    query = setup["queries"][model]
+    assert not query.is_affected()  # nosec - unit test support
+    assert not query.is_stale()  # nosec - unit test support
+
+    # A job that does not match the conditions
+    make_job(setup["user"], "lava", setup["now"])
+    assert not query.is_affected()  # nosec - unit test support
+    assert not query.is_stale()  # nosec - unit test support
+
+    # A matching job that finished before the last refresh
+    make_job(setup["user"], "smoke", setup["now"] - datetime.timedelta(hours=1))
+    assert not query.is_affected()  # nosec - unit test support
+
+    # A matching job that finished since the last refresh
+    make_job(setup["user"], "smoke", setup["now"])
+    assert query.is_affected()  # nosec - unit test support
+    assert query.is_stale()  # nosec - unit test support
+
+    # Not before the staleness budget is spent
+    query.staleness_budget = 60
+    assert query.is_affected()  # nosec - unit test support
+    assert not query.is_stale()  # nosec - unit test support
+
+
+def test_query_is_stale(setup):
+    query = setup["queries"][TestJob]
+    query.staleness_budget = 60
+    assert not query.is_stale()  # nosec - unit test support
+    # Once the budget is spent, only if the results could have changed
+    assert not query.is_stale(  # nosec - unit test support
+        setup["now"] + datetime.timedelta(hours=1)
+    )
+
+    # Changed or never refreshed queries are always stale
+    query.is_changed = True
+    assert query.is_stale()  # nosec - unit test support
+    query.is_changed = False
+    query.last_updated = None
+    assert query.is_stale()  # nosec - unit test support
+
+
+def test_refresh_stale_views(setup, mocker):
+    refresh_view = mocker.patch("lava_results_app.models.Query.refresh_view")
+    queries = setup["queries"]
+    (refreshed, failures) = Query.refresh_stale_views()
+    assert refreshed == []  # nosec - unit test support
+    assert failures == []  # nosec - unit test support
+    assert refresh_view.call_count == 0  # nosec - unit test support
+
+    make_query(
+        setup["user"],
+        "fresh",
+        TestJob,
+        "smoke",
+        last_updated=setup["now"] - datetime.timedelta(minutes=30),
+        staleness_budget=60,
+    )
+    make_query(
+        setup["user"],
+        "unaffected",
+        TestJob,
+        "other",
+        last_updated=setup["now"] - datetime.timedelta(minutes=30),
+        staleness_budget=10,
+    )
+    make_query(setup["user"], "live", TestJob, "smoke", is_live=True)
+    make_query(setup["user"], "archived", TestJob, "smoke", is_archived=True)
+    make_job(setup["user"], "smoke", setup["now"])
+
+    # One failing query does not prevent the others from being refreshed
+    refresh_view.side_effect = [None, Exception("boom"), None]
+    (refreshed, failures) = Query.refresh_stale_views()
+    assert refresh_view.call_count == 3  # nosec - unit test support
+    assert len(refreshed) == 2  # nosec - unit test support
+    assert len(failures) == 1  # nosec - unit test support
+    assert str(failures[0][1]) == "boom"  # nosec - unit test support
+    assert set(q.pk for q in refreshed) | set(  # nosec - unit test support
+        q.pk for (q, _) in failures
+    ) == set(q.pk for q in queries.values())
+
+    # Queries already refreshing are skipped
+    refresh_view.reset_mock()
+    refresh_view.side_effect = QueryUpdatedError("query is currently updating")
+    (refreshed, failures) = Query.refresh_stale_views()
+    assert refresh_view.call_count == 3  # nosec - unit test support
+    assert refreshed == []  # nosec - unit test support
+    assert failures == []  # nosec - unit test support
+
+
+def test_refresh_queries_stale_loop(setup, mocker):
+    class StopLoop(Exception):
+        pass
+
+    def refresh_view(query):
+        Query.objects.filter(pk=query.pk).update(last_updated=timezone.now())
+
+    refresh = mocker.patch(
+        "lava_results_app.models.Query.refresh_view",
+        autospec=True,
+        side_effect=refresh_view,
+    )
+    sleep = mocker.patch(
+        "lava_results_app.management.commands.refresh_queries.time.sleep",
+        side_effect=[None, StopLoop()],
+    )
+    make_job(setup["user"], "smoke", setup["now"])
+    make_query(
+        setup["user"],
+        "fresh",
+        TestJob,
+        "smoke",
+        last_updated=setup["now"] - datetime.timedelta(minutes=30),
+        staleness_budget=60,
+    )
+
+    with pytest.raises(StopLoop):
+        call_command("refresh_queries", "--stale", "--loop", "60")
+    # The stale queries are only refreshed once
+    assert sleep.call_count == 2  # nosec - unit test support
+    sleep.assert_called_with(60)
+    assert sorted(  # nosec - unit test support
+        call[0][0].name for call in refresh.call_args_list
+    ) == ["testcase", "testjob", "testsuite"]
+
+
+def test_refresh_all_queries(setup, mocker):
+    queries = setup["queries"]
+    refresh_view = mocker.patch(
+        "lava_results_app.models.Query.refresh_view",
+        autospec=True,
+        side_effect=[Exception("boom"), QueryUpdatedError("updating"), None],
+    )
+    server = xmlrpc.client.ServerProxy(
+        "http://localhost/RPC2/",
+        transport=TestTransport(user="admin", password="admin"),
+    )
+    with pytest.raises(xmlrpc.client.Fault) as exc:
+        server.results.refresh_all_queries()
+    # Every query was refreshed before reporting the errors
+    assert refresh_view.call_count == len(queries)  # nosec - unit test support
+    assert exc.value.faultCode == 401  # nosec - unit test support
+    assert exc.value.faultString.startswith(  # nosec - unit test support
+        "2 queries were not refreshed."
+    )
+    assert "Error: boom" in exc.value.faultString  # nosec - unit test support
+    assert "was recently refreshed" in exc.value.faultString  # nosec
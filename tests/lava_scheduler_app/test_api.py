@@ -3,6 +3,8 @@ import unittest
 import xmlrpc.client
 
 from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.test import override_settings
 from django.test.client import Client
 from io import BytesIO as StringIO
 
@@ -16,9 +18,14 @@ from lava_scheduler_app.models import (
     GroupDevicePermission,
     GroupDeviceTypePermission,
     Tag,
+    TestJob,
     Worker,
 )
-from lava_scheduler_app.schema import validate_submission, SubmissionException
+from lava_scheduler_app.schema import (
+    submission_cache,
+    validate_submission,
+    SubmissionException,
+)
 from tests.lava_scheduler_app.test_submission import TestCaseWithFactory
 
 
@@ -71,6 +78,56 @@ class TestSchedulerAPI(TestCaseWithFactory):
         else:
             self.fail("fault not raised")
 
+    def test_submit_many_rejects_anonymous(self):
+        server = self.server_proxy()
+        try:
+            server.scheduler.jobs.submit_many(["{}"])
+        except xmlrpc.client.Fault as f:
+            self.assertEqual(401, f.faultCode)
+        else:
+            self.fail("fault not raised")
+
+    def test_submit_many(self):
+        self.factory.ensure_user("test", "e@mail.invalid", "test")
+        device_type = self.factory.make_device_type("qemu")
+        self.factory.make_device(device_type=device_type, hostname="qemu01")
+        self.factory.make_device(device_type=device_type, hostname="qemu02")
+        definition = self.factory.make_job_data_from_file("qemu.yaml")
+        multinode = self.factory.make_job_data_from_file("kvm-multinode.yaml")
+
+        server = self.server_proxy("test", "test")
+        results = server.scheduler.jobs.submit_many(
+            [definition, "{}", multinode, definition]
+        )
+        self.assertEqual(4, len(results))
+        self.assertEqual(["job_ids"], list(results[0].keys()))
+        self.assertIn("Problem with submitted job data", results[1]["error"])
+        self.assertEqual(2, len(results[2]["job_ids"]))
+        self.assertEqual(["job_ids"], list(results[3].keys()))
+        self.assertEqual(4, TestJob.objects.count())
+
+        jobs = TestJob.objects.filter(target_group__isnull=False).order_by("id")
+        self.assertEqual(results[2]["job_ids"], [job.sub_id for job in jobs])
+        self.assertEqual(
+            ["%d.0" % jobs[0].id, "%d.1" % jobs[0].id], results[2]["job_ids"]
+        )
+
+        # Same errors as submit_job
+        results = server.scheduler.jobs.submit_many(
+            [definition.replace("device_type: qemu", "device_type: unknown")]
+        )
+        self.assertEqual(
+            [{"error": "Device unavailable: Device type 'unknown' is unavailable."}],
+            results,
+        )
+
+        try:
+            server.scheduler.jobs.submit_many(definition)
+        except xmlrpc.client.Fault as f:
+            self.assertEqual(400, f.faultCode)
+        else:
+            self.fail("fault not raised")
+
     def test_new_devices(self):
         user = self.factory.ensure_user("test", "e@mail.invalid", "test")
         user.save()
@@ -107,6 +164,38 @@ class TestSchedulerAPI(TestCaseWithFactory):
 
 
 class TestVoluptuous(unittest.TestCase):
+    def test_submission_cache(self):
+        submission_cache.clear()
+        data = """
+job_name: cached
+visibility: public
+timeouts:
+  job:
+    minutes: 10
+  action:
+    minutes: 5
+actions: []
+secrets:
+  foo: bar
+"""
+        messages = []
+        for metadata in ["1", "2"]:
+            job = yaml_safe_load(data)
+            job["metadata"] = {"build": metadata}
+            with self.assertRaises(SubmissionException) as cm:
+                validate_submission(job)
+            messages.append(str(cm.exception))
+        self.assertEqual(
+            ["When 'secrets' is used, 'visibility' shouldn't be 'public'"] * 2,
+            messages,
+        )
+        self.assertEqual((1, 1), (submission_cache.misses, submission_cache.hits))
+
+        # The type of the metadata values is validated
+        job["metadata"] = {"build": ["1"]}
+        self.assertRaises(SubmissionException, validate_submission, job)
+        self.assertEqual(2, submission_cache.misses)
+
     def test_breakage_detection(self):
         bad_submission = """
 timeouts:
@@ -722,6 +811,46 @@ def test_devices_list(setup):
     ]
 
 
+@pytest.mark.django_db
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+def test_devices_list_cache(setup):
+    cache.clear()
+    dt = DeviceType.objects.create(name="black")
+    device = Device.objects.create(
+        hostname="device01", device_type=dt, health=Device.HEALTH_GOOD
+    )
+    devices = server("admin", "admin").scheduler.devices.list()
+    assert [(d["state"], d["current_job"]) for d in devices] == [  # nosec
+        ("Idle", None)
+    ]
+
+    # The states saved by the scheduler are visible immediately
+    job = TestJob.objects.create(
+        definition="",
+        submitter=User.objects.get(username="admin"),
+        requested_device_type=dt,
+    )
+    job.actual_device = device
+    job.state = TestJob.STATE_SCHEDULED
+    job.save()
+    device.state = Device.STATE_RESERVED
+    device.save()
+    devices = server("admin", "admin").scheduler.devices.list()
+    assert [(d["state"], d["current_job"]) for d in devices] == [  # nosec
+        ("Reserved", job.id)
+    ]
+    assert server("admin", "admin").scheduler.all_devices() == [  # nosec
+        ["device01", "black", "reserved", job.id, True]
+    ]
+
+    # Other changes are visible after FLEET_CACHE_TIMEOUT
+    Device.objects.filter(hostname="device01").update(health=Device.HEALTH_BAD)
+    devices = server("admin", "admin").scheduler.devices.list()
+    assert [d["health"] for d in devices] == ["Good"]  # nosec
+
+
 @pytest.mark.django_db
 def test_devices_show(setup):
     assert server().scheduler.devices.list() == []  # nosec
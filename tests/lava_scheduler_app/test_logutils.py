@@ -86,6 +86,18 @@ def test_read_logs_compressed(mocker, tmpdir, logs_filesystem):
     assert logs_filesystem.read(job, start=1, end=0) == ""  # nosec
 
 
+def test_read_many_logs(mocker, tmpdir, logs_filesystem):
+    job = mocker.Mock()
+    job.output_dir = tmpdir
+    with lzma.open(str(tmpdir / "output.yaml.xz"), "wb") as f_logs:
+        f_logs.write("hello\nworld\nhow\nare\nyou".encode("utf-8"))
+    assert logs_filesystem.read_many(job, []) == []  # nosec
+    assert logs_filesystem.read_many(  # nosec
+        job, [(0, 1), (1, 3), (2, 2), (4, None), (5, 50)]
+    ) == ["hello\n", "world\nhow\n", "", "you", ""]
+    assert (tmpdir / "output.idx").exists()  # nosec
+
+
 def test_size_logs(mocker, tmpdir, logs_filesystem):
     job = mocker.Mock()
     job.output_dir = tmpdir
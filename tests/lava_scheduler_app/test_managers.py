@@ -22,9 +22,10 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.db import connection
 from django.db.models import Q
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from lava_common.exceptions import ObjectNotPersisted, PermissionNameError
 from lava_scheduler_app.models import (
@@ -35,6 +36,7 @@ from lava_scheduler_app.models import (
     TestJob,
     Device,
     Worker,
+    PermissionsVersion,
 )
 from tests.lava_scheduler_app.test_submission import TestCaseWithFactory
 
@@ -1244,3 +1246,91 @@ class ManagersTest(TestCaseWithFactory):
             ),
             set(Worker.objects.all()),
         )
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+        PERMISSIONS_CACHE_TIMEOUT=300,
+    )
+    def test_permissions_cache(self):
+        cache.clear()
+        # Fill the cache
+        self.assertEqual(
+            set(DeviceType.objects.all().visible_by_user(self.user1)),
+            set(self.all_device_types),
+        )
+
+        # Permission changes are visible immediately, in every process, as
+        # the version is stored in the database.
+        version = PermissionsVersion.objects.get(pk=1).version
+        GroupDeviceTypePermission.objects.assign_perm(
+            DeviceType.VIEW_PERMISSION, self.group2, self.bbb_device_type
+        )
+        self.assertNotEqual(PermissionsVersion.objects.get(pk=1).version, version)
+        self.assertEqual(
+            set(DeviceType.objects.all().visible_by_user(self.user1)),
+            {self.qemu_device_type, self.lxc_device_type},
+        )
+        self.assertEqual(
+            set(Device.objects.all().visible_by_user(self.user1)),
+            set(self.all_qemu_devices),
+        )
+        self.assertFalse(self.bbb_device_type.can_view(self.user1))
+
+        # Group membership changes too.
+        self.user1.groups.add(self.group2)
+        self.assertEqual(
+            set(DeviceType.objects.all().visible_by_user(self.user1)),
+            set(self.all_device_types),
+        )
+        self.assertEqual(
+            set(Device.objects.all().visible_by_user(self.user1)),
+            set(self.all_devices),
+        )
+        self.assertTrue(self.bbb_device_type.can_view(self.user1))
+
+        self.user1.groups.remove(self.group2)
+        GroupDevicePermission.objects.assign_perm(
+            Device.VIEW_PERMISSION, self.group1, self.bbb_device1
+        )
+        self.assertEqual(
+            set(Device.objects.all().visible_by_user(self.user1)),
+            set(self.all_qemu_devices + [self.bbb_device1]),
+        )
+
+        GroupDeviceTypePermission.objects.remove_perm(
+            DeviceType.VIEW_PERMISSION, self.group2, self.bbb_device_type
+        )
+        self.assertEqual(
+            set(DeviceType.objects.all().visible_by_user(self.user2)),
+            set(self.all_device_types),
+        )
+        self.assertFalse(
+            self.bbb_device_type.is_permission_restricted(DeviceType.VIEW_PERMISSION)
+        )
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+        PERMISSIONS_CACHE_TIMEOUT=0,
+    )
+    def test_permissions_cache_disabled(self):
+        cache.clear()
+        version = PermissionsVersion.objects.get(pk=1).version
+        GroupDeviceTypePermission.objects.assign_perm(
+            DeviceType.VIEW_PERMISSION, self.group2, self.bbb_device_type
+        )
+        self.assertEqual(PermissionsVersion.objects.get(pk=1).version, version)
+        self.assertEqual(
+            set(DeviceType.objects.all().visible_by_user(self.user1)),
+            {self.qemu_device_type, self.lxc_device_type},
+        )
+        # The objects are checked one by one
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                self.bbb_device_type.is_permission_restricted(
+                    DeviceType.VIEW_PERMISSION
+                )
+            )
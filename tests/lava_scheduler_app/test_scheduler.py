@@ -21,13 +21,19 @@
 
 from datetime import timedelta
 import logging
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.utils import timezone
 
+from lava_scheduler_app.estimates import job_estimate, predict_durations
 from lava_scheduler_app.models import Device, DeviceType, TestJob, Worker
-from lava_scheduler_app.scheduler import schedule, schedule_health_checks
+from lava_scheduler_app.scheduler import (
+    fit_before_health_check,
+    schedule,
+    schedule_health_checks,
+)
 
 
 def _minimal_valid_job(self):
@@ -99,6 +105,7 @@ class TestHealthCheckScheduling(TestCase):
             health=TestJob.HEALTH_COMPLETE,
         )
         self.device03.last_health_report_job = self.last_hc03
+        self.device03.last_health_report_time = self.last_hc03.submit_time
         self.device03.save()
 
         self.original_health_check = Device.get_health_check
@@ -272,8 +279,8 @@ class TestHealthCheckScheduling(TestCase):
             definition=_minimal_valid_job(None),
         )
         self.device03.refresh_from_db()
-        self.last_hc03.submit_time = timezone.now() - timedelta(hours=25)
-        self.last_hc03.save()
+        self.device03.last_health_report_time = timezone.now() - timedelta(hours=25)
+        self.device03.save()
 
         schedule(logging.getLogger())
         self.device03.refresh_from_db()
@@ -287,8 +294,6 @@ class TestHealthCheckScheduling(TestCase):
         self.device_type01.health_denominator = DeviceType.HEALTH_PER_JOB
         self.device_type01.health_frequency = 2
         self.device_type01.save()
-        self.last_hc03.submit_time = timezone.now() - timedelta(hours=2)
-        self.last_hc03.save()
         Device.get_health_check = _minimal_valid_job
         self.assertNotEqual(self.device01.get_health_check(), None)
         self.assertNotEqual(self.device02.get_health_check(), None)
@@ -298,6 +303,7 @@ class TestHealthCheckScheduling(TestCase):
         self.device01.save()
         self.device03.health = Device.HEALTH_GOOD
         self.device03.save()
+        self.assertEqual(self.device03.jobs_since_health_report, 0)
 
         # Create a job that should be scheduled now
         j01 = TestJob.objects.create(
@@ -338,10 +344,19 @@ class TestHealthCheckScheduling(TestCase):
         self.device03.refresh_from_db()
         j03.refresh_from_db()
         self.assertEqual(j03.state, TestJob.STATE_SUBMITTED)
+        self.assertEqual(self.device03.jobs_since_health_report, 2)
         current_hc = self.device03.current_job()
         self.assertTrue(current_hc.health_check)
         self.assertEqual(current_hc.state, TestJob.STATE_SCHEDULED)
 
+        # The health check resets the counter
+        current_hc.go_state_finished(TestJob.HEALTH_COMPLETE)
+        current_hc.save()
+        self.device03.refresh_from_db()
+        self.assertEqual(self.device03.last_health_report_job, current_hc)
+        self.assertEqual(self.device03.last_health_report_time, current_hc.submit_time)
+        self.assertEqual(self.device03.jobs_since_health_report, 0)
+
 
 class TestVisibility(TestCase):
     def setUp(self):
@@ -850,3 +865,136 @@ class TestJobLimit(TestCase):
         schedule(self.logger)
         assert TestJob.objects.filter(state=TestJob.STATE_SCHEDULED).count() == 4
         assert TestJob.objects.filter(state=TestJob.STATE_SUBMITTED).count() == 0
+
+
+class TestEstimates(TestCase):
+    def setUp(self):
+        self.worker01 = Worker.objects.create(
+            hostname="worker-01", state=Worker.STATE_ONLINE
+        )
+        self.device_type01 = DeviceType.objects.create(name="panda")
+        self.device01 = Device.objects.create(
+            hostname="panda01",
+            device_type=self.device_type01,
+            worker_host=self.worker01,
+            health=Device.HEALTH_GOOD,
+        )
+        self.device02 = Device.objects.create(
+            hostname="panda02",
+            device_type=self.device_type01,
+            worker_host=self.worker01,
+            health=Device.HEALTH_GOOD,
+        )
+        self.user = User.objects.create(username="user-01")
+        self.user02 = User.objects.create(username="user-02")
+
+    def _job(self, description, **kwargs):
+        return TestJob.objects.create(
+            requested_device_type=self.device_type01,
+            submitter=kwargs.pop("submitter", self.user),
+            description=description,
+            definition=_minimal_valid_job(None),
+            **kwargs,
+        )
+
+    def _run(self, job, device, minutes):
+        job.actual_device = device
+        job.state = TestJob.STATE_RUNNING
+        job.start_time = timezone.now() - timedelta(minutes=minutes)
+        job.save()
+
+    def _assertTime(self, expected, value):
+        self.assertLess(abs((expected - value).total_seconds()), 10)
+
+    def test_durations(self):
+        job = self._job("build")
+        self.assertEqual(predict_durations([job]), {job.id: None})
+        self.assertEqual(job_estimate(job), {"duration": None, "start_time": None})
+
+        # Learn from the finished jobs
+        for (description, minutes) in [("build", 10), ("test", 20)]:
+            finished = self._job(description)
+            self._run(finished, self.device01, minutes)
+            finished.go_state_finished(TestJob.HEALTH_COMPLETE)
+            finished.save()
+        canceled = self._job("build")
+        self._run(canceled, self.device01, 60)
+        canceled.go_state_canceling()
+        canceled.go_state_finished(TestJob.HEALTH_CANCELED)
+        canceled.save()
+
+        other = self._job("other")
+        anonymous = self._job(None, submitter=self.user02)
+        durations = predict_durations([job, other, anonymous])
+        self.assertAlmostEqual(durations[job.id], 600, delta=5)
+        self.assertAlmostEqual(durations[other.id], 900, delta=5)
+        self.assertAlmostEqual(durations[anonymous.id], 900, delta=5)
+
+        # The moving average is bounded by JOB_DURATION_WINDOW
+        with self.settings(JOB_DURATION_WINDOW=2):
+            finished = self._job("build")
+            self._run(finished, self.device01, 20)
+            finished.go_state_finished(TestJob.HEALTH_COMPLETE)
+            finished.save()
+        self.assertAlmostEqual(predict_durations([job])[job.id], 900, delta=5)
+
+    def test_job_estimate(self):
+        for (description, minutes) in [("build", 10), ("test", 20)]:
+            finished = self._job(description)
+            self._run(finished, self.device01, minutes)
+            finished.go_state_finished(TestJob.HEALTH_COMPLETE)
+            finished.save()
+
+        running = self._job("build")
+        self._run(running, self.device01, 5)
+        queued = self._job("test")
+        job = self._job("build")
+        low = self._job("test", priority=TestJob.LOW)
+
+        # panda02 runs "queued" and panda01 is free in 5 minutes
+        now = timezone.now()
+        estimate = job_estimate(job)
+        self.assertEqual(estimate["duration"], timedelta(minutes=10))
+        self._assertTime(now + timedelta(minutes=5), estimate["start_time"])
+        self._assertTime(now + timedelta(minutes=15), job_estimate(low)["start_time"])
+
+        # Too far in the queue for a start time
+        with patch("lava_scheduler_app.estimates.MAX_QUEUED_JOBS", 1):
+            estimate = job_estimate(low)
+        self.assertEqual(estimate["duration"], timedelta(minutes=20))
+        self.assertIsNone(estimate["start_time"])
+
+        # The running jobs report their start time
+        estimate = job_estimate(running)
+        self.assertEqual(estimate["start_time"], running.start_time)
+        self.assertEqual(estimate["duration"], timedelta(minutes=10))
+
+    def test_fit_before_health_check(self):
+        self.device_type01.health_denominator = DeviceType.HEALTH_PER_HOUR
+        self.device_type01.health_frequency = 1
+        self.device_type01.save()
+        finished = self._job("long")
+        self._run(finished, self.device01, 50)
+        finished.go_state_finished(TestJob.HEALTH_COMPLETE)
+        finished.save()
+        finished = self._job("short")
+        self._run(finished, self.device01, 5)
+        finished.go_state_finished(TestJob.HEALTH_COMPLETE)
+        finished.save()
+
+        jobs = [self._job("long"), self._job("short"), self._job("unknown")]
+        high = self._job("long", priority=TestJob.HIGH)
+        jobs = [high] + jobs
+        self.device02.last_health_report_time = timezone.now() - timedelta(minutes=30)
+        self.device02.save()
+        durations = predict_durations(jobs)
+        self.assertEqual(
+            fit_before_health_check(self.device02, jobs, durations),
+            [jobs[0], jobs[2], jobs[3], jobs[1]],
+        )
+
+        # Without a time based health check, the order is kept
+        self.device_type01.health_denominator = DeviceType.HEALTH_PER_JOB
+        self.device_type01.save()
+        self.device02.refresh_from_db()
+        self.assertEqual(fit_before_health_check(self.device02, jobs, durations), jobs)
@@ -17,12 +17,16 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
 
+import datetime
 import pytest
 import simplejson
+import time
 
 from django.contrib.auth.models import Group, User
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.http import Http404
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 
@@ -31,6 +35,7 @@ from lava_scheduler_app.models import (
     Device,
     DeviceType,
     GroupDevicePermission,
+    JobDuration,
     TestJob,
     TestJobUser,
     Worker,
@@ -163,6 +168,36 @@ def test_index(client, setup):
     assert ret.context["num_devices_running"] == 1  # nosec
 
 
+@pytest.mark.django_db
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    STATISTICS_CACHE_TIMEOUT=60,
+)
+def test_index_statistics_cache(client, setup, monkeypatch):
+    cache.clear()
+
+    ret = client.get(reverse("lava.scheduler"))
+    assert ret.context["num_jobs_running"] == 3  # nosec
+    assert ret.context["hc_completed"] == 0  # nosec
+    assert ret.context["hc_total"] == 0  # nosec
+
+    # The job counters are served from the cache
+    TestJob.objects.filter(description="test job 06").update(
+        state=TestJob.STATE_FINISHED, health=TestJob.HEALTH_COMPLETE
+    )
+    ret = client.get(reverse("lava.scheduler"))
+    assert ret.context["num_jobs_running"] == 3  # nosec
+    assert ret.context["hc_total"] == 0  # nosec
+
+    # Once too old, they are computed again by the request
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    ret = client.get(reverse("lava.scheduler"))
+    assert ret.context["num_jobs_running"] == 2  # nosec
+    assert ret.context["hc_completed"] == 1  # nosec
+    assert ret.context["hc_total"] == 1  # nosec
+
+
 @pytest.mark.django_db
 def test_devices(client, setup):
     ret = client.get(reverse("lava.scheduler.alldevices"))
@@ -837,6 +872,30 @@ def test_job_detail(client, setup):
     assert ret.status_code == 200  # nosec
     assert ret.templates[0].name == "lava_scheduler_app/job.html"  # nosec
     assert ret.context["log_data"] == []  # nosec
+    assert "estimate" not in ret.context  # nosec
+    assert b"Expected duration" not in ret.content  # nosec
+
+
+@pytest.mark.django_db
+def test_job_detail_estimate(client, setup):
+    JobDuration.objects.create(
+        device_type=DeviceType.objects.get(name="juno"),
+        kind=JobDuration.KIND_DEVICE_TYPE,
+        count=3,
+        duration=600,
+    )
+    ret = client.get(
+        reverse(
+            "lava.scheduler.job.detail",
+            args=[TestJob.objects.get(description="test job 02").pk],
+        )
+    )
+    assert ret.status_code == 200  # nosec
+    assert ret.context["estimate"]["duration"] == datetime.timedelta(
+        seconds=600
+    )  # nosec
+    assert b"Expected duration" in ret.content  # nosec
+    assert b"0:10:00" in ret.content  # nosec
 
 
 @pytest.mark.django_db
@@ -183,6 +183,56 @@ def test_internal_v1_jobs_get(client, mocker, settings):
     assert "available_architectures:" not in ret.json()["device"]
 
 
+@pytest.mark.django_db
+def test_internal_v1_jobs_prefetch(client, mocker, settings, tmpdir):
+    # Create objects
+    objs = create_objects(Worker.objects.create(hostname="worker-01"))
+    (j1, j2, j3, j4, j5, j6) = objs["jobs"]
+
+    # Test errors
+    ret = client.get(reverse("lava.scheduler.internal.v1.jobs.prefetch", args=["0"]))
+    assert ret.status_code == 404
+
+    ret = client.get(reverse("lava.scheduler.internal.v1.jobs.prefetch", args=[j1.id]))
+    assert ret.status_code == 400
+    assert ret.json()["error"] == "Missing 'token'"
+
+    ret = client.get(
+        reverse("lava.scheduler.internal.v1.jobs.prefetch", args=[j1.id]),
+        HTTP_LAVA_TOKEN="",
+    )
+    assert ret.status_code == 400
+    assert ret.json()["error"] == "Invalid 'token'"
+
+    ret = client.post(
+        reverse("lava.scheduler.internal.v1.jobs.prefetch", args=[j1.id]),
+        HTTP_LAVA_TOKEN=j1.token,
+    )
+    assert ret.status_code == 405
+
+    # Successful calls
+    ret = client.get(
+        reverse("lava.scheduler.internal.v1.jobs.prefetch", args=[j1.id]),
+        HTTP_LAVA_TOKEN=j1.token,
+    )
+    assert ret.status_code == 200
+    assert ret.json() == {"definition": j1.definition, "http_url_format_string": None}
+
+    mocker.patch(
+        "lava_server.files.File.read",
+        return_value="http_url_format_string: http://proxy/?url=%s\n",
+    )
+    ret = client.get(
+        reverse("lava.scheduler.internal.v1.jobs.prefetch", args=[j1.id]),
+        HTTP_LAVA_TOKEN=j1.token,
+    )
+    assert ret.status_code == 200
+    assert ret.json()["http_url_format_string"] == "http://proxy/?url=%s"
+
+    # Nothing is written by the server
+    assert not (tmpdir / "job-output").exists()
+
+
 @pytest.mark.django_db
 def test_internal_v1_jobs_post(client, mocker, settings):
     # Create objects
@@ -467,7 +517,7 @@ def test_internal_v1_workers_get(client, mocker):
         HTTP_LAVA_TOKEN=token,
     )
     assert ret.status_code == 200
-    assert ret.json() == {"cancel": [], "running": [], "start": []}
+    assert ret.json() == {"cancel": [], "prefetch": [], "running": [], "start": []}
 
     w = Worker.objects.get(hostname="worker-01")
     assert w.last_ping == now
@@ -484,14 +534,29 @@ def test_internal_v1_workers_get(client, mocker):
     )
     assert ret.status_code == 200
     data = ret.json()
-    assert sorted(data.keys()) == ["cancel", "running", "start"]
+    assert sorted(data.keys()) == ["cancel", "prefetch", "running", "start"]
     assert data["cancel"] == [{"id": j3.id, "token": j3.token}]
+    assert data["prefetch"] == []
     assert data["running"] == [{"id": j2.id, "token": j2.token}]
     assert len(data["start"]) == 3
     assert {"id": j1.id, "token": j1.token} in data["start"]
     assert {"id": j5.id, "token": j5.token} in data["start"]
     assert {"id": j6.id, "token": j6.token} in data["start"]
 
+    # Multinode jobs waiting for the rest of their group are prefetched
+    j5.state = TestJob.STATE_SCHEDULING
+    j5.save()
+    ret = client.get(
+        reverse("lava.scheduler.internal.v1.workers", args=["worker-01"]),
+        {"version": __version__},
+        HTTP_LAVA_TOKEN=token,
+    )
+    assert ret.status_code == 200
+    data = ret.json()
+    assert data["prefetch"] == [{"id": j5.id, "token": j5.token}]
+    assert len(data["start"]) == 1
+    assert {"id": j1.id, "token": j1.token} in data["start"]
+
 
 @pytest.mark.django_db
 def test_internal_v1_workers_post(client, mocker, settings):
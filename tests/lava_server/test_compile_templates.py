@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020-present Linaro Limited
+#
+# This file is part of LAVA.
+#
+# LAVA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License version 3
+# as published by the Free Software Foundation
+#
+# LAVA is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with LAVA.  If not, see <http://www.gnu.org/licenses/>.
+
+from io import StringIO
+import threading
+
+import pytest
+from jinja2.bccache import bc_magic
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+import lava_scheduler_app.environment as environment
+
+
+@pytest.fixture
+def templates(mocker, settings, tmpdir):
+    (tmpdir / "devices").mkdir()
+    (tmpdir / "device-types").mkdir()
+    (tmpdir / "device-types" / "base.jinja2").write_text(
+        "{% block body %}{% endblock %}", encoding="utf-8"
+    )
+    (tmpdir / "device-types" / "qemu.jinja2").write_text(
+        "{% extends 'base.jinja2' %}{% block body %}arch: {{ arch }}{% endblock %}",
+        encoding="utf-8",
+    )
+    (tmpdir / "devices" / "qemu01.jinja2").write_text(
+        "{% extends 'qemu.jinja2' %}{% set arch = 'amd64' %}", encoding="utf-8"
+    )
+    mocker.patch(
+        "lava_server.files.File.KINDS",
+        {
+            "device": ([str(tmpdir / "devices")], "{name}.jinja2"),
+            "device-type": ([str(tmpdir / "device-types")], "{name}.jinja2"),
+        },
+    )
+    mocker.patch("lava_scheduler_app.environment.thread_locals", threading.local())
+    settings.JINJA2_CACHE_PATH = str(tmpdir / "cache")
+    return tmpdir
+
+
+def test_compile_templates(templates):
+    out = StringIO()
+    call_command("compile-templates", stdout=out)
+    assert out.getvalue() == (
+        "Compiling device-types:\n"
+        "* base.jinja2\n"
+        "* qemu.jinja2\n"
+        "Compiling devices:\n"
+        "* qemu01.jinja2\n"
+    )
+    assert len((templates / "cache").listdir()) == 3
+
+    # The templates are loaded from the cache by the other processes
+    environment.thread_locals = threading.local()
+    cache = environment.bytecode_cache()
+    load_bytecode = cache.load_bytecode
+    loaded = []
+
+    def load(bucket):
+        load_bytecode(bucket)
+        loaded.append(bucket.code is not None)
+
+    cache.load_bytecode = load
+    template = environment.devices().get_template("qemu01.jinja2")
+    assert template.render() == "arch: amd64"
+    assert loaded == [True, True, True]
+
+
+def test_compile_templates_errors(templates, settings):
+    (templates / "devices" / "qemu02.jinja2").write_text(
+        "{% extends 'qemu.jinja2' %", encoding="utf-8"
+    )
+    out = StringIO()
+    with pytest.raises(CommandError, match="1 template\\(s\\) failed to compile"):
+        call_command("compile-templates", stdout=out)
+    assert "* qemu02.jinja2 [FAIL]\n" in out.getvalue()
+
+    settings.JINJA2_CACHE_PATH = None
+    environment.thread_locals = threading.local()
+    with pytest.raises(CommandError, match="Unable to use the jinja2 cache 'None'"):
+        call_command("compile-templates", stdout=out)
+
+
+def test_compile_templates_truncated_cache(templates):
+    call_command("compile-templates", stdout=StringIO())
+    # Keep the header only: loading the checksum fails
+    for path in (templates / "cache").listdir():
+        path.write_binary(path.read_binary()[: len(bc_magic) + 2])
+
+    # Truncated files are ignored and replaced
+    environment.thread_locals = threading.local()
+    template = environment.devices().get_template("qemu01.jinja2")
+    assert template.render() == "arch: amd64"
+    assert len((templates / "cache").listdir()) == 3
+
+    environment.thread_locals = threading.local()
+    cache = environment.bytecode_cache()
+    load_bytecode = cache.load_bytecode
+    loaded = []
+
+    def load(bucket):
+        load_bytecode(bucket)
+        loaded.append(bucket.code is not None)
+
+    cache.load_bytecode = load
+    template = environment.devices().get_template("qemu01.jinja2")
+    assert template.render() == "arch: amd64"
+    assert loaded == [True, True, True]